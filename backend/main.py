@@ -1,16 +1,69 @@
 # backend/main.py
 
-from fastapi import FastAPI
+import time
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from backend.models import PredictRequest, HitlContinueRequest, PredictResponse
 from backend.services.lats_service import executar_primeira_fase, continuar_pos_hitl
+from lats_sistema.memory.memory_writer import encerrar_escritor, iniciar_escritor, MEMORY_WRITER_ENABLED
+from lats_sistema.utils.metrics import HTTP_REQUEST_LATENCY, gerar_metricas
 
 app = FastAPI(title="LATS-P Service API")
 
+
+# -------------------------
+# Ciclo de vida (memória HITL: consistência do índice + gravação em segundo plano)
+# -------------------------
+@app.on_event("startup")
+def iniciar_memoria():
+    if MEMORY_WRITER_ENABLED:
+        # Mesmo critério do escritor: fora do serverless (filesystem persistente)
+        from lats_sistema.memory.memory_store import MEMORY_INDEX_CHECK_ON_STARTUP, garantir_indice_memoria
+        if MEMORY_INDEX_CHECK_ON_STARTUP:
+            try:
+                garantir_indice_memoria()
+            except Exception as e:
+                print(f"⚠️ Falha ao verificar o índice de memórias: {e}")
+    iniciar_escritor()
+
+
+@app.on_event("shutdown")
+def encerrar_memoria():
+    encerrar_escritor()
+
+
 @app.get("/")
 def health():
     return {"status": "ok"}
 
+
+# -------------------------
+# Métricas (Prometheus)
+# -------------------------
+@app.middleware("http")
+async def medir_latencia(request: Request, call_next):
+    inicio = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Path "template" da rota (evita explosão de cardinalidade)
+        rota = request.scope.get("route")
+        endpoint = getattr(rota, "path", None) or "desconhecido"
+        if endpoint != "/metrics":
+            HTTP_REQUEST_LATENCY.labels(
+                endpoint=endpoint, method=request.method, status=str(status)
+            ).observe(time.perf_counter() - inicio)
+
+
+@app.get("/metrics")
+def metrics():
+    conteudo, content_type = gerar_metricas()
+    return Response(content=conteudo, media_type=content_type)
+
 # Liberar chamadas do Streamlit
 app.add_middleware(
     CORSMiddleware,
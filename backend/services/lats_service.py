@@ -7,6 +7,7 @@ from lats_sistema.graph.build import build_graph
 from backend.models import PredictRequest, HitlContinueRequest, PredictResponse
 from lats_sistema.utils.confidence import traduzir_confianca
 from lats_sistema.utils.output_formatter import formatar_saida_final
+from lats_sistema.utils.metrics import CLASSIFICACOES
 
 logger = logging.getLogger(__name__)
 
@@ -63,6 +64,7 @@ def executar_primeira_fase(req: PredictRequest) -> PredictResponse:
 
     # Executar grafo completo (RAG → LATS)
     # Se HITL for necessário, o engine LATS detecta e salva checkpoint
+    CLASSIFICACOES.labels(fase="predict").inc()
     result = get_graph().invoke(state)
 
     # Traduzir log_prob em confiança (se houver resultado final)
@@ -144,6 +146,7 @@ def continuar_pos_hitl(req: HitlContinueRequest) -> PredictResponse:
 
     # Executar/retomar grafo
     # O engine LATS detecta hitl_selected_child e chama _continuar_pos_hitl
+    CLASSIFICACOES.labels(fase="hitl_continue").inc()
     result = get_graph().invoke(state)
 
     # Traduzir log_prob em confiança (se houver resultado final)
@@ -1,10 +1,34 @@
 # ================================================================
 # 🧠 CRIAR ÍNDICE FAISS PARA PADRÕES / NORMAS PETROBRAS
 # ================================================================
+# Build INCREMENTAL:
+# - Manifest (index_dir/manifest.json) com hash de cada arquivo e os
+#   chunk_ids (hash do conteúdo) já indexados + modelo de embedding
+# - Só chunks novos/alterados são embedados (lotes, concorrência limitada)
+# - Vetores de chunks que saíram do corpus são removidos
+# - Salvamento atômico (diretório temporário + rename)
+# - Vetores brutos guardados em vetores.npy (fonte da verdade): o índice
+#   ANN (flat / hnsw / ivf_flat / ivf_pq) é remontado a partir deles sem
+#   reembedar, o que também permite trocar o tipo de índice
+#
+# Uso:
+#   python criar_index_faiss.py                      # atualiza incrementalmente
+#   python criar_index_faiss.py --dry-run            # só mostra o delta
+#   python criar_index_faiss.py --full               # reembeda tudo
+#   python criar_index_faiss.py --index-type hnsw    # escolhe o índice ANN
+#   python -m lats_sistema.vectorstore.ann           # benchmark dos tipos
+# ================================================================
 import os
-import re
+import json
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+
+import numpy as np
 from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 
 # Carregar variáveis de ambiente
@@ -14,90 +38,241 @@ env_file = BASE_DIR / ".env"
 if env_file.exists():
     load_dotenv(env_file)
 
+INDEX_DIR = BASE_DIR / "data" / "faiss" / "index_anp"
+EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+
+# Lote de textos por chamada embed_documents e chamadas simultâneas
+FAISS_BUILD_BATCH = int(os.getenv("FAISS_BUILD_BATCH", "64"))
+FAISS_BUILD_CONCURRENCY = int(os.getenv("FAISS_BUILD_CONCURRENCY", "4"))
+
+MANIFEST_VERSION = 2
+
+
 # ================================================================
 # 1. CARREGAR EMBEDDINGS — MESMO MODELO DO SISTEMA LATS
 # ================================================================
-from lats_sistema.models.llm_factory import get_embedding_model
+def carregar_embeddings():
+    from lats_sistema.models.llm_factory import get_embedding_model
 
-embeddings = get_embedding_model()
-print(f"✓ Usando modelo: {os.getenv('OPENAI_EMBED_MODEL', 'text-embedding-3-small')}")
+    embeddings = get_embedding_model()
+    print(f"✓ Usando modelo: {EMBED_MODEL}")
+    return embeddings
 
 
 # ================================================================
-# 2. CARREGAR DOCUMENTOS .md DO DIRETÓRIO
+# 2. CHUNKS — MESMO CHUNK STORE DO BM25 (ids estáveis por conteúdo)
 # ================================================================
-def carregar_md(dir_path="padroes_petrobras"):
-    docs = []
+from lats_sistema.vectorstore.chunk_store import CORPUS_DIR, STORE_DIR, construir_chunk_store
+from lats_sistema.vectorstore.ann import INDEX_TYPES, parametros_build, construir_indice_ann
+
 
-    if not os.path.isdir(dir_path):
+def carregar_chunks(dir_path=CORPUS_DIR, store_dir=STORE_DIR):
+    """
+    (Re)constrói o chunk store unificado e o retorna.
+
+    Os chunks e chunk_ids são os mesmos usados pelo índice BM25, o que
+    permite fundir/deduplicar os resultados dos dois retrievers por id.
+    store_dir diferente de STORE_DIR (dry-run) → store em uso intocado.
+    """
+    dir_path = Path(dir_path)
+    if not dir_path.is_dir():
         raise Exception(f"Diretório não encontrado: {dir_path}")
 
-    for filename in os.listdir(dir_path):
-        # Ignorar arquivos de checkpoint do Jupyter
-        if filename.startswith('.') or '-checkpoint' in filename:
-            continue
+    store = construir_chunk_store(dir_path, Path(store_dir), anterior_dir=STORE_DIR)
+    print(f"✓ Total de chunks: {len(store)} ({len(store.fontes)} arquivos .md de {dir_path})")
+    return store
+
+
+# ================================================================
+# 3. MANIFEST E DELTA
+# ================================================================
+def ler_manifest(index_dir=INDEX_DIR):
+    path = Path(index_dir) / "manifest.json"
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def calcular_delta(chunks, manifest, full=False, ann=None, index_dir=INDEX_DIR, store_dir=STORE_DIR):
+    """
+    Compara o chunk store com o que já está indexado.
 
-        if filename.lower().endswith(".md"):
-            fpath = os.path.join(dir_path, filename)
+    Sem manifest compatível (índice antigo, outro modelo, sem vetores.npy,
+    --full) o delta é o corpus inteiro. Mudança só nos parâmetros ANN
+    remonta o índice sem reembedar.
+    """
+    alvo = set(chunks.ids)
+    arquivos = json.loads((Path(store_dir) / "manifest.json").read_text(encoding="utf-8"))["arquivos"]
 
-            with open(fpath, "r", encoding="utf-8") as f:
-                texto = f.read().strip()
+    compativel = (
+        not full
+        and manifest is not None
+        and manifest.get("versao") == MANIFEST_VERSION
+        and manifest.get("modelo") == EMBED_MODEL
+        and (Path(index_dir) / "vetores.npy").exists()
+    )
+    indexados = set(manifest.get("chunks", [])) if compativel else set()
+    arquivos_ant = manifest.get("arquivos", {}) if compativel else {}
 
-            # Sanitização simples
-            texto = texto.replace("```", "")
-            texto = re.sub(r"<[^>]+>", "", texto)
+    return {
+        "rebuild": not compativel,
+        "adicionar": [cid for cid in chunks.ids if cid not in indexados],
+        "remover": sorted(indexados - alvo),
+        "manter": len(alvo & indexados),
+        "arquivos_alterados": sorted(
+            f for f, sha in arquivos.items() if arquivos_ant.get(f) != sha
+        ),
+        "arquivos_removidos": sorted(set(arquivos_ant) - set(arquivos)),
+        "arquivos": arquivos,
+        "ann": ann,
+        "reindexar": not compativel or manifest.get("ann") != ann,
+    }
 
-            if texto:
-                docs.append(Document(page_content=texto, metadata={"source": filename}))
 
-    print(f"✓ Carregados {len(docs)} documentos .md de {dir_path}")
-    return docs
+def imprimir_delta(delta):
+    print("\n📋 DELTA")
+    print(f"   Rebuild completo    : {'sim' if delta['rebuild'] else 'não'}")
+    print(f"   Índice ANN          : {(delta['ann'] or {}).get('tipo')}"
+          f"{' (remontar)' if delta['reindexar'] else ''}")
+    print(f"   Arquivos alterados  : {len(delta['arquivos_alterados'])}")
+    for f in delta["arquivos_alterados"]:
+        print(f"      ~ {f}")
+    print(f"   Arquivos removidos  : {len(delta['arquivos_removidos'])}")
+    for f in delta["arquivos_removidos"]:
+        print(f"      - {f}")
+    print(f"   Chunks a embedar    : {len(delta['adicionar'])}")
+    print(f"   Chunks a remover    : {len(delta['remover'])}")
+    print(f"   Chunks reaproveitados: {delta['manter']}\n")
 
 
 # ================================================================
-# 3. QUEBRAR DOCUMENTOS EM CHUNKS (RECOMENDADO PARA RAG)
+# 4. EMBEDDINGS EM LOTES (CONCORRÊNCIA LIMITADA)
 # ================================================================
-def chunk_documentos(docs, chunk_size=900, chunk_overlap=150):
-    chunks = []
-    for doc in docs:
-        texto = doc.page_content
-        palavras = texto.split()
+def embedar_em_lotes(embeddings, textos, batch_size=FAISS_BUILD_BATCH, concorrencia=FAISS_BUILD_CONCURRENCY):
+    """
+    Embeda `textos` em lotes de `batch_size`, com no máximo `concorrencia`
+    chamadas simultâneas. A ordem do resultado é a mesma da entrada.
+    (O governador de taxa continua valendo para cada lote.)
+    """
+    lotes = [textos[i:i + batch_size] for i in range(0, len(textos), batch_size)]
+    if not lotes:
+        return []
 
-        for i in range(0, len(palavras), chunk_size - chunk_overlap):
-            trecho = " ".join(palavras[i : i + chunk_size])
-            chunks.append(Document(
-                page_content=trecho,
-                metadata=doc.metadata
-            ))
-
-    print(f"Total de chunks gerados: {len(chunks)}")
-    return chunks
+    vetores = []
+    with ThreadPoolExecutor(max_workers=max(1, concorrencia), thread_name_prefix="faiss-build") as pool:
+        for i, resultado in enumerate(pool.map(embeddings.embed_documents, lotes), start=1):
+            vetores.extend(resultado)
+            print(f"   lote {i}/{len(lotes)} ({len(resultado)} chunks)")
+    return vetores
 
 
 # ================================================================
-# 4. CONSTRUIR ÍNDICE FAISS
+# 5. APLICAR DELTA E SALVAR (ATÔMICO)
 # ================================================================
-def construir_faiss(docs, save_path="data/faiss/index_anp"):
-    print("🔄 Gerando embeddings e criando índice FAISS...")
+def salvar_atomico(store, manifest, vetores, index_dir=INDEX_DIR):
+    """Grava em diretório temporário e troca pelo atual com rename."""
+    index_dir = Path(index_dir)
+    index_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp = index_dir.with_name(index_dir.name + ".tmp")
+    antigo = index_dir.with_name(index_dir.name + ".old")
+    shutil.rmtree(tmp, ignore_errors=True)
+    shutil.rmtree(antigo, ignore_errors=True)
+
+    store.save_local(str(tmp))
+    np.save(tmp / "vetores.npy", vetores)
+    (tmp / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+
+    if index_dir.exists():
+        os.replace(index_dir, antigo)
+    os.replace(tmp, index_dir)
+    shutil.rmtree(antigo, ignore_errors=True)
+
+
+def construir_faiss(chunks, delta, embeddings, index_dir=INDEX_DIR,
+                    batch_size=FAISS_BUILD_BATCH, concorrencia=FAISS_BUILD_CONCURRENCY):
+    index_dir = Path(index_dir)
+
+    if not delta["adicionar"] and not delta["remover"] and not delta["reindexar"]:
+        print("✅ Índice FAISS já está atualizado — nada a fazer.")
+        return
+
+    if len(chunks) == 0:
+        print("⚠️ Corpus vazio — índice não gerado.")
+        return
 
-    # Criar diretório se não existir
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    print(f"🔄 Gerando embeddings de {len(delta['adicionar'])} chunks...")
+    novos = dict(zip(
+        delta["adicionar"],
+        embedar_em_lotes(embeddings, chunks.textos(delta["adicionar"]), batch_size, concorrencia),
+    ))
 
-    store = FAISS.from_documents(docs, embeddings)
-    store.save_local(save_path)
-    print(f"✅ Índice FAISS salvo em: {save_path}")
+    # Vetores já embedados (chunks mantidos) vêm de vetores.npy
+    anteriores, posicao = None, {}
+    if not delta["rebuild"]:
+        anteriores = np.load(index_dir / "vetores.npy", mmap_mode="r")
+        posicao = {cid: i for i, cid in enumerate(ler_manifest(index_dir)["chunks"])}
+
+    ids = chunks.ids
+    vetores = np.array(
+        [novos[cid] if cid in novos else anteriores[posicao[cid]] for cid in ids],
+        dtype="float32",
+    )
+
+    ann = delta["ann"] or {}
+    index = construir_indice_ann(vetores, **ann)
+    docstore = InMemoryDocstore({
+        cid: Document(page_content=chunks.texto(cid), metadata=chunks.metadados(cid))
+        for cid in ids
+    })
+    store = FAISS(embeddings, index, docstore, dict(enumerate(ids)))
+
+    manifest = {
+        "versao": MANIFEST_VERSION,
+        "modelo": EMBED_MODEL,
+        "arquivos": delta["arquivos"],
+        "chunks": ids,
+        "ann": ann,
+    }
+    salvar_atomico(store, manifest, vetores, index_dir)
+    print(f"✅ Índice FAISS ({ann.get('tipo')}) salvo em: {index_dir} ({index.ntotal} vetores)")
 
 
 # ================================================================
-# 5. EXECUTAR PIPELINE COMPLETA
+# 6. EXECUTAR PIPELINE COMPLETA
 # ================================================================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build incremental do índice FAISS do corpus normativo")
+    parser.add_argument("--dry-run", action="store_true", help="Só mostra o delta (sem embeddings)")
+    parser.add_argument("--full", action="store_true", help="Ignora o manifest e reembeda tudo")
+    parser.add_argument("--batch-size", type=int, default=FAISS_BUILD_BATCH)
+    parser.add_argument("--concurrency", type=int, default=FAISS_BUILD_CONCURRENCY)
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=None,
+                        help="Tipo do índice ANN (padrão: FAISS_INDEX_TYPE)")
+    args = parser.parse_args()
+
+    ann = parametros_build()
+    if args.index_type:
+        ann["tipo"] = args.index_type
+
     print("=" * 60)
-    print("🧠 RECRIANDO ÍNDICE FAISS COM OPENAI EMBEDDINGS")
+    print("🧠 ATUALIZANDO ÍNDICE FAISS COM OPENAI EMBEDDINGS")
     print("=" * 60)
 
-    docs = carregar_md()
-    chunks = chunk_documentos(docs)
-    construir_faiss(chunks)
-
-    print("\n✅ CONCLUÍDO! Índice compatível com OpenAI criado.")
+    if args.dry_run:
+        # Chunking num store temporário: data/chunks (lido pelo servidor) fica intocado
+        with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+            chunks = carregar_chunks(store_dir=tmp)
+            imprimir_delta(calcular_delta(chunks, ler_manifest(), full=args.full, ann=ann, store_dir=tmp))
+        print("🔎 Dry-run: nenhuma alteração gravada.")
+    else:
+        chunks = carregar_chunks()
+        delta = calcular_delta(chunks, ler_manifest(), full=args.full, ann=ann)
+        imprimir_delta(delta)
+        construir_faiss(
+            chunks, delta, carregar_embeddings(),
+            batch_size=args.batch_size, concorrencia=args.concurrency,
+        )
+        print("\n✅ CONCLUÍDO! Índice compatível com OpenAI atualizado.")
@@ -54,6 +54,8 @@ USE_HYDE = os.getenv("USE_HYDE", "0") == "1"
 #   - Manualmente via state["_skip_rag"] = False
 #   - Após HITL quando contexto externo é necessário
 #   - Quando memória FAISS estiver habilitada
+#   - Sob demanda, por nó, quando a 1ª avaliação do nó é incerta
+#     (RAG_ON_DEMAND=1, ver lats/rag_sob_demanda.py)
 #
 # Para SEMPRE executar RAG (comportamento anterior), defina SKIP_RAG_DEFAULT=0
 SKIP_RAG_DEFAULT = os.getenv("SKIP_RAG_DEFAULT", "1") == "1"
@@ -77,6 +79,12 @@ else:
     RAG_RERANK_TOP_N = 5
     RAG_MAX_CONTEXT_LENGTH = 3000
 
+# Rerank: RRF local (sem LLM) é o padrão no caminho quente.
+# RAG_RERANK_LLM=1 reativa o rerank LLM como 2º estágio sobre o top-N do RRF
+RAG_RERANK_LLM = os.getenv("RAG_RERANK_LLM", "0") == "1"
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+RAG_LEXICAL_WEIGHT = float(os.getenv("RAG_LEXICAL_WEIGHT", "0.5"))
+
 
 # ===================================================================
 # PARÂMETROS LLM
@@ -127,6 +135,9 @@ def get_fast_mode_config() -> Dict[str, Any]:
             "bm25_k": RAG_BM25_K,
             "semantic_k": RAG_SEMANTIC_K,
             "rerank_top_n": RAG_RERANK_TOP_N,
+            "rerank_llm": RAG_RERANK_LLM,
+            "rrf_k": RAG_RRF_K,
+            "lexical_weight": RAG_LEXICAL_WEIGHT,
             "max_context_length": RAG_MAX_CONTEXT_LENGTH,
         },
         "llm": {
@@ -0,0 +1,192 @@
+# lats_sistema/config/http_pool.py
+"""
+Pool HTTP compartilhado (sync + async) para todas as chamadas à API OpenAI.
+
+OTIMIZAÇÃO: Antes, cada modelo criado pelo factory abria o próprio cliente
+HTTP (e settings.get_http_client() criava um novo a cada chamada). Sob carga
+concorrente isso gerava handshakes TLS repetidos e churn de conexões.
+
+Aqui existe UM cliente por processo (sync e async), com:
+- Limites de keep-alive configuráveis via env
+- HTTP/2 quando o pacote `h2` estiver instalado
+- CA customizado (petrobras-ca-root.pem) quando presente
+- Recriação automática após fork (pid diferente)
+"""
+
+import os
+import atexit
+import asyncio
+import logging
+import threading
+import importlib.util
+from pathlib import Path
+from typing import Dict, Any
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Mesmo layout de settings.py (sem depender do config.ini)
+BASE_DIR = Path(__file__).resolve().parents[2]
+CA_CERT_FILE = BASE_DIR / "petrobras-ca-root.pem"
+
+SERVERLESS_FAST_MODE = os.getenv("SERVERLESS_FAST_MODE", "0") == "1"
+
+# ===================================================================
+# PARÂMETROS DO POOL
+# ===================================================================
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+
+# HTTP/2 só é habilitado se solicitado E se o pacote h2 estiver disponível
+HTTP2_REQUESTED = os.getenv("HTTP2_ENABLED", "1") == "1"
+HTTP2_ENABLED = HTTP2_REQUESTED and importlib.util.find_spec("h2") is not None
+
+# ===================================================================
+# ESTADO DO PROCESSO
+# ===================================================================
+_lock = threading.Lock()
+_clients: Dict[str, Any] = {}
+_pid = None
+_requests_total = {"sync": 0, "async": 0}
+
+
+def _verify():
+    """CA customizado em modo local (se existir), padrão do sistema caso contrário."""
+    if not SERVERLESS_FAST_MODE and CA_CERT_FILE.exists():
+        return str(CA_CERT_FILE)
+    return True
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _contar(tipo: str):
+    with _lock:
+        _requests_total[tipo] += 1
+
+
+def _contar_sync(request):
+    _contar("sync")
+
+
+async def _contar_async(request):
+    _contar("async")
+
+
+def _reset_se_fork():
+    """Clientes httpx não sobrevivem a fork: recria se o pid mudou."""
+    global _pid
+    pid = os.getpid()
+    if _pid != pid:
+        _clients.clear()
+        _requests_total["sync"] = 0
+        _requests_total["async"] = 0
+        _pid = pid
+
+
+# ===================================================================
+# CLIENTES COMPARTILHADOS
+# ===================================================================
+def get_shared_http_client() -> httpx.Client:
+    """Retorna o cliente HTTP síncrono compartilhado do processo."""
+    with _lock:
+        _reset_se_fork()
+        client = _clients.get("sync")
+        if client is None or client.is_closed:
+            client = httpx.Client(
+                verify=_verify(),
+                limits=_limits(),
+                http2=HTTP2_ENABLED,
+                timeout=HTTP_TIMEOUT,
+                event_hooks={"request": [_contar_sync]},
+            )
+            _clients["sync"] = client
+            logger.info(
+                f"[HTTP POOL] Cliente sync criado | max_conn={HTTP_MAX_CONNECTIONS} | "
+                f"keepalive={HTTP_MAX_KEEPALIVE} | http2={HTTP2_ENABLED}"
+            )
+        return client
+
+
+def get_shared_async_http_client() -> httpx.AsyncClient:
+    """Retorna o cliente HTTP assíncrono compartilhado do processo."""
+    with _lock:
+        _reset_se_fork()
+        client = _clients.get("async")
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                verify=_verify(),
+                limits=_limits(),
+                http2=HTTP2_ENABLED,
+                timeout=HTTP_TIMEOUT,
+                event_hooks={"request": [_contar_async]},
+            )
+            _clients["async"] = client
+            logger.info(
+                f"[HTTP POOL] Cliente async criado | max_conn={HTTP_MAX_CONNECTIONS} | "
+                f"keepalive={HTTP_MAX_KEEPALIVE} | http2={HTTP2_ENABLED}"
+            )
+        return client
+
+
+# ===================================================================
+# ESTATÍSTICAS (expostas em métricas)
+# ===================================================================
+def _stats_pool(client) -> Dict[str, int]:
+    """Inspeciona o pool do httpcore de forma defensiva (API interna)."""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    conexoes = list(getattr(pool, "connections", None) or [])
+    ociosas = 0
+    for c in conexoes:
+        try:
+            if c.is_idle():
+                ociosas += 1
+        except Exception:
+            continue
+    return {
+        "conexoes": len(conexoes),
+        "ativas": len(conexoes) - ociosas,
+        "ociosas": ociosas,
+    }
+
+
+def get_http_pool_stats() -> Dict[str, Any]:
+    """Retorna estatísticas dos pools HTTP do processo."""
+    stats = {
+        "http2": HTTP2_ENABLED,
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "max_keepalive": HTTP_MAX_KEEPALIVE,
+    }
+    for tipo in ("sync", "async"):
+        client = _clients.get(tipo)
+        if client is None or client.is_closed:
+            stats[tipo] = {"conexoes": 0, "ativas": 0, "ociosas": 0, "requests": 0}
+            continue
+        stats[tipo] = _stats_pool(client)
+        stats[tipo]["requests"] = _requests_total[tipo]
+    return stats
+
+
+@atexit.register
+def _fechar_clientes():
+    client = _clients.get("sync")
+    if client is not None and not client.is_closed:
+        try:
+            client.close()
+        except Exception:
+            pass
+    client = _clients.get("async")
+    if client is not None and not client.is_closed:
+        try:
+            # Loop do servidor já encerrado no atexit: fecha num loop próprio
+            asyncio.run(client.aclose())
+        except Exception:
+            pass
@@ -73,16 +73,18 @@ else:
 # ============================
 def get_http_client():
     """
-    Retorna cliente HTTP com certificado CA (modo local) ou padrão (serverless).
+    Retorna o cliente HTTP compartilhado do processo (pool com keep-alive),
+    com certificado CA (modo local) ou padrão (serverless).
     """
+    from lats_sistema.config.http_pool import get_shared_http_client
+
     if SERVERLESS_FAST_MODE:
         # Modo serverless: usar certificados padrão do sistema
-        logger.info("[HTTP CLIENT] Modo serverless - usando certificados padrão")
-        return httpx.Client()
+        return get_shared_http_client()
 
     # Modo local: usar CA customizado
     if not CA_CERT_FILE.exists():
         raise FileNotFoundError(
             f"[ERRO] Certificado CA não encontrado: {CA_CERT_FILE}."
         )
-    return httpx.Client(verify=str(CA_CERT_FILE))
+    return get_shared_http_client()
@@ -18,7 +18,7 @@ Saída esperada: um dicionário com, por exemplo:
 """
 
 from typing import Dict, Any, List
-from lats_sistema.models.llm import llm_json  # ou llm_text se preferir
+from lats_sistema.models.llm import llm_json, invoke_llm  # ou llm_text se preferir
 
 
 PROMPT_MELHORIA = """
@@ -85,7 +85,7 @@ def sugerir_melhoria_pergunta(
     )
 
     try:
-        resp = llm_json.invoke(prompt)
+        resp = invoke_llm(llm_json, prompt, call_site="improve_questions", prioridade="batch")
         raw = resp.content.strip()
 
         # Proteção para ```json
@@ -17,6 +17,9 @@ from datetime import datetime
 from lats_sistema.lats.engine import executar_lats
 from lats_sistema.lats.tree_loader import ARVORE, NODE_INDEX, ROOT_ID
 
+# Chamadas em lote cedem a vez às requisições interativas no governador
+from lats_sistema.models.governor import prioridade
+
 # ================================
 # MÉTRICAS
 # ================================
@@ -201,7 +204,8 @@ if __name__ == "__main__":
     print("📘 Iniciando refinamento offline da árvore LATS-P\n")
 
     eventos = carregar_eventos()
-    resultados, entropy_tracker = processar_eventos(eventos)
+    with prioridade("batch"):
+        resultados, entropy_tracker = processar_eventos(eventos)
 
     salvar_relatorios(resultados, entropy_tracker)
 
@@ -2,8 +2,7 @@
 # graph/nodes.py — RAG + LATS-P + HITL (Streamlit + Prints)
 # ================================================================
 
-from typing import Dict, Any, List
-from langchain_core.documents import Document
+from typing import Dict, Any
 import logging
 
 # ===================================================================
@@ -14,62 +13,27 @@ from lats_sistema.config.fast_mode import SERVERLESS_FAST_MODE
 # Imports sempre necessários (não dependem de FAISS)
 from lats_sistema.lats.engine import executar_lats
 from lats_sistema.lats.tree_loader import NODE_INDEX
+from lats_sistema.lats.context_budget import aparar_texto
 
 logger = logging.getLogger(__name__)
 
 # Imports pesados (RAG/FAISS) - apenas quando NÃO estiver em serverless mode
 if not SERVERLESS_FAST_MODE:
-    from lats_sistema.rag.hyde import hyde_generate
-    from lats_sistema.rag.bm25_search import buscar_bm25
-    from lats_sistema.rag.semantic_search import buscar_semantico
-    from lats_sistema.rag.reranker import rerank
+    from lats_sistema.rag.pipeline import executar_retrieval
+    from lats_sistema.rag.cache import buscar_rag_cache, salvar_rag_cache
+    from lats_sistema.rag.reranker import rerank_fusao
     from lats_sistema.rag.synthesizer import sintetizar
-    from lats_sistema.vectorstore.corpus_loader import carregar_corpus_normativo
 else:
     # Placeholders para evitar erros de nome não definido
     # Estes nunca serão chamados porque o RAG será bypassado
-    hyde_generate = None
-    buscar_bm25 = None
-    buscar_semantico = None
-    rerank = None
+    executar_retrieval = None
+    buscar_rag_cache = None
+    salvar_rag_cache = None
+    rerank_fusao = None
     sintetizar = None
-    carregar_corpus_normativo = None
     logger.info("[SERVERLESS MODE] RAG imports bypassados - FAISS não será carregado")
 
 
-# ================================================================
-# Função de deduplicação de textos (strings e Documents)
-# ================================================================
-def deduplicar_textos(items: List) -> List[str]:
-    """
-    Remove textos duplicados de uma lista mista de strings e Documents.
-    Preserva ordem do primeiro item encontrado.
-
-    Args:
-        items: Lista de strings ou Documents LangChain
-
-    Returns:
-        Lista deduplic ada de strings
-    """
-    vistos = set()
-    resultado = []
-    for item in items:
-        # Normalizar para string
-        if isinstance(item, str):
-            texto = item.strip()
-        elif hasattr(item, 'page_content'):
-            texto = item.page_content.strip()
-        else:
-            texto = str(item).strip()
-
-        # Deduplicar
-        if texto and texto not in vistos:
-            vistos.add(texto)
-            resultado.append(texto)
-
-    return resultado
-
-
 # ================================================================
 # Nó RAG — com prints e FAST_MODE support
 # ================================================================
@@ -109,6 +73,13 @@ def no_rag(state: Dict[str, Any]) -> Dict[str, Any]:
 
     evento = state["descricao_evento"]
 
+    # ⚡ CACHE: retomada de HITL / evento repetido → reutiliza o contexto
+    cache = buscar_rag_cache(state, evento)
+    if cache is not None:
+        print(f"⚡ RAG cache HIT: {len(cache['contexto'])} caracteres reutilizados")
+        state["contexto_normativo"] = cache["contexto"]
+        return state
+
     print("\n==============================")
     if FAST_MODE_ENABLED:
         print(" ⚡ RAG: Gerando contexto (FAST MODE)")
@@ -117,43 +88,40 @@ def no_rag(state: Dict[str, Any]) -> Dict[str, Any]:
     print("==============================\n")
     print(f"Evento: {evento}\n")
 
-    # HyDE (condicional)
-    if RAG_HYDE_ENABLED:
-        hyde_doc = hyde_generate(evento)
-        query_rag = evento + " " + hyde_doc
-        print("✓ HyDE gerado")
-    else:
-        hyde_doc = ""
-        query_rag = evento
-        print("⚡ HyDE desabilitado (FAST_MODE)")
-
-    # BM25 + Semântico com k configurável
-    corpus = carregar_corpus_normativo()
-    bm25 = buscar_bm25(query_rag, corpus, n=RAG_BM25_K)  # usa parâmetro 'n'
-    sem_all = buscar_semantico(evento)  # retorna todos
-    sem = sem_all[:RAG_SEMANTIC_K]  # limita manualmente
-
-    print(f"✓ BM25: {len(bm25)} docs | Semântico: {len(sem)} docs")
-
-    # Combinar candidatos e deduplicar (normaliza tudo para strings)
-    candidatos = deduplicar_textos(bm25 + sem)
-    if hyde_doc:
-        candidatos.append(hyde_doc)
-
-    # Rerank - pega todos e limita depois
-    ranking_all = rerank(evento, candidatos)
-    ranking = ranking_all[:RAG_RERANK_TOP_N]
+    # Recuperação concorrente (HyDE ∥ BM25 ∥ semântico) com timeout por etapa
+    retrieval = executar_retrieval(
+        state, evento,
+        usar_hyde=RAG_HYDE_ENABLED,
+        bm25_k=RAG_BM25_K,
+        semantic_k=RAG_SEMANTIC_K,
+    )
+    rankings = retrieval["rankings"]
+    print("✓ Etapas: " + " | ".join(f"{k}={v}" for k, v in retrieval["etapas"].items()))
+    print(f"✓ BM25: {len(rankings.get('bm25', []))} docs | Semântico: {len(rankings.get('semantico', []))} docs")
+
+    # Fusão RRF local (dedup por chunk_id) + rerank LLM opcional (2º estágio)
+    ranking = rerank_fusao(evento, rankings, top_n=RAG_RERANK_TOP_N)
+    if not ranking:
+        logger.warning("[RAG] Nenhum retriever retornou candidatos — contexto vazio")
+        state["contexto_normativo"] = ""
+        return state
 
     # Sintetizar
     contexto = sintetizar(evento, ranking)
 
-    # Limitar tamanho do contexto se necessário
+    # Limitar tamanho do contexto se necessário (parágrafos menos relevantes
+    # para o evento saem primeiro; o orçamento fino em tokens é por nó, no engine)
     if len(contexto) > RAG_MAX_CONTEXT_LENGTH:
-        contexto = contexto[:RAG_MAX_CONTEXT_LENGTH] + "... [truncado]"
+        contexto = aparar_texto(contexto, evento, RAG_MAX_CONTEXT_LENGTH, medida=len)
 
     print(f"✓ Contexto final: {len(contexto)} caracteres\n")
 
     state["contexto_normativo"] = contexto
+
+    # Só cacheia resultado completo (etapa degradada não fica no cache)
+    if all(v == "ok" for v in retrieval["etapas"].values()):
+        candidatos = list(dict.fromkeys(cid for lista in rankings.values() for cid, _ in lista))
+        salvar_rag_cache(state, evento, contexto, candidatos, ranking)
     return state
 
 
@@ -0,0 +1,267 @@
+# lats_sistema/lats/context_budget.py
+"""
+Orçamento de tokens do prompt do evaluator, por nó.
+
+Conta tokens de cada segmento (instruções, nó, evento, contexto normativo,
+context pack, memórias), divide o que sobra entre os segmentos variáveis
+por peso e apara por relevância ao evento + pergunta do nó. Sem tiktoken,
+estima ~4 chars/token.
+
+Variáveis:
+- CONTEXT_BUDGET          → liga / desliga (padrão 1)
+- CONTEXT_BUDGET_TOKENS   → orçamento do prompt (padrão 3000; 1500 em FAST_MODE)
+- CONTEXT_BUDGET_MIN      → piso para os segmentos variáveis (padrão 300)
+- CONTEXT_BUDGET_ENCODING → encoding do tiktoken (padrão o200k_base)
+"""
+
+import os
+import re
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from lats_sistema.config.fast_mode import FAST_MODE_ENABLED
+from lats_sistema.utils.metrics import PROMPT_TOKENS, PROMPT_TOKENS_CORTADOS
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_BUDGET_ENABLED = os.getenv("CONTEXT_BUDGET", "1") == "1"
+CONTEXT_BUDGET_TOKENS = int(os.getenv("CONTEXT_BUDGET_TOKENS", "1500" if FAST_MODE_ENABLED else "3000"))
+CONTEXT_BUDGET_MIN = int(os.getenv("CONTEXT_BUDGET_MIN", "300"))
+CONTEXT_BUDGET_ENCODING = os.getenv("CONTEXT_BUDGET_ENCODING", "o200k_base")
+
+# Divisão do orçamento variável entre os segmentos
+PESOS_SEGMENTOS = {"normativo": 0.5, "pack": 0.3, "memorias": 0.2}
+
+CABECALHO_PACK = "\n\n[DEFINIÇÕES NORMATIVAS DO NÓ]\n"
+CABECALHO_MEMORIAS = "\n\n[HISTÓRICO DE DECISÕES HUMANAS RELEVANTES]\n"
+SEM_MEMORIAS = "Nenhuma memória relevante encontrada para este nó.\n"
+
+_TERMO_RE = re.compile(r"\w{3,}")
+
+# Lazy loading: encoding e tokens fixos calculados uma vez por processo
+_cache: Dict[str, Any] = {}
+
+
+# ===================================================================
+# CONTAGEM DE TOKENS
+# ===================================================================
+def _encoding():
+    if "encoding" not in _cache:
+        try:
+            import tiktoken
+            _cache["encoding"] = tiktoken.get_encoding(CONTEXT_BUDGET_ENCODING)
+        except Exception as e:
+            logger.warning(f"[BUDGET] tiktoken indisponível ({e}) — usando estimativa por caracteres")
+            _cache["encoding"] = None
+    return _cache["encoding"]
+
+
+def contar_tokens(texto: str) -> int:
+    if not texto:
+        return 0
+    enc = _encoding()
+    if enc is None:
+        return len(texto) // 4 + 1  # mesma estimativa do governador
+    return len(enc.encode(texto, disallowed_special=()))
+
+
+def cortar_tokens(texto: str, max_tokens: int) -> str:
+    """Primeiros `max_tokens` tokens do texto."""
+    if max_tokens <= 0:
+        return ""
+    enc = _encoding()
+    if enc is None:
+        return texto[: max_tokens * 4]
+    tokens = enc.encode(texto, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return texto
+    return enc.decode(tokens[:max_tokens])
+
+
+# ===================================================================
+# APARAR POR RELEVÂNCIA
+# ===================================================================
+def relevancia_lexical(consulta: str, trecho: str) -> float:
+    """Fração dos termos (distintos) da consulta presentes no trecho."""
+    termos = set(_TERMO_RE.findall(consulta.lower()))
+    if not termos:
+        return 0.0
+    return len(termos & set(_TERMO_RE.findall(trecho.lower()))) / len(termos)
+
+
+def aparar_por_relevancia(
+    itens: Sequence[Tuple[str, float]],
+    limite: int,
+    medida: Callable[[str], int] = contar_tokens,
+    separador: str = "\n\n",
+) -> Tuple[List[str], int]:
+    """
+    Seleciona os itens mais relevantes que cabem em `limite` (na unidade de
+    `medida`), preservando a ordem original.
+
+    Se nem o item mais relevante couber, ele entra cortado no limite.
+
+    Returns:
+        (itens mantidos, quantidade cortada na unidade de `medida`)
+    """
+    tamanhos = [medida(t) for t, _ in itens]
+    total = sum(tamanhos) + medida(separador) * max(0, len(itens) - 1)
+    if total <= limite:
+        return [t for t, _ in itens], 0
+
+    if limite <= 0:
+        return [], total
+
+    sep = medida(separador)
+    ordem = sorted(range(len(itens)), key=lambda i: itens[i][1], reverse=True)
+    mantidos, usado = set(), 0
+    for i in ordem:
+        custo = tamanhos[i] + (sep if mantidos else 0)
+        if usado + custo <= limite:
+            mantidos.add(i)
+            usado += custo
+
+    if not mantidos and ordem:
+        i = ordem[0]
+        texto = cortar_tokens(itens[i][0], limite) if medida is contar_tokens else itens[i][0][:limite]
+        return [texto], total - medida(texto)
+
+    return [itens[i][0] for i in sorted(mantidos)], total - usado
+
+
+def _paragrafos(texto: str) -> List[str]:
+    return [p.strip() for p in re.split(r"\n\s*\n", texto or "") if p.strip()]
+
+
+def aparar_texto(
+    texto: str,
+    consulta: str,
+    limite: int,
+    medida: Callable[[str], int] = contar_tokens,
+) -> str:
+    """Apara um texto por parágrafos, mantendo os mais relevantes para a consulta."""
+    itens = [(p, relevancia_lexical(consulta, p)) for p in _paragrafos(texto)]
+    mantidos, _ = aparar_por_relevancia(itens, limite, medida)
+    return "\n\n".join(mantidos)
+
+
+# ===================================================================
+# SEGMENTOS FIXOS
+# ===================================================================
+def _tokens_instrucoes() -> int:
+    """Tokens do template do evaluator sem nenhum campo preenchido."""
+    if "instrucoes" not in _cache:
+        from lats_sistema.lats.evaluator import montar_prompt_avaliador
+        _cache["instrucoes"] = contar_tokens(montar_prompt_avaliador({"id": ""}, "", ""))
+    return _cache["instrucoes"]
+
+
+def _tokens_no(node: Dict[str, Any]) -> int:
+    # A árvore é estática: bloco do nó contado uma vez por node_id
+    por_no = _cache.setdefault("nos", {})
+    if node["id"] not in por_no:
+        from lats_sistema.lats.utils import formatar_filhos
+        por_no[node["id"]] = contar_tokens(
+            f"{node['id']}\n{node.get('pergunta', '')}\n{formatar_filhos(node)}"
+        )
+    return por_no[node["id"]]
+
+
+def _distribuir(disponivel: int, necessidades: Dict[str, int]) -> Dict[str, int]:
+    """Divide o orçamento por peso; o que um segmento não usa vai para os outros."""
+    cotas = {nome: 0 for nome in necessidades}
+    pendentes = {nome for nome, n in necessidades.items() if n > 0}
+    restante = disponivel
+    while pendentes and restante > 0:
+        peso_total = sum(PESOS_SEGMENTOS[n] for n in pendentes)
+        saciados = set()
+        for nome in pendentes:
+            parte = int(restante * PESOS_SEGMENTOS[nome] / peso_total)
+            if cotas[nome] + parte >= necessidades[nome]:
+                saciados.add(nome)
+        if not saciados:
+            for nome in pendentes:
+                cotas[nome] += int(restante * PESOS_SEGMENTOS[nome] / peso_total)
+            break
+        for nome in saciados:
+            restante -= necessidades[nome] - cotas[nome]
+            cotas[nome] = necessidades[nome]
+        pendentes -= saciados
+    return cotas
+
+
+# ===================================================================
+# MONTAGEM DO CONTEXTO DO NÓ
+# ===================================================================
+def formatar_memoria(m: Dict[str, Any]) -> str:
+    # Espera-se que cada memória tenha: event_text, chosen_child, justification_human
+    event_resumo = (m.get("event_text") or "")[:160].replace("\n", " ")
+    return (
+        f"- Evento similar: \"{event_resumo}...\"\n"
+        f"  → Humano escolheu o filho: `{m.get('chosen_child')}`\n"
+        f"    Justificativa humana: {m.get('justification_human')}\n"
+    )
+
+
+def montar_contexto_no(
+    node: Dict[str, Any],
+    evento: str,
+    contexto_normativo: str,
+    context_pack: str,
+    memorias: Optional[List[Dict[str, Any]]],
+) -> Tuple[str, str, Dict[str, int]]:
+    """
+    Monta o contexto do evaluator para o nó dentro do orçamento de tokens.
+
+    Returns:
+        (contexto, bloco de memórias, tokens por segmento)
+    """
+    consulta = f"{evento} {node.get('pergunta', '')}"
+    memorias = memorias or []
+
+    itens = {
+        "normativo": [(p, relevancia_lexical(consulta, p)) for p in _paragrafos(contexto_normativo)],
+        "pack": [(p, relevancia_lexical(consulta, p)) for p in _paragrafos(context_pack)],
+        # Memórias já vêm ordenadas por similaridade com o evento
+        "memorias": [(formatar_memoria(m), 1.0 / (1 + i)) for i, m in enumerate(memorias)],
+    }
+    separadores = {"normativo": "\n\n", "pack": "\n\n", "memorias": ""}
+
+    tokens = {
+        "instrucoes": _tokens_instrucoes(),
+        "no": _tokens_no(node),
+        "evento": contar_tokens(evento),
+    }
+    necessidades = {
+        nome: sum(contar_tokens(t) for t, _ in lista)
+        + contar_tokens(separadores[nome]) * max(0, len(lista) - 1)
+        for nome, lista in itens.items()
+    }
+
+    if CONTEXT_BUDGET_ENABLED:
+        fixos = tokens["instrucoes"] + tokens["no"] + tokens["evento"]
+        disponivel = max(CONTEXT_BUDGET_MIN, CONTEXT_BUDGET_TOKENS - fixos)
+        cotas = _distribuir(disponivel, necessidades)
+    else:
+        cotas = necessidades
+
+    textos, sobra = {}, 0
+    for nome, lista in itens.items():
+        # Aparar por itens inteiros pode deixar sobra → passa ao próximo segmento
+        cota = cotas[nome] + sobra
+        mantidos, cortados = aparar_por_relevancia(lista, cota, separador=separadores[nome])
+        textos[nome] = separadores[nome].join(mantidos)
+        tokens[nome] = necessidades[nome] - cortados
+        sobra = max(0, cota - tokens[nome])
+        if cortados:
+            PROMPT_TOKENS_CORTADOS.labels(segmento=nome).inc(cortados)
+
+    bloco_pack = CABECALHO_PACK + textos["pack"] + "\n" if textos["pack"] else ""
+    bloco_memorias = CABECALHO_MEMORIAS + (textos["memorias"] or SEM_MEMORIAS)
+    contexto = textos["normativo"] + bloco_pack + bloco_memorias
+
+    tokens["total"] = sum(tokens.values())
+    for nome, n in tokens.items():
+        PROMPT_TOKENS.labels(segmento=nome).observe(n)
+
+    return contexto, bloco_memorias, tokens
@@ -0,0 +1,174 @@
+# lats_sistema/lats/context_packs.py
+"""
+Context packs normativos pré-computados por nó da árvore.
+
+Problema: o evaluator recebe um único `contexto_normativo` genérico para o
+evento inteiro (RAG por requisição) — ou nada, com SKIP_RAG_DEFAULT=1. O
+texto que importa em cada nó é a definição normativa por trás da `pergunta`
+do nó, e ela é a MESMA para todos os eventos.
+
+Solução:
+- Build OFFLINE: para cada nó de decisão, recupera (BM25 + semântico, RRF)
+  os trechos de padroes_petrobras ligados à pergunta/filhos e condensa
+  (LLM, ou extrativo com --sem-llm)
+- Salvo ao lado da árvore (arvore_lats.packs.json) com a versão da árvore;
+  packs de outra versão são ignorados
+- Online: o engine injeta o pack do nó em avaliar_filhos_llm — custo zero
+  de retrieval, inclusive em SERVERLESS_FAST_MODE (só lê JSON)
+
+Uso (build):
+    python -m lats_sistema.lats.context_packs            # condensa via LLM
+    python -m lats_sistema.lats.context_packs --sem-llm  # extrativo
+"""
+
+import os
+import json
+import logging
+import argparse
+from typing import Any, Dict, Optional
+
+from lats_sistema.lats import tree_loader
+from lats_sistema.lats.utils import eh_terminal, formatar_filhos
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_PACKS_ENABLED = os.getenv("CONTEXT_PACKS", "1") == "1"
+CONTEXT_PACKS_PATH = os.getenv(
+    "CONTEXT_PACKS_PATH",
+    os.path.join(tree_loader.BASE_DIR, "arvore_lats.packs.json"),
+)
+CONTEXT_PACK_MAX_CHARS = int(os.getenv("CONTEXT_PACK_MAX_CHARS", "1500"))
+CONTEXT_PACK_TOP_N = int(os.getenv("CONTEXT_PACK_TOP_N", "4"))
+
+# Lazy loading (cold start serverless): lido uma vez por processo
+_cache: Dict[str, Any] = {}
+
+
+# ===================================================================
+# LEITURA (ONLINE)
+# ===================================================================
+def _carregar_packs() -> Dict[str, Dict[str, Any]]:
+    if "packs" in _cache:
+        return _cache["packs"]
+
+    packs = {}
+    if CONTEXT_PACKS_ENABLED and os.path.exists(CONTEXT_PACKS_PATH):
+        try:
+            with open(CONTEXT_PACKS_PATH, encoding="utf-8") as f:
+                dados = json.load(f)
+            if dados.get("tree_version") == tree_loader.TREE_VERSION:
+                packs = dados.get("packs", {})
+                logger.info(f"[PACKS] {len(packs)} context packs carregados (árvore {tree_loader.TREE_VERSION})")
+            else:
+                logger.warning(
+                    f"[PACKS] Packs gerados para a árvore {dados.get('tree_version')}, "
+                    f"atual é {tree_loader.TREE_VERSION} — ignorados (rode o build)"
+                )
+        except Exception as e:
+            logger.warning(f"[PACKS] Falha ao carregar {CONTEXT_PACKS_PATH}: {e}")
+
+    _cache["packs"] = packs
+    return packs
+
+
+def get_context_pack(node_id: str) -> str:
+    """Texto normativo condensado do nó ("" se não houver pack)."""
+    pack = _carregar_packs().get(node_id)
+    return (pack or {}).get("texto", "")
+
+
+# ===================================================================
+# BUILD (OFFLINE)
+# ===================================================================
+def _query_do_no(node: Dict[str, Any]) -> str:
+    partes = [node.get("pergunta", ""), node.get("resposta_esperada", "")]
+    partes += [f.get("pergunta", "") or f.get("classe", "") for f in node.get("subnodos", [])]
+    return " ".join(p for p in partes if p)
+
+
+def _condensar_llm(node: Dict[str, Any], trechos: str) -> str:
+    from langchain_core.prompts import ChatPromptTemplate
+    from lats_sistema.models.llm import llm_text, invoke_llm
+
+    prompt = ChatPromptTemplate.from_template("""
+Condense, a partir dos TRECHOS NORMATIVOS, apenas as definições e critérios
+necessários para responder à PERGUNTA do nó e distinguir entre os FILHOS.
+Não invente conteúdo; cite o padrão de origem quando possível.
+Máximo de {max_chars} caracteres.
+
+PERGUNTA:
+{pergunta}
+
+FILHOS:
+{filhos}
+
+TRECHOS NORMATIVOS:
+{trechos}
+
+RESUMO:
+""")
+    mensagens = prompt.format_messages(
+        max_chars=CONTEXT_PACK_MAX_CHARS,
+        pergunta=node.get("pergunta", ""),
+        filhos=formatar_filhos(node),
+        trechos=trechos,
+    )
+    return invoke_llm(llm_text, mensagens, call_site="context_pack", prioridade="batch").content.strip()
+
+
+def construir_packs(usar_llm: bool = True, usar_semantico: bool = True) -> Dict[str, Any]:
+    """Gera os packs de todos os nós de decisão da árvore atual."""
+    from lats_sistema.rag.bm25_search import buscar_bm25_ids
+    from lats_sistema.rag.fusion import rrf_fusao
+    from lats_sistema.vectorstore.chunk_store import get_chunk_store
+
+    store = get_chunk_store()
+    packs = {}
+
+    for node_id, node in tree_loader.NODE_INDEX.items():
+        if eh_terminal(node) or not node.get("pergunta"):
+            continue
+
+        query = _query_do_no(node)
+        bm25_ids = [cid for cid, _ in buscar_bm25_ids(query, n=2 * CONTEXT_PACK_TOP_N)]
+        rankings = {"bm25": list(zip(bm25_ids, store.textos(bm25_ids)))}
+        if usar_semantico:
+            from lats_sistema.rag.semantic_search import buscar_semantico_ids
+            rankings["semantico"] = buscar_semantico_ids(query, k=2 * CONTEXT_PACK_TOP_N)
+
+        ranking = rrf_fusao(query, rankings, peso_lexical=0.5)[:CONTEXT_PACK_TOP_N]
+        if not ranking:
+            continue
+
+        trechos = "\n\n".join(
+            f"[{store.fonte(x['chunk_id']) if x['chunk_id'] in store else '?'}] {x['trecho']}"
+            for x in ranking
+        )
+        texto = _condensar_llm(node, trechos) if usar_llm else trechos
+        packs[node_id] = {
+            "texto": texto[:CONTEXT_PACK_MAX_CHARS],
+            "chunk_ids": [x["chunk_id"] for x in ranking],
+        }
+        print(f"✓ {node_id}: {len(packs[node_id]['texto'])} chars")
+
+    return packs
+
+
+def salvar_packs(packs: Dict[str, Any], path: Optional[str] = None):
+    path = path or CONTEXT_PACKS_PATH
+    dados = {"tree_version": tree_loader.TREE_VERSION, "packs": packs}
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dados, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    _cache.pop("packs", None)
+    print(f"✅ {len(packs)} context packs salvos em {path} (árvore {tree_loader.TREE_VERSION})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build dos context packs normativos por nó")
+    parser.add_argument("--sem-llm", action="store_true", help="Packs extrativos (sem condensação LLM)")
+    parser.add_argument("--sem-semantico", action="store_true", help="Só BM25 (sem índice FAISS)")
+    args = parser.parse_args()
+
+    salvar_packs(construir_packs(usar_llm=not args.sem_llm, usar_semantico=not args.sem_semantico))
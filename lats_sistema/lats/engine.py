@@ -13,12 +13,18 @@ from lats_sistema.lats.utils import (
     shannon_entropy,
 )
 from lats_sistema.lats.evaluator import avaliar_filhos_llm
+from lats_sistema.lats.local_scorer import avaliar_filhos_local
+from lats_sistema.models.circuit_breaker import llm_disponivel
+from lats_sistema.utils.metrics import NOS_AVALIADOS, HITL_ACIONADO, COLAPSOS
 from lats_sistema.lats.tree_loader import NODE_INDEX, ROOT_ID
 from lats_sistema.lats.hitl_gating import precisa_hitl, gerar_hitl_metadata
+from lats_sistema.lats.context_packs import get_context_pack
+from lats_sistema.lats.context_budget import montar_contexto_no
+from lats_sistema.lats.rag_sob_demanda import deve_buscar, contexto_sob_demanda, registrar_resultado
 
 # 🔁 Memória de decisões humanas (faz a ponte com SQLite + FAISS)
-from lats_sistema.memory.memory_retriever import buscar_justificativas_semelhantes
-from lats_sistema.memory.memory_saver import salvar_memoria_if_applicable
+from lats_sistema.memory.memory_retriever import prefetch_memorias, memorias_do_no
+from lats_sistema.memory.memory_writer import enfileirar_memoria, enfileirar_uso
 
 # ⚡ FAST_MODE support (NÃO afeta HITL)
 from lats_sistema.config.fast_mode import LATS_MAX_STEPS, LATS_TOP_FINAIS
@@ -43,7 +49,16 @@ def executar_lats(state: Dict[str, Any]) -> Dict[str, Any]:
     - Caso contrário, segue o fluxo normal do LATS-P.
     - Se precisa_hitl(...) retornar True, salva o checkpoint em campos
       'ultimo_*' no próprio state e seta 'hitl_required' = True.
+    - Ao sair (fim ou pausa para HITL), o uso das memórias entregues ao
+      evaluator vai UMA vez para a fila do memory_writer.
     """
+    try:
+        return _executar_lats(state)
+    finally:
+        enfileirar_uso(state.pop("_memorias_usadas", None) or [])
+
+
+def _executar_lats(state: Dict[str, Any]) -> Dict[str, Any]:
 
     print("\n==============================")
     print(" 🚀 EXECUTAR LATS-P")
@@ -78,6 +93,13 @@ def executar_lats(state: Dict[str, Any]) -> Dict[str, Any]:
 
     finais: List[Dict[str, Any]] = []
 
+    # 🧠 Memórias HITL: UMA busca por requisição, agrupada por nó
+    #    (reaproveitada nas retomadas de HITL — fica no state)
+    try:
+        prefetch_memorias(state, descricao or "", [c["node_id"] for c in candidatos], k=3)
+    except Exception as e:
+        print(f"⚠️ Erro no prefetch de memórias HITL: {e}")
+
     # =============================================================
     # LOOP LATS-P
     # =============================================================
@@ -114,45 +136,77 @@ def executar_lats(state: Dict[str, Any]) -> Dict[str, Any]:
         # 🔍 1) Recuperar memórias de decisões humanas semelhantes
         # ==========================================================
         try:
-            memorias = buscar_justificativas_semelhantes(
-                descricao_evento=descricao or "",
-                node_id=node_id_atual,
-                k=3,
-                state=state,  # ⚡ OTIMIZAÇÃO: Passa state para reutilizar embedding cached
-            )
+            # ⚡ OTIMIZAÇÃO: consulta a tabela do prefetch (sem nova busca vetorial)
+            memorias = memorias_do_no(state, descricao or "", node_id_atual, k=3)
         except Exception as e:
             print(f"⚠️ Erro ao buscar memórias HITL: {e}")
             memorias = []
 
-        trecho_memoria = ""
-        if memorias:
-            trecho_memoria = "\n\n[HISTÓRICO DE DECISÕES HUMANAS RELEVANTES]\n"
-            for m in memorias:
-                # Espera-se que cada memória tenha estas chaves:
-                # event_text, chosen_child, justification_human
-                event_resumo = (m.get("event_text") or "")[:160].replace("\n", " ")
-                trecho_memoria += (
-                    f"- Evento similar: \"{event_resumo}...\"\n"
-                    f"  → Humano escolheu o filho: `{m.get('chosen_child')}`\n"
-                    f"    Justificativa humana: {m.get('justification_human')}\n"
-                )
-        else:
-            trecho_memoria = (
-                "\n\n[HISTÓRICO DE DECISÕES HUMANAS RELEVANTES]\n"
-                "Nenhuma memória relevante encontrada para este nó.\n"
-            )
+        # Contexto passado para o LLM = contexto_normativo + definições
+        # normativas pré-computadas do nó (context pack) + memórias humanas,
+        # dentro do orçamento de tokens do nó (aparado por relevância)
+        contexto, trecho_memoria, tokens_prompt = montar_contexto_no(
+            node,
+            descricao or "",
+            contexto_base,
+            get_context_pack(node_id_atual),
+            memorias,
+        )
+        print(
+            f"🧮 Tokens do prompt: {tokens_prompt['total']} "
+            f"(normativo={tokens_prompt['normativo']}, pack={tokens_prompt['pack']}, "
+            f"memórias={tokens_prompt['memorias']})"
+        )
 
         # Guarda para debug / logging se quiser inspecionar depois
         state["memoria_hitl_contexto"] = trecho_memoria
 
-        # Contexto passado para o LLM = contexto_normativo + memórias humanas
-        contexto = contexto_base + trecho_memoria
-
         # ---------------------------------------------------------
         # 2) Avaliação dos filhos via LLM
+        #    (circuito aberto → pontuação local, marcada como degradada)
+        # ---------------------------------------------------------
+        degradado = False
+        if llm_disponivel():
+            print("🤖 Avaliando filhos via LLM...")
+            avaliacoes = avaliar_filhos_llm(node, descricao, contexto)
+        else:
+            avaliacoes = []
+
+        if not avaliacoes and not llm_disponivel():
+            print("🛟 Circuito LLM aberto — pontuação local (modo degradado)")
+            avaliacoes = avaliar_filhos_local(node, descricao or "", state)
+            degradado = bool(avaliacoes)
+            if degradado and not state.get("modo_degradado"):
+                state["modo_degradado"] = True
+                state["logs"].append(
+                    f"Modo degradado: LLM indisponível (circuito aberto) a partir do nó {node_id_atual}"
+                )
+
+        NOS_AVALIADOS.labels(modo="local" if degradado else "llm").inc()
+
         # ---------------------------------------------------------
-        print("🤖 Avaliando filhos via LLM...")
-        avaliacoes = avaliar_filhos_llm(node, descricao, contexto)
+        # 2b) RAG sob demanda: 1ª avaliação incerta → contexto
+        #     direcionado (evento + pergunta do nó) e reavaliação
+        #     antes de cair no HITL
+        # ---------------------------------------------------------
+        depth_no = len(atual["historico"]) + 1
+        if avaliacoes and not degradado and deve_buscar(state, node_id_atual, avaliacoes, depth_no):
+            print("🔎 Nó incerto — buscando contexto normativo sob demanda...")
+            extra = contexto_sob_demanda(state, node, descricao or "")
+            if extra:
+                contexto, trecho_memoria, tokens_prompt = montar_contexto_no(
+                    node,
+                    descricao or "",
+                    "\n\n".join(p for p in (contexto_base, extra) if p),
+                    get_context_pack(node_id_atual),
+                    memorias,
+                )
+                print(f"🤖 Reavaliando com contexto ({tokens_prompt['total']} tokens)...")
+                reavaliacoes = avaliar_filhos_llm(node, descricao, contexto)
+                if reavaliacoes:
+                    avaliacoes = reavaliacoes
+                    registrar_resultado(avaliacoes, depth_no)
+                    state["logs"].append(f"RAG sob demanda: nó {node_id_atual} reavaliado com contexto")
 
         if not avaliacoes:
             print("⚠️ Sem avaliações — usando fallback uniforme.")
@@ -214,6 +268,8 @@ def executar_lats(state: Dict[str, Any]) -> Dict[str, Any]:
                 "chosen_prob": 1.0,
                 "colapso_ontologico": True,  # Flag para auditoria
             }]
+            if degradado:
+                novo_hist[-1]["modo_degradado"] = True
 
             # Adicionar ao beam com log_prob inalterado (prob=1.0 → log=0)
             candidatos.append({
@@ -227,6 +283,7 @@ def executar_lats(state: Dict[str, Any]) -> Dict[str, Any]:
             # Isso garante que o sistema siga apenas o caminho determinístico
             candidatos = [candidatos[-1]]  # Manter apenas o caminho colapsado
 
+            COLAPSOS.labels(razao="filho_unico").inc()
             print("🔥 Beam limpo: apenas caminho ontológico será explorado")
             continue  # Pular cálculo de entropia, HITL, expansão paralela
 
@@ -264,6 +321,8 @@ def executar_lats(state: Dict[str, Any]) -> Dict[str, Any]:
                 "colapso_ontologico": True,  # Flag para auditoria
                 "colapso_razao": "score_deterministic",
             }]
+            if degradado:
+                novo_hist[-1]["modo_degradado"] = True
 
             # Adicionar ao beam
             candidatos.append({
@@ -275,6 +334,7 @@ def executar_lats(state: Dict[str, Any]) -> Dict[str, Any]:
             # ⚠️ CRÍTICO: LIMPAR BEAM de outros caminhos paralelos
             candidatos = [candidatos[-1]]  # Manter apenas o caminho determinístico
 
+            COLAPSOS.labels(razao="score_deterministic").inc()
             print("🔥 Beam limpo: apenas caminho determinístico será explorado")
             continue  # Pular cálculo de entropia, HITL, expansão paralela
 
@@ -342,6 +402,9 @@ def executar_lats(state: Dict[str, Any]) -> Dict[str, Any]:
 
             state["hitl_required"] = True
             state["hitl_metadata"] = gerar_hitl_metadata(node, etapa_info)
+            HITL_ACIONADO.inc()
+            if degradado:
+                state["hitl_metadata"]["modo_degradado"] = True
 
             state["logs"].append(
                 f"HITL acionado no nó {node_id_atual} "
@@ -376,6 +439,8 @@ def executar_lats(state: Dict[str, Any]) -> Dict[str, Any]:
                 "chosen_score": float(aval["score"]),
                 "chosen_prob": float(p),
             }]
+            if degradado:
+                novo_hist[-1]["modo_degradado"] = True
 
             candidatos.append({
                 "node_id": filho_id,
@@ -464,10 +529,11 @@ def _continuar_pos_hitl(state: Dict[str, Any]) -> Dict[str, Any]:
 
     # ---------------------------------------------------------------
     # 2) 🔥 Registrar memória humana (SQLite + FAISS) — se fizer sentido
-    #    (regras de deduplicação e entropia alta ficam no memory_saver)
+    #    (regras de deduplicação e entropia alta ficam no memory_saver;
+    #    a gravação em si roda em segundo plano no memory_writer)
     # ---------------------------------------------------------------
     try:
-        salvar_memoria_if_applicable(
+        enfileirar_memoria(
             state=state,
             node_id=atual["node_id"],
             chosen_child=escolhido,
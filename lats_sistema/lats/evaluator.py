@@ -7,17 +7,9 @@ from lats_sistema.lats.utils import formatar_filhos
 from lats_sistema.utils.json_utils import invoke_json
 
 # ---------------------------------------------------------
-# Avaliação via LLM – compara EVENTO vs FILHOS do nó atual
+# Prompt do evaluator (criado uma vez por processo)
 # ---------------------------------------------------------
-def avaliar_filhos_llm(node: Dict[str, Any], descricao_evento: str, contexto_normativo: str):
-    filhos = node.get("subnodos", [])
-    if not filhos:
-        return []
-
-    filhos_formatados = formatar_filhos(node)
-    contexto_normativo = contexto_normativo or ""
-
-    prompt = ChatPromptTemplate.from_template("""
+prompt_avaliador = ChatPromptTemplate.from_template("""
 Você é um CLASSIFICADOR NORMATIVO PETROBRAS/ANP baseado em uma ÁRVORE DE DECISÃO.
 
 ==================================================================
@@ -52,22 +44,37 @@ Retorne **apenas JSON**:
 }}
 """)
 
-    # Montar prompt completo
-    full_prompt = prompt.format(
-        contexto_normativo=contexto_normativo,
+
+def montar_prompt_avaliador(node: Dict[str, Any], descricao_evento: str, contexto_normativo: str) -> str:
+    """Prompt completo do evaluator para o nó (também usado no orçamento de tokens)."""
+    return prompt_avaliador.format(
+        contexto_normativo=contexto_normativo or "",
         descricao_evento=descricao_evento.strip(),
         node_id=node["id"],
         pergunta_atual=node.get("pergunta", ""),
-        filhos_formatados=filhos_formatados,
+        filhos_formatados=formatar_filhos(node),
     )
 
+
+# ---------------------------------------------------------
+# Avaliação via LLM – compara EVENTO vs FILHOS do nó atual
+# ---------------------------------------------------------
+def avaliar_filhos_llm(node: Dict[str, Any], descricao_evento: str, contexto_normativo: str):
+    filhos = node.get("subnodos", [])
+    if not filhos:
+        return []
+
+    # Montar prompt completo
+    full_prompt = montar_prompt_avaliador(node, descricao_evento, contexto_normativo)
+
     # Usar invoke_json com retry automático
     try:
         data = invoke_json(
             llm_json,
             full_prompt,
             max_retries=2,
-            schema_hint='{"avaliacoes": [{"id": "...", "score": 0.0, "justificativa": "..."}]}'
+            schema_hint='{"avaliacoes": [{"id": "...", "score": 0.0, "justificativa": "..."}]}',
+            call_site="evaluator",
         )
     except Exception as e:
         print(f"[ERRO] JSON inválido em avaliar_filhos_llm após retries: {e}")
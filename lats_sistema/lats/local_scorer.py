@@ -0,0 +1,115 @@
+# lats/local_scorer.py
+"""
+Pontuação LOCAL dos filhos (modo degradado).
+
+Usada pelo engine quando o circuit breaker do LLM está aberto: em vez de
+"fallback uniforme" (scores 0.5), os filhos são ranqueados por similaridade
+entre o evento e o texto de cada filho (pergunta + classe).
+
+1) Similaridade de embeddings (embedding do evento em cache no state +
+   embeddings dos filhos em cache no processo)
+2) Se embeddings também falharem → sobreposição lexical (sem rede)
+
+Os scores ficam na faixa de INCERTEZA (0.3 a 0.7): nunca disparam colapso
+ontológico nem poda, e o HITL continua decidindo quando a separação é fraca.
+"""
+
+import math
+import re
+import unicodedata
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+SCORE_MIN = 0.3
+SCORE_MAX = 0.7
+
+# Cache de embeddings dos filhos (texto fixo por versão da árvore)
+_child_embedding_cache: Dict[str, np.ndarray] = {}
+
+
+def _texto_filho(f: Dict[str, Any]) -> str:
+    partes = [f.get("pergunta", ""), f.get("classe", ""), f["id"].replace("_", " ")]
+    return " ".join(p for p in partes if p)
+
+
+# --------------------------------------------
+# Similaridade por embeddings
+# --------------------------------------------
+def _similaridade_embeddings(descricao_evento: str, filhos, state: Optional[dict]) -> List[float]:
+    from lats_sistema.models.embeddings import embeddings
+
+    if state is not None:
+        from lats_sistema.utils.embedding_cache import get_event_embedding
+        ev = get_event_embedding(state, descricao_evento)
+    else:
+        ev = np.array(embeddings.embed_query(descricao_evento), dtype="float32")
+
+    faltando = [f for f in filhos if f["id"] not in _child_embedding_cache]
+    if faltando:
+        vecs = embeddings.embed_documents([_texto_filho(f) for f in faltando])
+        for f, v in zip(faltando, vecs):
+            _child_embedding_cache[f["id"]] = np.array(v, dtype="float32")
+
+    mat = np.stack([_child_embedding_cache[f["id"]] for f in filhos])
+    normas = np.linalg.norm(mat, axis=1) * (np.linalg.norm(ev) or 1.0)
+    return (mat @ ev / np.where(normas == 0, 1.0, normas)).tolist()
+
+
+# --------------------------------------------
+# Similaridade lexical (sem rede)
+# --------------------------------------------
+def _tokens(texto: str) -> set:
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return {t for t in re.findall(r"[a-z0-9]+", texto) if len(t) > 2}
+
+
+def _similaridade_lexical(descricao_evento: str, filhos) -> List[float]:
+    ev = _tokens(descricao_evento)
+    sims = []
+    for f in filhos:
+        tf = _tokens(_texto_filho(f))
+        if not ev or not tf:
+            sims.append(0.0)
+            continue
+        sims.append(len(ev & tf) / math.sqrt(len(ev) * len(tf)))
+    return sims
+
+
+def _escalar(sims: List[float]) -> List[float]:
+    lo, hi = min(sims), max(sims)
+    if hi - lo < 1e-9:
+        return [(SCORE_MIN + SCORE_MAX) / 2] * len(sims)
+    return [SCORE_MIN + (SCORE_MAX - SCORE_MIN) * (s - lo) / (hi - lo) for s in sims]
+
+
+# --------------------------------------------
+# Avaliação local (mesmo formato de avaliar_filhos_llm)
+# --------------------------------------------
+def avaliar_filhos_local(
+    node: Dict[str, Any],
+    descricao_evento: str,
+    state: Optional[dict] = None,
+) -> List[Dict[str, Any]]:
+    filhos = node.get("subnodos", [])
+    if not filhos:
+        return []
+
+    try:
+        sims = _similaridade_embeddings(descricao_evento or "", filhos, state)
+        metodo = "embeddings"
+    except Exception as e:
+        print(f"⚠️ Modo degradado: embeddings indisponíveis ({e}) — usando similaridade lexical")
+        sims = _similaridade_lexical(descricao_evento or "", filhos)
+        metodo = "lexical"
+
+    scores = _escalar(sims)
+    return [
+        {
+            "id": f["id"],
+            "score": float(s),
+            "justificativa": f"score local por similaridade ({metodo}) — modo degradado, LLM indisponível",
+        }
+        for f, s in zip(filhos, scores)
+    ]
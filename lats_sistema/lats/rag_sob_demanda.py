@@ -0,0 +1,101 @@
+# lats_sistema/lats/rag_sob_demanda.py
+"""
+RAG sob demanda: se a primeira avaliação de um nó for incerta, busca
+contexto direcionado (evento + pergunta do nó; BM25 ∥ semântico, fusão RRF)
+e reavalia antes de cair no HITL. O resultado fica no state por nó.
+
+Variáveis:
+- RAG_ON_DEMAND           → liga / desliga (padrão 1; 0 em SERVERLESS_FAST_MODE)
+- RAG_ON_DEMAND_ENTROPIA  → entropia normalizada acima da qual é incerto (0.85)
+- RAG_ON_DEMAND_MIN_SCORE → melhor score abaixo do qual é incerto
+- RAG_ON_DEMAND_MAX_NOS   → nós por requisição (padrão 3)
+- RAG_ON_DEMAND_K / RAG_ON_DEMAND_TOP_N → candidatos por retriever / trechos usados
+"""
+
+import os
+import math
+import logging
+from typing import Any, Dict, List
+
+from lats_sistema.config.fast_mode import SERVERLESS_FAST_MODE, HITL_THRESHOLD_SCORE
+from lats_sistema.lats.utils import softmax, shannon_entropy, temperatura_por_profundidade
+from lats_sistema.utils.metrics import RAG_SOB_DEMANDA
+
+logger = logging.getLogger(__name__)
+
+RAG_ON_DEMAND_ENABLED = os.getenv("RAG_ON_DEMAND", "0" if SERVERLESS_FAST_MODE else "1") == "1"
+RAG_ON_DEMAND_ENTROPIA = float(os.getenv("RAG_ON_DEMAND_ENTROPIA", "0.85"))  # 0..1 (normalizada)
+RAG_ON_DEMAND_MIN_SCORE = float(os.getenv("RAG_ON_DEMAND_MIN_SCORE", str(HITL_THRESHOLD_SCORE)))
+RAG_ON_DEMAND_K = int(os.getenv("RAG_ON_DEMAND_K", "4"))
+RAG_ON_DEMAND_TOP_N = int(os.getenv("RAG_ON_DEMAND_TOP_N", "3"))
+RAG_ON_DEMAND_MAX_NOS = int(os.getenv("RAG_ON_DEMAND_MAX_NOS", "3"))
+
+
+# ===================================================================
+# INCERTEZA
+# ===================================================================
+def incerteza_no(avaliacoes: List[Dict[str, Any]], depth: int) -> Dict[str, float]:
+    """Entropia normalizada (0..1) e melhor score sobre os filhos válidos."""
+    scores = [a["score"] for a in avaliacoes if a.get("score", 0) > 0]
+    if len(scores) <= 1:
+        return {"entropia": 0.0, "max_score": max(scores, default=0.0)}
+    probs = softmax(scores, temperatura_por_profundidade(depth))
+    return {
+        "entropia": shannon_entropy(probs) / math.log2(len(probs)),
+        "max_score": max(scores),
+    }
+
+
+def no_incerto(avaliacoes: List[Dict[str, Any]], depth: int) -> bool:
+    # 0 ou 1 filho válido → poda/colapso decide sozinho
+    if sum(1 for a in avaliacoes if a.get("score", 0) > 0) <= 1:
+        return False
+    inc = incerteza_no(avaliacoes, depth)
+    return inc["entropia"] > RAG_ON_DEMAND_ENTROPIA or inc["max_score"] < RAG_ON_DEMAND_MIN_SCORE
+
+
+def deve_buscar(state: Dict[str, Any], node_id: str, avaliacoes: List[Dict[str, Any]], depth: int) -> bool:
+    if not RAG_ON_DEMAND_ENABLED:
+        return False
+    por_no = state.get("_rag_sob_demanda") or {}
+    if node_id in por_no:
+        return False  # já reavaliado nesta requisição
+    if len(por_no) >= RAG_ON_DEMAND_MAX_NOS:
+        return False
+    return no_incerto(avaliacoes, depth)
+
+
+# ===================================================================
+# RECUPERAÇÃO DIRECIONADA
+# ===================================================================
+def contexto_sob_demanda(state: Dict[str, Any], node: Dict[str, Any], evento: str) -> str:
+    """
+    Trechos normativos para (evento, pergunta do nó); "" se nada for achado.
+    Sempre registra o nó no state (conta para RAG_ON_DEMAND_MAX_NOS).
+    """
+    from lats_sistema.rag.pipeline import executar_retrieval_no
+    from lats_sistema.rag.fusion import rrf_fusao
+    from lats_sistema.config.fast_mode import RAG_RRF_K, RAG_LEXICAL_WEIGHT
+
+    por_no = state.setdefault("_rag_sob_demanda", {})
+    query = f"{evento} {node.get('pergunta', '')}".strip()
+
+    try:
+        retrieval = executar_retrieval_no(query, bm25_k=RAG_ON_DEMAND_K, semantic_k=RAG_ON_DEMAND_K)
+        ranking = rrf_fusao(query, retrieval["rankings"], k=RAG_RRF_K, peso_lexical=RAG_LEXICAL_WEIGHT)
+    except Exception as e:
+        logger.warning(f"[RAG SOB DEMANDA] Falha no nó {node['id']}: {e}")
+        RAG_SOB_DEMANDA.labels(resultado="erro").inc()
+        por_no[node["id"]] = ""
+        return ""
+
+    contexto = "\n\n".join(x["trecho"].strip() for x in ranking[:RAG_ON_DEMAND_TOP_N])
+    if not contexto:
+        RAG_SOB_DEMANDA.labels(resultado="vazio").inc()
+    por_no[node["id"]] = contexto
+    return contexto
+
+
+def registrar_resultado(avaliacoes: List[Dict[str, Any]], depth: int):
+    """Conta se a reavaliação com contexto tirou o nó da zona de incerteza."""
+    RAG_SOB_DEMANDA.labels(resultado="incerto" if no_incerto(avaliacoes, depth) else "resolvido").inc()
@@ -1,5 +1,6 @@
 import os
 import json
+import hashlib
 
 # Diretório raiz do projeto (2 níveis acima deste arquivo)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -16,8 +17,13 @@ def _load_tree():
     if "tree_loaded" in _cache:
         return
 
-    with open(TREE_PATH, encoding="utf-8") as f:
-        _cache["ARVORE"] = json.load(f)
+    with open(TREE_PATH, "rb") as f:
+        conteudo = f.read()
+    _cache["ARVORE"] = json.loads(conteudo.decode("utf-8"))
+
+    # Versão da árvore = hash do conteúdo (artefatos derivados, como os
+    # context packs, são válidos apenas para a versão em que foram gerados)
+    _cache["TREE_VERSION"] = hashlib.sha256(conteudo).hexdigest()[:16]
 
     # Construir índice de nós
     _cache["NODE_INDEX"] = {}
@@ -32,8 +38,8 @@ def _load_tree():
     _cache["tree_loaded"] = True
 
 def __getattr__(name):
-    """Lazy load de ARVORE, NODE_INDEX e ROOT_ID"""
-    if name in ("ARVORE", "NODE_INDEX", "ROOT_ID"):
+    """Lazy load de ARVORE, NODE_INDEX, ROOT_ID e TREE_VERSION"""
+    if name in ("ARVORE", "NODE_INDEX", "ROOT_ID", "TREE_VERSION"):
         _load_tree()
         return _cache[name]
     raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -9,6 +9,22 @@ def eh_terminal(node: Dict[str, Any]) -> bool:
     return node.get("tipo") == "terminal" or "classe" in node
 
 
+# --------------------------------------------
+# Nós alcançáveis (os próprios + descendentes)
+# --------------------------------------------
+def nos_alcancaveis(node_ids: List[str], node_index: Dict[str, Dict[str, Any]]) -> List[str]:
+    vistos, pilha = [], list(node_ids)
+    conjunto = set()
+    while pilha:
+        nid = pilha.pop()
+        if nid in conjunto or nid not in node_index:
+            continue
+        conjunto.add(nid)
+        vistos.append(nid)
+        pilha.extend(f["id"] for f in node_index[nid].get("subnodos", []))
+    return vistos
+
+
 # --------------------------------------------
 # Formatação dos filhos para o prompt do LLM
 # --------------------------------------------
@@ -1,54 +1,256 @@
 # lats_sistema/memory/db.py
+"""
+Banco SQLite das decisões humanas (memória HITL): uma conexão WAL por
+thread, APIs em lote e colunas de uso (hits, last_used) para a retenção.
 
+Diretório sem escrita (bundle serverless): abre só-leitura (immutable), e
+somente_leitura() avisa quem grava para pular. immutable ignora o -wal:
+empacote o banco antes de publicar:
+    python -m lats_sistema.memory.db empacotar
+
+Variáveis:
+- MEMORY_DB_PATH            → arquivo do banco (padrão decisions.db ao lado)
+- MEMORY_DB_CACHE_KB        → cache_size do SQLite (padrão 16384)
+- MEMORY_DB_MMAP_MB         → mmap_size (padrão 256)
+- MEMORY_DB_BUSY_TIMEOUT_MS → busy_timeout (padrão 5000)
+"""
+
+import os
 import sqlite3
-from pathlib import Path
-from typing import Dict, Any, Optional
+import logging
 import datetime
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
 import numpy as np
 
-from lats_sistema.models.embeddings import embeddings
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(os.getenv("MEMORY_DB_PATH", str(Path(__file__).resolve().parent / "decisions.db")))
 
-DB_PATH = Path(__file__).resolve().parent / "decisions.db"
+MEMORY_DB_CACHE_KB = int(os.getenv("MEMORY_DB_CACHE_KB", "16384"))
+MEMORY_DB_MMAP_MB = int(os.getenv("MEMORY_DB_MMAP_MB", "256"))
+MEMORY_DB_BUSY_TIMEOUT_MS = int(os.getenv("MEMORY_DB_BUSY_TIMEOUT_MS", "5000"))
+
+COLS = [
+    "id", "event_text", "node_id", "chosen_child",
+    "model_suggestion", "justification_human",
+    "justification_model", "entropy", "timestamp", "embedding",
+    "hits", "last_used",
+]
+_SELECT = f"SELECT {', '.join(COLS)} FROM decisions"
+
+# Limite de parâmetros por statement (SQLITE_MAX_VARIABLE_NUMBER antigo = 999)
+_MAX_PARAMS = 900
+
+_local = threading.local()
+
+
+# ---------------------------------------------------------
+# Conexão (uma por thread)
+# ---------------------------------------------------------
+def _configurar(conn: sqlite3.Connection):
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute(f"PRAGMA cache_size=-{MEMORY_DB_CACHE_KB}")
+    conn.execute(f"PRAGMA mmap_size={MEMORY_DB_MMAP_MB * 2 ** 20}")
+    conn.execute(f"PRAGMA busy_timeout={MEMORY_DB_BUSY_TIMEOUT_MS}")
+    _criar_schema(conn)
+
+
+def _gravavel() -> bool:
+    if DB_PATH.exists():
+        return os.access(DB_PATH, os.W_OK) and os.access(DB_PATH.parent, os.W_OK)
+    try:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return False
+    return os.access(DB_PATH.parent, os.W_OK)
+
+
+def _abrir_gravavel() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        str(DB_PATH),
+        timeout=MEMORY_DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=256,
+    )
+    try:
+        _configurar(conn)
+    except sqlite3.Error:
+        conn.close()
+        raise
+    return conn
+
+
+def _abrir_somente_leitura() -> sqlite3.Connection:
+    """
+    Sem escrita no diretório (ex.: pacote serverless): WAL precisa criar
+    -wal/-shm e o schema precisa de DDL, então nada disso roda aqui.
+    immutable=1 dispensa locks e arquivos auxiliares. Gravações levantam
+    sqlite3.OperationalError — quem grava já trata falhas.
+    """
+    if not DB_PATH.exists():
+        conn = sqlite3.connect(":memory:", cached_statements=256)
+        _criar_schema(conn)  # sem memórias, mas as consultas funcionam
+        return conn
+
+    wal = DB_PATH.with_name(DB_PATH.name + "-wal")
+    if wal.exists() and wal.stat().st_size > 0:
+        logger.warning(
+            f"[MEMÓRIA] {wal} ignorado na abertura só-leitura: commits sem checkpoint "
+            "não aparecem (rode 'python -m lats_sistema.memory.db empacotar' antes do deploy)"
+        )
+    conn = sqlite3.connect(
+        f"{DB_PATH.resolve().as_uri()}?mode=ro&immutable=1",
+        uri=True,
+        cached_statements=256,
+    )
+    conn.execute(f"PRAGMA cache_size=-{MEMORY_DB_CACHE_KB}")
+    conn.execute(f"PRAGMA mmap_size={MEMORY_DB_MMAP_MB * 2 ** 20}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    existentes = {r[1] for r in conn.execute("PRAGMA table_info(decisions)")}
+    if existentes and not {"hits", "last_used"} <= existentes:
+        # Banco antigo sem as colunas de uso e sem como fazer ALTER: uma view
+        # temporária (resolvida antes de main) completa as colunas
+        extras = [c for c in ("hits", "last_used") if c not in existentes]
+        padrao = {"hits": "0 AS hits", "last_used": "NULL AS last_used"}
+        conn.execute(
+            "CREATE TEMP VIEW decisions AS SELECT *, "
+            + ", ".join(padrao[c] for c in extras)
+            + " FROM main.decisions"
+        )
+    elif not existentes:
+        conn.close()
+        conn = sqlite3.connect(":memory:", cached_statements=256)
+        _criar_schema(conn)
+    return conn
+
+
+def get_connection() -> sqlite3.Connection:
+    """Conexão da thread atual (criada e configurada na primeira chamada)."""
+    chave = (str(DB_PATH), os.getpid())
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "chave", None) != chave:
+        conn = None
+        if _gravavel():
+            try:
+                conn = _abrir_gravavel()
+            except sqlite3.OperationalError as e:
+                # ex.: sistema de arquivos só-leitura com os.access otimista (root)
+                logger.warning(f"[MEMÓRIA] {DB_PATH} sem escrita ({e}) — abrindo só-leitura")
+        _local.somente_leitura = conn is None
+        if conn is None:
+            conn = _abrir_somente_leitura()
+        _local.conn, _local.chave = conn, chave
+    return conn
+
+
+def somente_leitura() -> bool:
+    """True se o banco foi aberto só-leitura (gravações devem ser puladas)."""
+    get_connection()
+    return _local.somente_leitura
+
+
+def empacotar() -> int:
+    """
+    Deixa decisions.db autocontido para o deploy só-leitura: checkpoint do
+    WAL e journal_mode=DELETE (a abertura immutable não lê o -wal). Deve ser
+    o último acesso antes de empacotar — a próxima conexão gravável volta
+    ao WAL. Retorna o nº de memórias.
+    """
+    conn = get_connection()
+    if _local.somente_leitura:
+        raise RuntimeError(f"{DB_PATH} aberto só-leitura: empacote a partir de uma cópia gravável")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("PRAGMA journal_mode=DELETE")
+    total = conn.execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+    fechar_conexao()
+    return total
+
+
+def fechar_conexao():
+    """Fecha a conexão da thread atual (testes / troca de DB_PATH)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+    _local.conn = None
+
+
+@contextmanager
+def transacao():
+    """Commit no fim do bloco; rollback em erro."""
+    conn = get_connection()
+    with conn:
+        yield conn
 
 
 # ---------------------------------------------------------
 # Inicialização do banco
 # ---------------------------------------------------------
+def _criar_schema(conn: sqlite3.Connection):
+    with conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS decisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_text TEXT,
+            node_id TEXT,
+            chosen_child TEXT,
+            model_suggestion TEXT,
+            justification_human TEXT,
+            justification_model TEXT,
+            entropy REAL,
+            timestamp TEXT,
+            embedding BLOB,
+            hits INTEGER NOT NULL DEFAULT 0,
+            last_used TEXT
+        );
+        """)
+        # Uso (retenção): bancos antigos ganham as colunas na primeira conexão
+        existentes = {r[1] for r in conn.execute("PRAGMA table_info(decisions)")}
+        if "hits" not in existentes:
+            conn.execute("ALTER TABLE decisions ADD COLUMN hits INTEGER NOT NULL DEFAULT 0")
+        if "last_used" not in existentes:
+            conn.execute("ALTER TABLE decisions ADD COLUMN last_used TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_decisions_node_id ON decisions (node_id, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_decisions_timestamp ON decisions (timestamp)")
+
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS decisions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        event_text TEXT,
-        node_id TEXT,
-        chosen_child TEXT,
-        model_suggestion TEXT,
-        justification_human TEXT,
-        justification_model TEXT,
-        entropy REAL,
-        timestamp TEXT,
-        embedding BLOB
-    );
-    """)
-    conn.commit()
-    conn.close()
+    get_connection()
+
+
+def _row(r) -> Dict[str, Any]:
+    return dict(zip(COLS, r))
 
 
 # ---------------------------------------------------------
 # Versão completa (API interna)
 # ---------------------------------------------------------
-def insert_decision(data: Dict[str, Any]) -> int:
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    cur.execute("""
-        INSERT INTO decisions (
-            event_text, node_id, chosen_child, model_suggestion,
-            justification_human, justification_model, entropy,
-            timestamp, embedding
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+_INSERT = """
+    INSERT INTO decisions (
+        event_text, node_id, chosen_child, model_suggestion,
+        justification_human, justification_model, entropy,
+        timestamp, embedding
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def iso_utc(momento: Optional[datetime.datetime] = None) -> str:
+    """
+    Instante em ISO UTC sem sufixo de fuso — o formato de timestamp /
+    last_used já gravados, para que a comparação como string continue válida.
+    """
+    momento = momento or datetime.datetime.now(datetime.timezone.utc)
+    if momento.tzinfo is not None:
+        momento = momento.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return momento.isoformat()
+
+
+def _valores_insert(data: Dict[str, Any]):
+    return (
         data.get("event_text"),
         data.get("node_id"),
         data.get("chosen_child"),
@@ -56,14 +258,24 @@ def insert_decision(data: Dict[str, Any]) -> int:
         data.get("justification_human"),
         data.get("justification_model"),
         data.get("entropy"),
-        datetime.datetime.utcnow().isoformat(),
+        data.get("timestamp") or iso_utc(),
         data.get("embedding"),
-    ))
+    )
 
-    conn.commit()
-    decision_id = cur.lastrowid
-    conn.close()
-    return decision_id
+
+def insert_decision(data: Dict[str, Any]) -> int:
+    with transacao() as conn:
+        cur = conn.execute(_INSERT, _valores_insert(data))
+        return cur.lastrowid
+
+
+def insert_decisions(datas: Iterable[Dict[str, Any]]) -> List[int]:
+    """Insere várias decisões numa única transação; retorna os ids."""
+    ids = []
+    with transacao() as conn:
+        for data in datas:
+            ids.append(conn.execute(_INSERT, _valores_insert(data)).lastrowid)
+    return ids
 
 
 # ---------------------------------------------------------
@@ -82,6 +294,8 @@ def insert_memory_simple(
     🔹 Gera embedding automaticamente
     🔹 Deixa todos os outros campos como None
     """
+    from lats_sistema.models.embeddings import embeddings
+
     # gerar embedding
     vec = embeddings.embed_query(event_text)
     vec = np.array(vec).astype("float32").tobytes()
@@ -104,49 +318,198 @@ def insert_memory_simple(
 # Busca
 # ---------------------------------------------------------
 def get_decision_by_id(decision_id: int) -> Dict[str, Any]:
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM decisions WHERE id=?", (decision_id,))
-    row = cur.fetchone()
-    conn.close()
+    row = get_connection().execute(f"{_SELECT} WHERE id=?", (decision_id,)).fetchone()
+    return _row(row) if row else None
+
+
+def get_decisions_by_ids(decision_ids: Iterable[int]) -> List[Dict[str, Any]]:
+    """
+    Busca várias decisões de uma vez (uma query por bloco de ids).
+    Retorna na MESMA ordem dos ids pedidos; ids inexistentes são omitidos.
+    """
+    ids = [int(i) for i in decision_ids]
+    if not ids:
+        return []
+
+    conn = get_connection()
+    por_id = {}
+    unicos = list(dict.fromkeys(ids))
+    for i in range(0, len(unicos), _MAX_PARAMS):
+        bloco = unicos[i:i + _MAX_PARAMS]
+        marcadores = ",".join("?" * len(bloco))
+        for r in conn.execute(f"{_SELECT} WHERE id IN ({marcadores})", bloco):
+            por_id[r[0]] = _row(r)
+
+    return [por_id[i] for i in ids if i in por_id]
+
 
-    if not row:
-        return None
+def get_decisions_by_node(
+    node_id: str,
+    limit: Optional[int] = None,
+    desde: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Decisões de um nó (mais recentes primeiro), opcionalmente desde um timestamp ISO."""
+    sql = f"{_SELECT} WHERE node_id=?"
+    params: List[Any] = [node_id]
+    if desde:
+        sql += " AND timestamp >= ?"
+        params.append(desde)
+    sql += " ORDER BY id DESC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    return [_row(r) for r in get_connection().execute(sql, params)]
+
+
+def iter_decisions(node_id: Optional[str] = None, lote: int = 1000) -> Iterator[Dict[str, Any]]:
+    """Varre as decisões em ordem de id, em lotes (sem carregar tudo na memória)."""
+    conn = get_connection()
+    ultimo = 0
+    while True:
+        if node_id is None:
+            rows = conn.execute(f"{_SELECT} WHERE id > ? ORDER BY id LIMIT ?", (ultimo, lote)).fetchall()
+        else:
+            rows = conn.execute(
+                f"{_SELECT} WHERE node_id=? AND id > ? ORDER BY id LIMIT ?", (node_id, ultimo, lote)
+            ).fetchall()
+        if not rows:
+            return
+        for r in rows:
+            yield _row(r)
+        ultimo = rows[-1][0]
+
+
+def get_decision_ids_by_node(node_id: str) -> List[int]:
+    """Ids das decisões de um nó (coberto pelo índice idx_decisions_node_id)."""
+    rows = get_connection().execute("SELECT id FROM decisions WHERE node_id=?", (node_id,))
+    return [r[0] for r in rows]
+
+
+def get_decision_ids_by_nodes(node_ids: Iterable[str]) -> Dict[str, List[int]]:
+    """Ids das decisões de vários nós, agrupados por node_id (uma query por bloco)."""
+    nos = list(dict.fromkeys(node_ids))
+    conn = get_connection()
+    por_no: Dict[str, List[int]] = {}
+    for i in range(0, len(nos), _MAX_PARAMS):
+        bloco = nos[i:i + _MAX_PARAMS]
+        marcadores = ",".join("?" * len(bloco))
+        for did, node_id in conn.execute(
+            f"SELECT id, node_id FROM decisions WHERE node_id IN ({marcadores})", bloco
+        ):
+            por_no.setdefault(node_id, []).append(did)
+    return por_no
+
+
+def count_decisions_by_node() -> Dict[str, int]:
+    """
+    Nº de decisões COM embedding por node_id (as que a busca vetorial pode
+    devolver; sem ler ids). Linhas sem embedding nunca preencheriam a cota
+    do nó no prefetch e o mandariam para a busca por nó a cada requisição.
+    """
+    rows = get_connection().execute(
+        "SELECT node_id, COUNT(*) FROM decisions WHERE embedding IS NOT NULL GROUP BY node_id"
+    )
+    return {node_id: n for node_id, n in rows}
 
-    cols = [
-        "id", "event_text", "node_id", "chosen_child",
-        "model_suggestion", "justification_human",
-        "justification_model", "entropy", "timestamp", "embedding"
-    ]
 
-    return dict(zip(cols, row))
+def get_decision_ids_with_embedding() -> np.ndarray:
+    """Ids (ordenados) das decisões que têm embedding — o conteúdo esperado do índice."""
+    rows = get_connection().execute("SELECT id FROM decisions WHERE embedding IS NOT NULL ORDER BY id")
+    return np.fromiter((r[0] for r in rows), dtype=np.int64)
+
+
+def iter_embeddings(lote: int = 10000, dim: Optional[int] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    (ids, matriz float32 [n × dim]) em blocos, direto dos BLOBs.
+    Cada bloco vira UM np.frombuffer (sem conversão linha a linha); BLOBs de
+    tamanho diferente de dim (padrão: o do primeiro) são ignorados.
+    """
+    conn = get_connection()
+    ultimo = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, embedding FROM decisions WHERE embedding IS NOT NULL AND id > ? ORDER BY id LIMIT ?",
+            (ultimo, lote),
+        ).fetchall()
+        if not rows:
+            return
+        ultimo = rows[-1][0]
+        if dim is None:
+            dim = len(rows[0][1]) // 4
+        validos = [(did, blob) for did, blob in rows if len(blob) == dim * 4]
+        if not validos:
+            continue
+        ids = np.fromiter((did for did, _ in validos), dtype=np.int64, count=len(validos))
+        matriz = np.frombuffer(b"".join(blob for _, blob in validos), dtype=np.float32).reshape(len(validos), dim)
+        yield ids, matriz
+
+
+def carregar_embeddings(lote: int = 10000) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Todos os (ids, embeddings) do banco; (vazio, None) se não houver nenhum."""
+    blocos = list(iter_embeddings(lote))
+    if not blocos:
+        return np.empty(0, dtype=np.int64), None
+    return np.concatenate([i for i, _ in blocos]), np.concatenate([m for _, m in blocos])
+
+
+# ---------------------------------------------------------
+# Uso e retenção
+# ---------------------------------------------------------
+def registrar_uso(decision_ids: Iterable[int]):
+    """
+    hits += nº de ocorrências do id e last_used = agora para memórias
+    entregues ao evaluator (o memory_writer junta várias requisições num lote).
+    """
+    contagem: Dict[int, int] = {}
+    for i in decision_ids:
+        contagem[int(i)] = contagem.get(int(i), 0) + 1
+    if not contagem:
+        return
+    agora = iso_utc()
+    with transacao() as conn:
+        conn.executemany(
+            "UPDATE decisions SET hits = hits + ?, last_used = ? WHERE id = ?",
+            [(n, agora, did) for did, n in contagem.items()],
+        )
+
+
+def get_node_ids() -> List[str]:
+    return [r[0] for r in get_connection().execute("SELECT DISTINCT node_id FROM decisions")]
+
+
+def delete_decisions(decision_ids: Iterable[int], conn: Optional[sqlite3.Connection] = None) -> int:
+    """Remove decisões por id (use dentro de transacao() para compor com outras escritas)."""
+    ids = list(dict.fromkeys(int(i) for i in decision_ids))
+    conn = conn or get_connection()
+    removidas = 0
+    for i in range(0, len(ids), _MAX_PARAMS):
+        bloco = ids[i:i + _MAX_PARAMS]
+        marcadores = ",".join("?" * len(bloco))
+        removidas += conn.execute(f"DELETE FROM decisions WHERE id IN ({marcadores})", bloco).rowcount
+    return removidas
+
+
+def count_decisions(node_id: Optional[str] = None) -> int:
+    conn = get_connection()
+    if node_id is None:
+        return conn.execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+    return conn.execute("SELECT COUNT(*) FROM decisions WHERE node_id=?", (node_id,)).fetchone()[0]
 
 
 # ---------------------------------------------------------
 # Busca todas decisões passadas
 # ---------------------------------------------------------
 def get_all_decisions():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM decisions ORDER BY id ASC")
-    rows = cur.fetchall()
-    conn.close()
-
-    cols = [
-        "id","event_text",
-        "node_id",
-        "chosen_child",
-        "model_suggestion",
-        "justification_human",
-        "justification_model",
-        "entropy",
-        "timestamp",
-        "embedding"
-    ]
-
-    results = []
-    for r in rows:
-        d = dict(zip(cols, r))
-        results.append(d)
-
-    return results
+    return [_row(r) for r in get_connection().execute(f"{_SELECT} ORDER BY id ASC")]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Banco das memórias HITL")
+    parser.add_argument("comando", choices=["empacotar"])
+    args = parser.parse_args()
+
+    total = empacotar()
+    print(f"✅ {DB_PATH} pronto para deploy só-leitura ({total} memórias)")
@@ -1,11 +1,172 @@
 # lats_sistema/memory/faiss_store.py
+"""
+Índice FAISS das memórias HITL (ids = ids do SQLite), mantido em memória
+por processo. Inserções vão para um log durável (faiss_index.log) e são
+compactadas em faiss_index.bin; outros processos recarregam pela geração do
+arquivo + tamanho do log. O SQLite é a fonte da verdade para reparo.
+
+Variáveis:
+- MEMORY_INDEX_TYPE          → flat | hnsw | ivf_flat (padrão flat)
+- MEMORY_INDEX_METRIC        → cosine | l2 (padrão cosine)
+- MEMORY_INDEX_MMAP          → carrega o .bin com mmap (padrão 1)
+- MEMORY_INDEX_COMPACT_EVERY → registros do log por compactação (padrão 256)
+- MEMORY_INDEX_RELOAD_INTERVAL → s entre checagens de recarga (padrão 1.0)
+- MEMORY_INDEX_FSYNC         → fsync do log (padrão 1)
+- MEMORY_FILTER_EXACT_MAX    → até N ids permitidos, busca exata (padrão 4096)
+- MEMORY_INDEX_CHECK_ON_STARTUP / MEMORY_INDEX_REPAIR_MAX → verificação e
+  reparo no startup
+
+    python -m lats_sistema.memory.faiss_store verificar | reparar | reconstruir
+    python -m lats_sistema.memory.faiss_store migrar --tipo hnsw
+    python -m lats_sistema.memory.faiss_store benchmark
+"""
+
+import os
+import time
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
 
 import faiss
 import numpy as np
-from pathlib import Path
+
+from lats_sistema.vectorstore.ann import (
+    FAISS_EF_SEARCH,
+    FAISS_NPROBE,
+    METRICAS,
+    aplicar_parametros_busca,
+    construir_indice_ann,
+    tamanho_indice_bytes,
+    tipo_do_indice,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows (dev): sem lock entre processos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
 
 INDEX_PATH = Path(__file__).resolve().parent / "faiss_index.bin"
 
+MEMORY_INDEX_COMPACT_EVERY = int(os.getenv("MEMORY_INDEX_COMPACT_EVERY", "256"))
+MEMORY_INDEX_RELOAD_INTERVAL = float(os.getenv("MEMORY_INDEX_RELOAD_INTERVAL", "1.0"))
+MEMORY_INDEX_FSYNC = os.getenv("MEMORY_INDEX_FSYNC", "1") == "1"
+
+# Tipo / métrica (construção em vectorstore/ann.py; efSearch / nprobe de
+# FAISS_EF_SEARCH / FAISS_NPROBE, como no vector store de padrões)
+MEMORY_INDEX_TYPE = os.getenv("MEMORY_INDEX_TYPE", "flat")
+MEMORY_INDEX_METRIC = os.getenv("MEMORY_INDEX_METRIC", "cosine")
+# Busca restrita a até N ids → exata sobre os vetores reconstruídos
+MEMORY_FILTER_EXACT_MAX = int(os.getenv("MEMORY_FILTER_EXACT_MAX", "4096"))
+
+# Carga mapeada em memória (IO_FLAG_MMAP_IFC, FAISS ≥ 1.10): páginas do
+# arquivo compartilhadas entre processos; registros do log vão para um delta
+MEMORY_INDEX_MMAP = os.getenv("MEMORY_INDEX_MMAP", "1") == "1" and hasattr(faiss, "IO_FLAG_MMAP_IFC")
+# Consistência com o SQLite na inicialização (garantir_indice_memoria)
+MEMORY_INDEX_CHECK_ON_STARTUP = os.getenv("MEMORY_INDEX_CHECK_ON_STARTUP", "1") == "1"
+# Até N ids faltando → adiciona do SQLite; acima disso (ou órfãos) → rebuild
+MEMORY_INDEX_REPAIR_MAX = int(os.getenv("MEMORY_INDEX_REPAIR_MAX", "1000"))
+
+def _log_path() -> Path:
+    return INDEX_PATH.with_suffix(".log")
+
+
+@contextmanager
+def _lock_arquivos():
+    """Lock exclusivo entre processos (append no log / compactação)."""
+    if fcntl is None:
+        yield
+        return
+    with open(INDEX_PATH.with_suffix(".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _geracao(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def _gravar_atomico(index, path: Path):
+    tmp = path.with_suffix(".bin.tmp")
+    faiss.write_index(index, str(tmp))
+    os.replace(tmp, path)
+
+
+# -----------------------------------------------------------
+# Construção (tipo + métrica)
+# -----------------------------------------------------------
+def construir_indice_memoria(
+    vetores: np.ndarray,
+    ids: np.ndarray,
+    tipo: Optional[str] = None,
+    metrica: Optional[str] = None,
+):
+    """IndexIDMap2 do tipo/métrica pedidos com os vetores e ids (SQLite) dados."""
+    return construir_indice_ann(
+        vetores, tipo or MEMORY_INDEX_TYPE, metrica=metrica or MEMORY_INDEX_METRIC, ids=ids
+    )
+
+
+def metrica_do_indice(index) -> str:
+    return "cosine" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2"
+
+
+def _parametros_busca(index, seletor):
+    """SearchParameters do tipo do índice interno (HNSW / IVF exigem o seu)."""
+    tipo = tipo_do_indice(index)
+    if tipo == "hnsw":
+        return faiss.SearchParametersHNSW(sel=seletor, efSearch=FAISS_EF_SEARCH)
+    if tipo.startswith("ivf"):
+        return faiss.SearchParametersIVF(sel=seletor, nprobe=FAISS_NPROBE)
+    return faiss.SearchParameters(sel=seletor)
+
+
+def _busca_exata(index, vec: np.ndarray, ids: np.ndarray, k: int):
+    """Busca exata sobre os vetores reconstruídos de um subconjunto pequeno."""
+    try:
+        vetores = index.reconstruct_batch(ids)
+    except Exception:
+        return None  # id sem vetor no índice → busca com seletor
+    if metrica_do_indice(index) == "cosine":
+        d = vetores @ vec[0]
+        ordem = np.argsort(-d)[:k]
+    else:
+        d = ((vetores - vec[0]) ** 2).sum(axis=1)
+        ordem = np.argsort(d)[:k]
+    return d[ordem][None, :].astype("float32"), ids[ordem][None, :]
+
+
+def buscar(index, vec: np.ndarray, k: int, ids_permitidos: Optional[Sequence[int]] = None):
+    """
+    Busca no índice de memórias (vec já 2D float32; normalizado aqui se cosine).
+    ids_permitidos: exata sobre os vetores do subconjunto se couber em
+    MEMORY_FILTER_EXACT_MAX (não varre N nem perde recall no HNSW/IVF),
+    senão IDSelector com os parâmetros do tipo.
+    """
+    if metrica_do_indice(index) == "cosine":
+        vec = vec.copy()
+        faiss.normalize_L2(vec)
+    if ids_permitidos is None:
+        return index.search(vec, k)
+
+    ids = np.asarray(ids_permitidos, dtype=np.int64)
+    if len(ids) <= MEMORY_FILTER_EXACT_MAX:
+        exato = _busca_exata(index, vec, ids, k)
+        if exato is not None:
+            return exato
+    return index.search(vec, k, params=_parametros_busca(index, faiss.IDSelectorBatch(ids)))
+
 
 # -----------------------------------------------------------
 # Criar índice FAISS com suporte a IDs reais (SQLite IDs)
@@ -14,70 +175,624 @@ def create_index(dim: int):
     """
     Cria um índice FAISS persistente com IDMap,
     permitindo que cada vetor tenha um ID customizado.
+    (tipo/métrica de MEMORY_INDEX_TYPE / MEMORY_INDEX_METRIC; IVF precisa de
+    dados para treinar → vazio começa flat, migre depois)
     """
-    
-    index_flat = faiss.IndexFlatL2(dim)   # base
-    index = faiss.IndexIDMap(index_flat)  # agora suporta IDs reais
 
-    faiss.write_index(index, str(INDEX_PATH))
+    index = construir_indice_memoria(np.empty((0, dim), dtype="float32"), np.empty(0, dtype=np.int64))
+
+    with _lock_arquivos():
+        _gravar_atomico(index, INDEX_PATH)
+        _log_path().write_bytes(b"")
     return index
 
 
+def _substituir(index):
+    """Grava um índice novo (migração / rebuild), com backup, e zera o log. Chamar sob o lock."""
+    if INDEX_PATH.exists():
+        shutil.copy2(INDEX_PATH, INDEX_PATH.with_suffix(".bin.bak"))
+    _gravar_atomico(index, INDEX_PATH)
+    _log_path().write_bytes(b"")
+
+
 # -----------------------------------------------------------
-# Carregar índice existente
+# Carregar índice existente (do disco, sem o log)
 # -----------------------------------------------------------
-def load_index():
+def load_index(mmap: bool = False):
+    """
+    mmap=True → vetores do arquivo mapeados (IO_FLAG_MMAP_IFC): carga quase
+    instantânea e memória compartilhada entre workers, mas o índice fica
+    SOMENTE LEITURA (add nele aborta o processo) — por isso o delta.
+    """
     if not INDEX_PATH.exists():
         raise RuntimeError(
             f"FAISS index not found at {INDEX_PATH}. "
             "Run create_index(dim) before inserting vectors."
         )
+    if mmap:
+        return faiss.read_index(str(INDEX_PATH), faiss.IO_FLAG_MMAP_IFC)
     return faiss.read_index(str(INDEX_PATH))
 
 
+# -----------------------------------------------------------
+# Índice em memória + log write-behind
+# -----------------------------------------------------------
+class MemoryIndex:
+    """
+    Índice de memórias residente no processo, sincronizado via geração + log.
+    Com mmap, o índice do arquivo é somente leitura e os registros do log
+    ficam num delta flat em memória (buscado junto; some na compactação).
+    """
+
+    def __init__(self, mmap: bool = MEMORY_INDEX_MMAP):
+        self._lock = threading.RLock()
+        self.mmap = mmap
+        self.index = None
+        self.delta = None
+        self._ids_delta = set()
+        self._geracao = None
+        self._offset_log = 0
+        self._ultima_checagem = 0.0
+
+    # ---------------- sincronização com o disco ----------------
+    def _registro_bytes(self) -> int:
+        return 8 + 4 * self.index.d
+
+    def _recarregar(self):
+        self._geracao = _geracao(INDEX_PATH)
+        self.index = load_index(self.mmap)
+        aplicar_parametros_busca(self.index)
+        self.delta = faiss.IndexIDMap2(faiss.IndexFlat(self.index.d, self.index.metric_type)) if self.mmap else None
+        self._ids_delta = set()
+        self._offset_log = 0
+        self._aplicar_log()
+        logger.info(
+            f"[MEMÓRIA] Índice carregado{' (mmap)' if self.mmap else ''}: "
+            f"{self.ntotal_local} vetores (geração {self._geracao})"
+        )
+
+    def _aplicar_log(self) -> int:
+        """Aplica os registros do log a partir do offset já lido."""
+        try:
+            tamanho = _log_path().stat().st_size
+        except FileNotFoundError:
+            return 0
+        if tamanho < self._offset_log:
+            # Log zerado por compactação de outro processo → recarga completa
+            self._recarregar()
+            return 0
+
+        reg = self._registro_bytes()
+        n = (tamanho - self._offset_log) // reg  # ignora registro truncado no fim
+        if n <= 0:
+            return 0
+        with open(_log_path(), "rb") as f:
+            f.seek(self._offset_log)
+            bruto = f.read(n * reg)
+        if _geracao(INDEX_PATH) != self._geracao:
+            # Compactação concorrente: o log lido pode ser de outra geração
+            self._recarregar()
+            return 0
+        n = len(bruto) // reg
+        if n <= 0:
+            return 0
+        dados = np.frombuffer(bruto[: n * reg], dtype=np.uint8).reshape(n, reg)
+        ids = dados[:, :8].copy().view(np.int64).ravel()
+        vetores = dados[:, 8:].copy().view(np.float32)
+        if self.delta is not None:
+            self.delta.add_with_ids(vetores, ids)
+            self._ids_delta.update(ids.tolist())
+        else:
+            self.index.add_with_ids(vetores, ids)
+        self._offset_log += n * reg
+        return n
+
+    def sincronizar(self, forcar: bool = False):
+        with self._lock:
+            agora = time.monotonic()
+            if not forcar and self.index is not None and agora - self._ultima_checagem < MEMORY_INDEX_RELOAD_INTERVAL:
+                return
+            self._ultima_checagem = agora
+            if self.index is None or _geracao(INDEX_PATH) != self._geracao:
+                self._recarregar()
+            else:
+                self._aplicar_log()
+
+    # ---------------- escrita ----------------
+    def add(self, vec: np.ndarray, decision_id: int):
+        if not INDEX_PATH.exists():
+            # Índice perdido: reconstrói do SQLite (fonte da verdade) em vez de
+            # deixar a memória muda; banco vazio → índice vazio na dimensão do vetor
+            reconstruir_indice(dim=int(np.asarray(vec).size))
+        with self._lock:
+            self.sincronizar(forcar=True)
+            vec = np.ascontiguousarray(vec, dtype="float32").reshape(-1)
+            if vec.shape[0] != self.index.d:
+                raise ValueError(f"Dimensão {vec.shape[0]} ≠ índice {self.index.d}")
+            if self.cosseno:
+                vec = vec / max(float(np.linalg.norm(vec)), 1e-12)
+            registro = np.array([decision_id], dtype=np.int64).tobytes() + vec.tobytes()
+
+            # Sob o lock de arquivos ninguém compacta: append + aplicação consistentes
+            with _lock_arquivos():
+                if _geracao(INDEX_PATH) != self._geracao:
+                    self._recarregar()
+                else:
+                    self._aplicar_log()
+                reg = len(registro)
+                if self.contem(decision_id):
+                    return  # já indexado (rebuild concorrente / regravação de journal)
+                with open(_log_path(), "ab") as f:
+                    sobra = f.tell() % reg
+                    if sobra:
+                        # Registro truncado de um crash anterior: descarta
+                        f.truncate(f.tell() - sobra)
+                    f.write(registro)
+                    f.flush()
+                    if MEMORY_INDEX_FSYNC:
+                        os.fsync(f.fileno())
+
+                # Aplica pelo log (inclui registros de outros processos, sem duplicar)
+                self._aplicar_log()
+
+            if self._offset_log // reg >= MEMORY_INDEX_COMPACT_EVERY:
+                self.compactar()
+
+    def compactar(self):
+        """Grava o índice com todo o log aplicado e zera o log."""
+        with self._lock, _lock_arquivos():
+            self.sincronizar(forcar=True)
+            if self.delta is None:
+                completo = self.index
+            else:
+                completo = load_index()  # cópia gravável (o mapeado é somente leitura)
+                if self.delta.ntotal:
+                    vetores, ids = vetores_do_indice(self.delta)
+                    completo.add_with_ids(vetores, ids)
+            _gravar_atomico(completo, INDEX_PATH)
+            _log_path().write_bytes(b"")
+            if self.delta is None:
+                self._geracao = _geracao(INDEX_PATH)
+                self._offset_log = 0
+            else:
+                self._recarregar()  # mapeia o arquivo novo, delta vazio
+            logger.info(f"[MEMÓRIA] Índice compactado: {completo.ntotal} vetores")
+
+    # ---------------- leitura ----------------
+    @property
+    def cosseno(self) -> bool:
+        return metrica_do_indice(self.index) == "cosine"
+
+    @property
+    def ntotal_local(self) -> int:
+        return self.index.ntotal + (self.delta.ntotal if self.delta is not None else 0)
+
+    def contem(self, decision_id: int) -> bool:
+        if decision_id in self._ids_delta:
+            return True
+        try:
+            self.index.reconstruct(int(decision_id))
+            return True
+        except RuntimeError:
+            return False  # id ausente (ou IndexIDMap antigo, sem reconstrução por id)
+
+    def search(self, vec: np.ndarray, k: int, ids_permitidos: Optional[Sequence[int]] = None):
+        with self._lock:
+            self.sincronizar()
+            if self.ntotal_local == 0:
+                return None
+            if self.delta is None or self.delta.ntotal == 0:
+                return buscar(self.index, vec, k, ids_permitidos)
+
+            if ids_permitidos is None:
+                partes = [buscar(self.index, vec, k), buscar(self.delta, vec, k)]
+            else:
+                no_delta = [i for i in ids_permitidos if i in self._ids_delta]
+                no_base = [i for i in ids_permitidos if i not in self._ids_delta]
+                partes = [
+                    buscar(ix, vec, min(k, len(sub)), sub)
+                    for ix, sub in ((self.index, no_base), (self.delta, no_delta)) if sub
+                ]
+            return _juntar(partes, k, self.cosseno)
+
+    def ids_indexados(self) -> np.ndarray:
+        with self._lock:
+            self.sincronizar(forcar=True)
+            ids = [faiss.vector_to_array(self.index.id_map)]
+            if self.delta is not None:
+                ids.append(faiss.vector_to_array(self.delta.id_map))
+            return np.concatenate(ids).astype(np.int64)
+
+    def reconstruir(self, decision_id: int) -> np.ndarray:
+        with self._lock:
+            if decision_id in self._ids_delta:
+                return self.delta.reconstruct(int(decision_id))
+            return self.index.reconstruct(int(decision_id))
+
+    @property
+    def ntotal(self) -> int:
+        with self._lock:
+            self.sincronizar()
+            return self.ntotal_local
+
+
+def _juntar(partes, k: int, cosseno: bool):
+    """Une os top-k do índice mapeado e do delta."""
+    D = np.concatenate([d for d, _ in partes], axis=1)
+    I = np.concatenate([i for _, i in partes], axis=1)
+    validos = I[0] >= 0
+    D, I = D[:, validos], I[:, validos]
+    ordem = np.argsort(-D[0] if cosseno else D[0], kind="stable")[:k]
+    return D[:, ordem], I[:, ordem]
+
+
+_memory_index: Optional[MemoryIndex] = None
+_memory_index_lock = threading.Lock()
+
+
+def get_memory_index() -> MemoryIndex:
+    global _memory_index
+    with _memory_index_lock:
+        if _memory_index is None:
+            _memory_index = MemoryIndex()
+        return _memory_index
+
+
 # -----------------------------------------------------------
 # Adicionar vetor com ID = decision_id (SQLite)
 # -----------------------------------------------------------
 def add_vector(vec: np.ndarray, decision_id: int):
     """
     Adiciona um vetor ao índice FAISS com ID correspondente ao ID do banco SQLite.
+    (log durável + índice em memória; o arquivo é reescrito só na compactação)
+    """
+    get_memory_index().add(vec, decision_id)
+
+
+# -----------------------------------------------------------
+# Busca vetores similares (retorna ids e distâncias)
+# -----------------------------------------------------------
+def search_vectors(vec: np.ndarray, k=3, ids_permitidos: Optional[Sequence[int]] = None):
+    """
+    Busca vetores mais similares no FAISS.
+
+    ids_permitidos: restringe a busca a esses ids (ex.: memórias de um nó),
+    via IDSelector — devolve os k vizinhos DENTRO do subconjunto, em vez de
+    filtrar depois e ficar com menos de k.
+
+    Retorna (melhor primeiro):
+        ids (list)
+        distances (list)  — produto interno (cosine) ou L2² (l2);
+                            use similaridade() para comparar
     """
-    
-    index = load_index()
 
     if vec.ndim == 1:
         vec = vec.reshape(1, -1)
 
     vec = vec.astype("float32")
 
-    ids = np.array([decision_id], dtype=np.int64)
+    if ids_permitidos is not None:
+        if len(ids_permitidos) == 0:
+            return [], []
+        k = min(k, len(ids_permitidos))
 
-    index.add_with_ids(vec, ids)
-    faiss.write_index(index, str(INDEX_PATH))
+    resultado = get_memory_index().search(vec, k, ids_permitidos)
+    if resultado is None:
+        # FAISS vazio → nada para retornar
+        return [], []
+
+    distances, ids = resultado
+    return ids[0], distances[0]
+
+
+def similaridade(distancia: float) -> float:
+    """
+    Valor devolvido por search_vectors → similaridade de cosseno.
+    (cosine: já é o produto interno; l2: 1 − d/2, válido p/ embeddings unitários)
+    """
+    if get_memory_index().cosseno:
+        return float(distancia)
+    return 1.0 - float(distancia) / 2.0
 
 
 # -----------------------------------------------------------
-# Busca vetores similares (retorna ids e distâncias)
+# Migração de tipo / métrica
 # -----------------------------------------------------------
-def search_vectors(vec: np.ndarray, k=3):
+def vetores_do_indice(index) -> Tuple[np.ndarray, np.ndarray]:
+    """(vetores, ids) de um IndexIDMap/IDMap2 de qualquer tipo (formato antigo incluso)."""
+    ids = faiss.vector_to_array(index.id_map).astype(np.int64)
+    base = faiss.downcast_index(index.index)
+    ivf = faiss.try_extract_index_ivf(base)
+    if ivf is not None:
+        ivf.make_direct_map()
+    if base.ntotal == 0:
+        return np.empty((0, index.d), dtype="float32"), ids
+    return base.reconstruct_n(0, base.ntotal), ids
+
+
+def migrar_indice(tipo: Optional[str] = None, metrica: Optional[str] = None) -> dict:
     """
-    Busca vetores mais similares no FAISS.
-    Retorna:
-        ids (list)
-        distances (list)
+    Reconstrói faiss_index.bin (+ log) com outro tipo/métrica, mantendo os ids.
+    O arquivo anterior fica em faiss_index.bin.bak; outros processos recarregam
+    pela geração nova.
     """
+    tipo = tipo or MEMORY_INDEX_TYPE
+    metrica = metrica or MEMORY_INDEX_METRIC
 
-    index = load_index()
+    with _lock_arquivos():
+        atual = MemoryIndex(mmap=False)
+        atual._recarregar()  # índice do disco + log (já sob o lock)
+        antes = {"tipo": tipo_do_indice(atual.index), "metrica": metrica_do_indice(atual.index)}
+        vetores, ids = vetores_do_indice(atual.index)
 
-    if index.ntotal == 0:
-        # FAISS vazio → nada para retornar
-        return [], []
+        inicio = time.perf_counter()
+        novo = construir_indice_memoria(vetores, ids, tipo, metrica)
+        build_s = time.perf_counter() - inicio
 
-    if vec.ndim == 1:
-        vec = vec.reshape(1, -1)
+        _substituir(novo)
 
-    vec = vec.astype("float32")
+    depois = {"tipo": tipo_do_indice(novo), "metrica": metrica_do_indice(novo)}
+    logger.info(f"[MEMÓRIA] Índice migrado {antes} → {depois}: {novo.ntotal} vetores")
+    return {"antes": antes, "depois": depois, "vetores": int(novo.ntotal), "build_s": round(build_s, 3)}
 
-    distances, ids = index.search(vec, k)
 
-    return ids[0], distances[0]
+# -----------------------------------------------------------
+# Rebuild e consistência com o SQLite (fonte da verdade)
+# -----------------------------------------------------------
+def _indice_atual_ou_none():
+    try:
+        return load_index(MEMORY_INDEX_MMAP)
+    except Exception:
+        return None  # ausente ou corrompido
+
+
+def reconstruir_indice(
+    tipo: Optional[str] = None,
+    metrica: Optional[str] = None,
+    dim: Optional[int] = None,
+) -> dict:
+    """
+    Reconstrói faiss_index.bin a partir dos embeddings do SQLite (carga em
+    blocos vetorizada). Tipo/métrica: os do índice atual, se legível; senão
+    MEMORY_INDEX_TYPE / MEMORY_INDEX_METRIC. Banco sem embeddings → índice
+    vazio (dimensão do índice atual ou `dim`).
+    """
+    from lats_sistema.memory.db import carregar_embeddings
+
+    with _lock_arquivos():
+        atual = _indice_atual_ou_none()
+        if atual is not None:
+            tipo = tipo or tipo_do_indice(atual)
+            metrica = metrica or metrica_do_indice(atual)
+            dim = dim or atual.d
+        del atual
+
+        inicio = time.perf_counter()
+        ids, vetores = carregar_embeddings()
+        carga_s = time.perf_counter() - inicio
+        if vetores is None:
+            if dim is None:
+                raise RuntimeError("Sem embeddings no SQLite nem índice legível: informe dim")
+            vetores = np.empty((0, dim), dtype="float32")
+
+        inicio = time.perf_counter()
+        novo = construir_indice_memoria(vetores, ids, tipo, metrica)
+        build_s = time.perf_counter() - inicio
+        _substituir(novo)
+
+    logger.info(f"[MEMÓRIA] Índice reconstruído do SQLite: {novo.ntotal} vetores ({tipo_do_indice(novo)})")
+    return {
+        "vetores": int(novo.ntotal),
+        "tipo": tipo_do_indice(novo),
+        "metrica": metrica_do_indice(novo),
+        "carga_s": round(carga_s, 3),
+        "build_s": round(build_s, 3),
+    }
+
+
+def _verificar(amostra: int = 32) -> Tuple[dict, np.ndarray]:
+    from lats_sistema.memory.db import get_decision_ids_with_embedding, get_decisions_by_ids
+
+    ids_db = get_decision_ids_with_embedding()
+    rel = {"ok": False, "erro": None, "sqlite": int(len(ids_db)), "indice": 0,
+           "faltando": 0, "orfaos": 0, "duplicados": 0, "divergentes": 0, "formato_antigo": False}
+    vazio = np.empty(0, dtype=np.int64)
+
+    indice = MemoryIndex()
+    try:
+        ids_idx = indice.ids_indexados()
+    except Exception as e:
+        rel["erro"] = f"{type(e).__name__}: {e}"
+        return rel, vazio
+
+    unicos = np.unique(ids_idx)
+    faltando = np.setdiff1d(ids_db, unicos)
+    rel.update(
+        indice=int(len(ids_idx)),
+        duplicados=int(len(ids_idx) - len(unicos)),
+        faltando=int(len(faltando)),
+        orfaos=int(len(np.setdiff1d(unicos, ids_db))),
+        formato_antigo=not isinstance(faiss.downcast_index(indice.index), faiss.IndexIDMap2),
+    )
+
+    # Amostra: vetor do índice ≈ embedding do SQLite (cosseno, vale p/ l2 e cosine)
+    comuns = np.intersect1d(ids_db, unicos)
+    if len(comuns) and not rel["formato_antigo"]:
+        rng = np.random.default_rng(0)
+        escolhidos = rng.choice(comuns, size=min(amostra, len(comuns)), replace=False)
+        for row in get_decisions_by_ids(escolhidos.tolist()):
+            v = np.frombuffer(row["embedding"], dtype=np.float32)
+            if v.size != indice.index.d:
+                rel["divergentes"] += 1
+                continue
+            w = indice.reconstruir(row["id"])
+            cos = float(v @ w) / max(float(np.linalg.norm(v) * np.linalg.norm(w)), 1e-12)
+            if cos < 0.999:
+                rel["divergentes"] += 1
+
+    rel["ok"] = not (
+        rel["faltando"] or rel["orfaos"] or rel["duplicados"] or rel["divergentes"] or rel["formato_antigo"]
+    )
+    return rel, faltando
+
+
+def verificar_consistencia(amostra: int = 32) -> dict:
+    """
+    Compara o índice (arquivo + log) com o SQLite: contagens, ids faltando /
+    órfãos / duplicados e uma amostra de vetores. Não altera nada.
+    """
+    return _verificar(amostra)[0]
+
+
+def garantir_indice_memoria(reparar: bool = True) -> dict:
+    """
+    Hook de inicialização: verifica o índice e, se preciso, repara.
+    - Poucos ids faltando (≤ MEMORY_INDEX_REPAIR_MAX) → adiciona do SQLite
+    - Índice ausente/corrompido, órfãos, duplicados, vetores divergentes ou
+      formato antigo → rebuild completo a partir do SQLite
+    """
+    from lats_sistema.memory.db import get_decisions_by_ids
+
+    rel, faltando = _verificar()
+    if rel["ok"]:
+        logger.info(f"[MEMÓRIA] Índice consistente com o SQLite ({rel['indice']} vetores)")
+        return rel
+    if rel["erro"] and rel["sqlite"] == 0:
+        return rel  # sem índice e sem memórias: o primeiro add cria
+    logger.warning(f"[MEMÓRIA] Índice inconsistente com o SQLite: {rel}")
+    if not reparar:
+        return rel
+
+    so_faltando = not (rel["erro"] or rel["orfaos"] or rel["duplicados"] or rel["divergentes"] or rel["formato_antigo"])
+    if so_faltando and rel["faltando"] <= MEMORY_INDEX_REPAIR_MAX:
+        indice = get_memory_index()
+        for row in get_decisions_by_ids(faltando.tolist()):
+            indice.add(np.frombuffer(row["embedding"], dtype=np.float32), row["id"])
+    else:
+        reconstruir_indice()
+
+    rel = verificar_consistencia()
+    logger.info(f"[MEMÓRIA] Índice reparado: {rel}")
+    return rel
+
+
+# -----------------------------------------------------------
+# Benchmark (dados sintéticos agrupados por nó)
+# -----------------------------------------------------------
+def _sintetico(n: int, dim: int, n_nos: int, rng):
+    centros = rng.normal(size=(n_nos, dim)).astype("float32")
+    nos = rng.integers(0, n_nos, size=n)
+    vetores = np.empty((n, dim), dtype="float32")
+    for i in range(0, n, 100_000):  # em blocos: 1M × dim sem pico de memória
+        bloco = slice(i, min(n, i + 100_000))
+        vetores[bloco] = centros[nos[bloco]] + rng.normal(scale=0.8, size=(bloco.stop - i, dim))
+    return vetores, nos
+
+
+def benchmark_memoria(
+    n: int,
+    dim: int = 256,
+    k: int = 3,
+    n_queries: int = 200,
+    n_nos: int = 0,
+    tipos: Sequence[str] = ("flat", "hnsw", "ivf_flat"),
+    metrica: str = "cosine",
+    seed: int = 0,
+) -> dict:
+    """
+    Recall@k contra busca exata, latência p50/p95 (global e restrita às
+    memórias de um nó, como no retriever), memória e tempo de build.
+    """
+    rng = np.random.default_rng(seed)
+    n_nos = n_nos or max(1, n // 500)
+    vetores, nos = _sintetico(n, dim, n_nos, rng)
+    ids = np.arange(1, n + 1, dtype=np.int64)  # ids do SQLite começam em 1
+    por_no = {}
+    for i, no in enumerate(nos):
+        por_no.setdefault(int(no), []).append(int(ids[i]))
+
+    amostra = rng.choice(n, size=min(n_queries, n), replace=False)
+    queries = (vetores[amostra] + rng.normal(scale=0.3, size=(len(amostra), dim))).astype("float32")
+    filtros = [por_no[int(nos[i])] for i in amostra]
+
+    resultados = {}
+    verdade = verdade_no = None
+    for tipo in ["flat"] + [t for t in tipos if t != "flat"]:
+        inicio = time.perf_counter()
+        index = construir_indice_memoria(vetores, ids, tipo, metrica)
+        build_s = time.perf_counter() - inicio
+
+        medidas = {}
+        for modo in ("global", "no"):
+            achados, latencias = [], []
+            for q, filtro in zip(queries, filtros):
+                t0 = time.perf_counter()
+                _, I = buscar(index, q[None, :], k, filtro if modo == "no" else None)
+                latencias.append(time.perf_counter() - t0)
+                achados.append(set(I[0].tolist()))
+            latencias.sort()
+            medidas[modo] = (achados, latencias)
+
+        if tipo == "flat":
+            verdade, verdade_no = medidas["global"][0], medidas["no"][0]
+        if tipo not in tipos:
+            continue
+        r = {"tipo_efetivo": tipo_do_indice(index), "build_s": round(build_s, 3),
+             "memoria_mb": round(tamanho_indice_bytes(index) / 2 ** 20, 2)}
+        for modo, ref in (("global", verdade), ("no", verdade_no)):
+            achados, latencias = medidas[modo]
+            r[f"recall@{k}_{modo}"] = round(float(np.mean(
+                [len(a & v) / max(1, len(v)) for a, v in zip(achados, ref)]
+            )), 4)
+            r[f"p50_ms_{modo}"] = round(latencias[len(latencias) // 2] * 1000, 3)
+            r[f"p95_ms_{modo}"] = round(latencias[int(0.95 * (len(latencias) - 1))] * 1000, 3)
+        resultados[tipo] = r
+        del index
+    return resultados
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Índice FAISS das memórias HITL")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    mig = sub.add_parser("migrar", help="Reconstrói o índice com outro tipo/métrica")
+    mig.add_argument("--tipo", default=MEMORY_INDEX_TYPE, choices=("flat", "hnsw", "ivf_flat"))
+    mig.add_argument("--metrica", default=MEMORY_INDEX_METRIC, choices=METRICAS)
+
+    sub.add_parser("verificar", help="Compara o índice com o SQLite (sem alterar)")
+    rec = sub.add_parser("reconstruir", help="Reconstrói o índice a partir do SQLite")
+    rec.add_argument("--tipo", choices=("flat", "hnsw", "ivf_flat"))
+    rec.add_argument("--metrica", choices=METRICAS)
+    sub.add_parser("reparar", help="Verifica e repara (o mesmo do startup)")
+
+    bench = sub.add_parser("benchmark", help="Recall / latência / memória em dados sintéticos")
+    bench.add_argument("--tamanhos", nargs="+", type=int, default=[10_000, 100_000, 1_000_000])
+    bench.add_argument("--dim", type=int, default=256)
+    bench.add_argument("--k", type=int, default=3)
+    bench.add_argument("--queries", type=int, default=200)
+    bench.add_argument("--tipos", nargs="+", default=["flat", "hnsw", "ivf_flat"],
+                       choices=("flat", "hnsw", "ivf_flat"))
+    bench.add_argument("--metrica", default="cosine", choices=METRICAS)
+    args = parser.parse_args()
+
+    if args.comando == "migrar":
+        print(json.dumps(migrar_indice(args.tipo, args.metrica), indent=2, ensure_ascii=False))
+    elif args.comando == "verificar":
+        relatorio = verificar_consistencia()
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+        raise SystemExit(0 if relatorio["ok"] else 1)
+    elif args.comando == "reconstruir":
+        print(json.dumps(reconstruir_indice(args.tipo, args.metrica), indent=2, ensure_ascii=False))
+    elif args.comando == "reparar":
+        print(json.dumps(garantir_indice_memoria(), indent=2, ensure_ascii=False))
+    else:
+        for n in args.tamanhos:
+            print(f"N = {n} × {args.dim}")
+            print(json.dumps(
+                benchmark_memoria(n, args.dim, args.k, args.queries, tipos=args.tipos, metrica=args.metrica),
+                indent=2,
+            ))
@@ -1,30 +1,58 @@
 # lats_sistema/memory/memory_retriever.py
 
-from .db import get_decision_by_id
-from .faiss_store import search_vectors
+import os
+import hashlib
+import logging
+from typing import Any, Dict, List
+
+from .db import (
+    count_decisions_by_node,
+    get_decision_ids_by_node,
+    get_decision_ids_by_nodes,
+    get_decisions_by_ids,
+)
+from .memory_store import search_vectors
 from lats_sistema.utils.embedding_cache import get_event_embedding
+from lats_sistema.utils.metrics import MEMORY_SEARCH_LATENCY, cronometrar, registrar_cache
 import numpy as np
 
+# Prefetch: k da busca única = k por nó × nós com memória × fator
+MEMORY_PREFETCH_FATOR = int(os.getenv("MEMORY_PREFETCH_FATOR", "4"))
+
+logger = logging.getLogger(__name__)
+
 
 def buscar_justificativas_semelhantes(descricao_evento: str, node_id: str, k: int = 3, state: dict = None):
     """
     Recupera memórias humanas relevantes para um nó da árvore.
 
     🔹 Gera embedding do evento
-    🔹 Busca vetores similares no FAISS
-    🔹 Filtra apenas memórias referentes ao node_id
-    🔹 Retorna lista com:
+    🔹 Lista (SQLite, índice por node_id) os ids de memórias do nó
+    🔹 Busca no FAISS restrita a esses ids (IDSelector) → até k vizinhos DO nó
+       (antes: k vizinhos globais filtrados depois → quase sempre 0 memórias)
+    🔹 Busca as linhas em UMA query (antes: uma conexão por id)
+    🔹 Retorna lista (mais semelhante primeiro) com:
         {
+           "id": int,
            "event_text": str,
            "chosen_child": str,
-           "justification_human": str
+           "justification_human": str,
+           "distance": float
         }
     """
 
     if not descricao_evento or not node_id:
         return []
 
-    # 1) Gerar embedding do evento (usando cache se disponível)
+    # 1) Memórias do nó — sem nenhuma, não há o que buscar
+    try:
+        ids_no = get_decision_ids_by_node(node_id)
+    except Exception:
+        return []
+    if not ids_no:
+        return []
+
+    # 2) Gerar embedding do evento (usando cache se disponível)
     try:
         if state is not None:
             # ⚡ OTIMIZAÇÃO: Reutiliza embedding cached do state
@@ -38,35 +66,133 @@ def buscar_justificativas_semelhantes(descricao_evento: str, node_id: str, k: in
         # Fallback silencioso - memória não é crítica
         return []
 
-    # 2) Busca FAISS
+    # 3) Busca FAISS particionada pelo nó
     try:
-        ids, _ = search_vectors(embed_vec, k)
+        with cronometrar(MEMORY_SEARCH_LATENCY):
+            ids, dists = search_vectors(embed_vec, k, ids_permitidos=ids_no)
     except Exception as e:
-        # FAISS index não inicializado - normal em primeira execução
-        # Sistema continua sem memória episódica (não é erro crítico)
+        # Sem índice (primeira execução) ou índice ilegível: segue sem memória
+        # episódica, mas registra — reparo: faiss_store / numpy_store reparar
+        logger.warning(f"[MEMÓRIA] Busca de memórias indisponível: {e}")
         return []
 
-    if ids is None:
+    distancia = {int(did): float(d) for did, d in zip(ids, dists) if did >= 0}
+    if not distancia:
         return []
 
-    mems = []
+    # 4) Recuperar do banco em lote (ordem do ranking preservada)
+    return [_formatar(row, distancia[row["id"]]) for row in get_decisions_by_ids(distancia)]
+
+
+# ================================================================
+# PREFETCH POR REQUISIÇÃO
+# ================================================================
+# Antes: o engine chamava buscar_justificativas_semelhantes para CADA nó
+# expandido, com o mesmo embedding, repetindo a busca vetorial só para
+# filtrar por outro node_id.
+#
+# Agora: UMA busca por requisição, restrita às memórias dos nós alcançáveis
+# a partir dos candidatos, agrupada por node_id numa tabela no state. Sem
+# memórias para esses nós → nem embedding nem busca. Nó cuja cota não veio
+# completa na busca única cai na busca por nó (sob demanda).
+# Quais nós têm memória vem de um GROUP BY (sem ler ids); se o alcance
+# cobre todos eles (busca a partir da raiz) a busca é global, sem filtro
+# de ids — listar todos os ids custaria mais que a própria busca.
+
+def _fingerprint(descricao_evento: str) -> str:
+    return hashlib.sha256(descricao_evento.encode("utf-8")).hexdigest()[:16]
+
+
+def _formatar(row: Dict[str, Any], distancia: float) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "event_text": row.get("event_text", ""),
+        "chosen_child": row.get("chosen_child", ""),
+        "justification_human": row.get("justification_human", ""),
+        "distance": distancia,
+    }
 
-    # 3) Recuperar do banco (somente memórias daquele node_id)
-    for did in ids:
-        if did < 0:
-            continue
 
-        row = get_decision_by_id(int(did))
-        if not row:
-            continue
+def prefetch_memorias(state: dict, descricao_evento: str, node_ids: List[str], k: int = 3) -> Dict[str, Any]:
+    """
+    Busca (uma vez por requisição) as memórias de todos os nós alcançáveis
+    a partir de node_ids e guarda em state["_memorias_prefetch"]:
+        {"evento", "k", "alcance", "por_no": {node_id: [memórias]}, "incompletos"}
+    """
+    from lats_sistema.lats.tree_loader import NODE_INDEX
+    from lats_sistema.lats.utils import nos_alcancaveis, eh_terminal
+
+    fp = _fingerprint(descricao_evento or "")
+    atual = state.get("_memorias_prefetch")
+    if atual and atual["evento"] == fp and atual["k"] >= k:
+        return atual
+
+    alcance = [n for n in nos_alcancaveis(node_ids, NODE_INDEX) if not eh_terminal(NODE_INDEX[n])]
+    prefetch = {"evento": fp, "k": k, "alcance": alcance, "por_no": {}, "incompletos": []}
+
+    if not descricao_evento or not alcance:
+        state["_memorias_prefetch"] = prefetch
+        return prefetch
+
+    # 1) Quantas memórias cada nó alcançável tem (SQLite, sem ids nem vetor)
+    contagens = count_decisions_by_node()
+    por_no_total = {n: contagens[n] for n in alcance if n in contagens}
+    if not por_no_total:
+        print("🧠 Nenhuma memória HITL para os nós desta busca — prefetch pulado")
+        state["_memorias_prefetch"] = prefetch
+        return prefetch
 
-        if row.get("node_id") != node_id:
-            continue
+    total = sum(por_no_total.values())
+    k_total = min(total, k * len(por_no_total) * MEMORY_PREFETCH_FATOR)
 
-        mems.append({
-            "event_text": row.get("event_text", ""),
-            "chosen_child": row.get("chosen_child", ""),
-            "justification_human": row.get("justification_human", ""),
-        })
+    # 2) Uma busca vetorial: global se o alcance cobre todos os nós com
+    #    memória, senão restrita aos ids desses nós
+    ids = None
+    if len(por_no_total) < len(contagens):
+        ids = [did for lista in get_decision_ids_by_nodes(por_no_total).values() for did in lista]
+    embed_vec = get_event_embedding(state, descricao_evento)
+    with cronometrar(MEMORY_SEARCH_LATENCY):
+        ids_res, dists = search_vectors(embed_vec, k_total, ids_permitidos=ids)
+    distancia = {int(did): float(d) for did, d in zip(ids_res, dists) if did >= 0}
+
+    # 3) Linhas em lote, agrupadas por nó (ordem do ranking preservada)
+    por_no: Dict[str, List[Dict[str, Any]]] = {}
+    for row in get_decisions_by_ids(distancia):
+        lista = por_no.setdefault(row["node_id"], [])
+        if len(lista) < k:
+            lista.append(_formatar(row, distancia[row["id"]]))
+
+    prefetch["por_no"] = por_no
+    prefetch["incompletos"] = [
+        n for n, qtd in por_no_total.items() if len(por_no.get(n, [])) < min(k, qtd)
+    ]
+    # Só grava no state se tudo deu certo (erro → busca por nó como fallback)
+    state["_memorias_prefetch"] = prefetch
+    print(f"🧠 Prefetch de memórias: {len(distancia)} memórias em {len(por_no)} nós (1 busca)")
+    return prefetch
+
+
+def memorias_do_no(state: dict, descricao_evento: str, node_id: str, k: int = 3) -> List[Dict[str, Any]]:
+    """
+    Memórias do nó a partir do prefetch da requisição (ou busca por nó, se
+    não coberto). As entregues ao evaluator são anotadas no state
+    ("_memorias_usadas"); o uso (hits / last_used, para a retenção) é gravado
+    uma vez por requisição pelo memory_writer, fora do caminho da resposta.
+    """
+    pre = state.get("_memorias_prefetch")
+    if (
+        pre
+        and pre["evento"] == _fingerprint(descricao_evento or "")
+        and pre["k"] >= k
+        and node_id in pre["alcance"]
+        and node_id not in pre["incompletos"]
+    ):
+        registrar_cache("memoria_prefetch", hit=True)
+        memorias = pre["por_no"].get(node_id, [])[:k]
+    else:
+        registrar_cache("memoria_prefetch", hit=False)
+        memorias = buscar_justificativas_semelhantes(descricao_evento, node_id, k=k, state=state)
 
-    return mems
+    if memorias:
+        state.setdefault("_memorias_usadas", []).extend(m["id"] for m in memorias)
+    return memorias
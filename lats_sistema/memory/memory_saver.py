@@ -1,14 +1,22 @@
 # ================================================================
 # memory_saver.py — lógica de salvamento inteligente de memória HITL
 # ================================================================
+# preparar_memoria   → regras + registro (sem I/O; embedding do state)
+# persistir_memorias → deduplicação + SQLite + FAISS (em lote)
+# O engine não chama a persistência direto: passa pelo memory_writer,
+# que grava em segundo plano.
 
-from lats_sistema.memory.db import insert_decision
-from lats_sistema.memory.faiss_store import add_vector, search_vectors
-from lats_sistema.models.embeddings import embeddings
+from typing import Any, Dict, List, Optional
+
+from lats_sistema.memory.db import get_decision_ids_by_node, insert_decisions
+from lats_sistema.memory.memory_store import add_vector, search_vectors, similaridade
+from lats_sistema.utils.metrics import MEMORY_WRITES
 import numpy as np
 
 ENTROPY_THRESHOLD = 1.0
-DUPLICATE_DISTANCE_THRESHOLD = 0.15   # quanto menor, mais parecido
+# Similaridade de cosseno (independe da métrica do índice; equivale à
+# antiga distância L2² ≤ 0.15 para embeddings normalizados)
+DUPLICATE_SIMILARITY_THRESHOLD = 0.925   # quanto maior, mais parecido
 TOP_K_DUP_CHECK = 5
 
 
@@ -41,11 +49,16 @@ def deve_salvar_memoria(node_id, chosen_child, tracking_children, entropia_local
 
 def memoria_muito_parecida(embed_vec: np.ndarray, node_id: str) -> bool:
     """
-    Checa duplicação REAL usando FAISS (distância vetorial).
+    Checa duplicação REAL usando FAISS (similaridade de cosseno), entre as
+    memórias do MESMO nó (o mesmo evento decidido em outro nó não é duplicata;
+    mesmo critério da compactação em retencao.py).
     """
 
     try:
-        ids, dist = search_vectors(embed_vec, TOP_K_DUP_CHECK)
+        ids_no = get_decision_ids_by_node(node_id)
+        if not ids_no:
+            return False
+        ids, dist = search_vectors(embed_vec, TOP_K_DUP_CHECK, ids_permitidos=ids_no)
     except Exception:
         return False
 
@@ -53,14 +66,17 @@ def memoria_muito_parecida(embed_vec: np.ndarray, node_id: str) -> bool:
         if d < 0:
             continue
 
-        # Quanto menor distância, mais parecido
-        if distance <= DUPLICATE_DISTANCE_THRESHOLD:
+        if similaridade(distance) >= DUPLICATE_SIMILARITY_THRESHOLD:
             return True
 
     return False
 
 
-def salvar_memoria_if_applicable(
+def _cosseno(a: np.ndarray, b: np.ndarray) -> float:
+    return float(a @ b / max(float(np.linalg.norm(a) * np.linalg.norm(b)), 1e-12))
+
+
+def preparar_memoria(
     state,
     node_id,
     chosen_child,
@@ -69,10 +85,13 @@ def salvar_memoria_if_applicable(
     entropia_local,
     avaliacoes,
     probs
-):
+) -> Optional[Dict[str, Any]]:
     """
-    Verifica regras e salva memória (SQLite + FAISS)
-    somente quando fizer sentido.
+    Aplica as regras e monta o registro da memória — sem I/O.
+
+    O embedding vem do cache do state (já calculado na busca de memórias);
+    se a requisição não chegou a gerá-lo, fica None e é calculado na
+    persistência. Retorna None se a memória não deve ser salva.
     """
 
     descricao_evento = state.get("descricao_evento", "")
@@ -90,23 +109,11 @@ def salvar_memoria_if_applicable(
 
     if not salvar:
         print(f"💾 [MEMÓRIA] Não será salva — motivo: {motivo}")
-        return
-
-    # -----------------------------
-    # ETAPA 2 — gerar embedding
-    # -----------------------------
-    embed_vec = embeddings.embed_query(descricao_evento)
-    embed_vec = np.array(embed_vec, dtype="float32")
-
-    # -----------------------------
-    # ETAPA 3 — evitar duplicadas via embeddings
-    # -----------------------------
-    if memoria_muito_parecida(embed_vec, node_id):
-        print("💾 [MEMÓRIA] Pulando — memória muito semelhante já registrada.")
-        return
+        MEMORY_WRITES.labels(resultado="descartada").inc()
+        return None
 
     # -----------------------------
-    # ETAPA 4 — extrair sugestão do modelo
+    # ETAPA 2 — extrair sugestão do modelo
     # -----------------------------
     filhos_ordenados = sorted(
         [{"id": a["id"], "score": a["score"], "prob": float(p), "justificativa": a.get("justificativa", "")}
@@ -115,28 +122,84 @@ def salvar_memoria_if_applicable(
         reverse=True
     )
 
-    modelo_suggestion = filhos_ordenados[0]["id"]
-    modelo_just = filhos_ordenados[0]["justificativa"]
-
-    # -----------------------------
-    # ETAPA 5 — salvar no SQLite
-    # -----------------------------
-    data = {
+    return {
         "event_text": descricao_evento,
         "node_id": node_id,
         "chosen_child": chosen_child,
-        "model_suggestion": modelo_suggestion,
+        "model_suggestion": filhos_ordenados[0]["id"],
         "justification_human": justificativa_humana,
-        "justification_model": modelo_just,
+        "justification_model": filhos_ordenados[0]["justificativa"],
         "entropy": entropia_local,
-        "embedding": embed_vec.tobytes(),
+        "motivo": motivo,
+        # lista de floats (serializável no journal do memory_writer)
+        "embedding": state.get("_event_embedding_cache"),
     }
 
-    mem_id = insert_decision(data)
 
-    # -----------------------------
-    # ETAPA 6 — salvar FAISS
-    # -----------------------------
-    add_vector(embed_vec, mem_id)
+def persistir_memorias(registros: List[Dict[str, Any]]) -> List[str]:
+    """
+    Grava um lote de registros de preparar_memoria (SQLite + FAISS).
+
+    🔹 Embeddings ausentes: UMA chamada embed_documents (cache compartilhado)
+    🔹 Duplicadas (no índice ou dentro do próprio lote) são puladas
+    🔹 SQLite numa única transação, depois o índice
 
-    print(f"💾 [MEMÓRIA] Registrada com id={mem_id} (motivo: {motivo})")
+    Retorna o resultado por registro ("salva" | "duplicada").
+    """
+    faltando = [r["event_text"] for r in registros if r.get("embedding") is None]
+    gerados = iter([])
+    if faltando:
+        from lats_sistema.models.embeddings import embeddings
+        gerados = iter(embeddings.embed_documents(faltando))
+
+    resultados, novos, aceitos = [], [], []
+    for r in registros:
+        vec = r.get("embedding")
+        vec = np.asarray(next(gerados) if vec is None else vec, dtype="float32")
+
+        duplicada = memoria_muito_parecida(vec, r["node_id"]) or any(
+            no == r["node_id"] and _cosseno(vec, outro) >= DUPLICATE_SIMILARITY_THRESHOLD
+            for no, outro in aceitos
+        )
+        resultados.append("duplicada" if duplicada else "salva")
+        if duplicada:
+            print("💾 [MEMÓRIA] Pulando — memória muito semelhante já registrada.")
+            continue
+
+        aceitos.append((r["node_id"], vec))
+        dados = {k: v for k, v in r.items() if k != "motivo"}
+        dados["embedding"] = vec.tobytes()
+        novos.append((dados, vec, r.get("motivo")))
+
+    if novos:
+        mem_ids = insert_decisions([dados for dados, _, _ in novos])
+        for mem_id, (_, vec, motivo) in zip(mem_ids, novos):
+            add_vector(vec, mem_id)
+            print(f"💾 [MEMÓRIA] Registrada com id={mem_id} (motivo: {motivo})")
+
+    for res in resultados:
+        MEMORY_WRITES.labels(resultado=res).inc()
+    return resultados
+
+
+def salvar_memoria_if_applicable(
+    state,
+    node_id,
+    chosen_child,
+    justificativa_humana,
+    justificativa_modelo,
+    entropia_local,
+    avaliacoes,
+    probs
+):
+    """
+    Verifica regras e salva memória (SQLite + FAISS)
+    somente quando fizer sentido — SÍNCRONO.
+    (o engine usa memory_writer.enfileirar_memoria)
+    """
+    registro = preparar_memoria(
+        state, node_id, chosen_child, justificativa_humana,
+        justificativa_modelo, entropia_local, avaliacoes, probs,
+    )
+    if registro is not None:
+        persistir_memorias([registro])
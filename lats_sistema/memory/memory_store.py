@@ -0,0 +1,41 @@
+# lats_sistema/memory/memory_store.py
+"""
+Escolha do backend vetorial das memórias HITL (MEMORY_BACKEND).
+
+- faiss → faiss_store (flat / HNSW / IVF; padrão fora do serverless)
+- numpy → numpy_store (float16 mapeado + força bruta; padrão em
+          SERVERLESS_FAST_MODE, onde o faiss não está no bundle)
+
+faiss pedido mas não instalado → numpy, com aviso. Os dois guardam os
+vetores em arquivos próprios e se reconstroem do SQLite, então trocar de
+backend não perde memórias.
+"""
+
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+_SERVERLESS = os.getenv("SERVERLESS_FAST_MODE", "0") == "1"
+
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "numpy" if _SERVERLESS else "faiss")
+
+if MEMORY_BACKEND == "faiss":
+    try:
+        from lats_sistema.memory import faiss_store as _backend
+    except ImportError as e:
+        logger.warning(f"[MEMÓRIA] faiss indisponível ({e}) — usando o backend numpy")
+        MEMORY_BACKEND = "numpy"
+
+if MEMORY_BACKEND != "faiss":
+    from lats_sistema.memory import numpy_store as _backend
+
+MEMORY_INDEX_CHECK_ON_STARTUP = _backend.MEMORY_INDEX_CHECK_ON_STARTUP
+
+add_vector = _backend.add_vector
+search_vectors = _backend.search_vectors
+similaridade = _backend.similaridade
+get_memory_index = _backend.get_memory_index
+reconstruir_indice = _backend.reconstruir_indice
+verificar_consistencia = _backend.verificar_consistencia
+garantir_indice_memoria = _backend.garantir_indice_memoria
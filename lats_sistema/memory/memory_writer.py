@@ -0,0 +1,305 @@
+# lats_sistema/memory/memory_writer.py
+"""
+Gravação das memórias HITL em segundo plano (write-behind).
+
+O engine enfileira o registro pronto (preparar_memoria); uma thread por
+processo grava em lotes (persistir_memorias). Cada registro vai antes para um
+journal do processo; journals de processos mortos são regravados na
+inicialização. Uso das memórias (hits / last_used) passa pela mesma fila.
+
+Variáveis:
+- MEMORY_WRITER               → liga / desliga (padrão 1; 0 em SERVERLESS_FAST_MODE)
+- MEMORY_WRITER_QUEUE_MAX     → tamanho da fila (padrão 256; cheia → grava inline)
+- MEMORY_WRITER_BATCH         → registros por lote (padrão 32)
+- MEMORY_WRITER_DIR           → diretório dos journals
+- MEMORY_WRITER_FSYNC         → fsync do journal (padrão 1)
+- MEMORY_WRITER_FLUSH_TIMEOUT → espera da fila no encerramento, s (padrão 10)
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from lats_sistema.memory.db import registrar_uso, somente_leitura
+from lats_sistema.memory.memory_saver import persistir_memorias, preparar_memoria
+from lats_sistema.utils.metrics import MEMORY_WRITE_LATENCY, MEMORY_WRITER_QUEUE, MEMORY_WRITES, cronometrar
+
+try:
+    import fcntl
+except ImportError:  # Windows (dev): sem detecção de journal órfão
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_SERVERLESS = os.getenv("SERVERLESS_FAST_MODE", "0") == "1"
+
+MEMORY_WRITER_ENABLED = os.getenv("MEMORY_WRITER", "0" if _SERVERLESS else "1") == "1"
+MEMORY_WRITER_QUEUE_MAX = int(os.getenv("MEMORY_WRITER_QUEUE_MAX", "256"))
+MEMORY_WRITER_BATCH = int(os.getenv("MEMORY_WRITER_BATCH", "32"))
+MEMORY_WRITER_FLUSH_TIMEOUT = float(os.getenv("MEMORY_WRITER_FLUSH_TIMEOUT", "10"))
+MEMORY_WRITER_FSYNC = os.getenv("MEMORY_WRITER_FSYNC", "1") == "1"
+MEMORY_WRITER_DIR = Path(os.getenv("MEMORY_WRITER_DIR", str(Path(__file__).resolve().parent / "pendentes")))
+
+_PREFIXO_JOURNAL = "memorias_pendentes."
+_CHAVE_USO = "_uso"
+
+
+class MemoryWriter:
+    """Fila limitada + thread consumidora + journal durável (um por processo)."""
+
+    def __init__(self):
+        self._fila: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=MEMORY_WRITER_QUEUE_MAX)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._journal = None
+        self._pid = None
+        self._com_erro = False
+
+    # ---------------- ciclo de vida ----------------
+    def iniciar(self):
+        """Abre o journal do processo e sobe a thread (idempotente; refeito após fork)."""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._fila = queue.Queue(maxsize=MEMORY_WRITER_QUEUE_MAX)
+            self._abrir_journal()
+            self._thread = threading.Thread(target=self._loop, name="memory-writer", daemon=True)
+            self._thread.start()
+
+    def _abrir_journal(self):
+        MEMORY_WRITER_DIR.mkdir(parents=True, exist_ok=True)
+        caminho = MEMORY_WRITER_DIR / f"{_PREFIXO_JOURNAL}{os.getpid()}.{time.time_ns()}.jsonl"
+        self._journal = open(caminho, "ab")
+        if fcntl is not None:
+            # Lock mantido enquanto o processo vive → journal sem lock = órfão
+            fcntl.flock(self._journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _rotacionar_journal(self):
+        """Fecha o journal atual (vira órfão, regravado no próximo start) e abre outro. Sob self._lock."""
+        self._journal.close()
+        self._abrir_journal()
+
+    def flush(self, timeout: float = MEMORY_WRITER_FLUSH_TIMEOUT) -> bool:
+        """Espera a fila esvaziar; True se tudo foi gravado."""
+        limite = time.monotonic() + timeout
+        while self._fila.unfinished_tasks:
+            if time.monotonic() > limite or self._thread is None or not self._thread.is_alive():
+                return False
+            time.sleep(0.01)
+        return True
+
+    def encerrar(self, timeout: float = MEMORY_WRITER_FLUSH_TIMEOUT):
+        if self._pid != os.getpid():
+            return
+        if not self.flush(timeout):
+            logger.warning(
+                f"[MEMÓRIA] {self._fila.unfinished_tasks} memórias não gravadas no encerramento "
+                "— ficam no journal e são regravadas na próxima inicialização"
+            )
+
+    # ---------------- produtor ----------------
+    def enfileirar(self, registro: Dict[str, Any]):
+        self.iniciar()
+        linha = json.dumps(registro, ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._lock:
+            self._journal.write(linha)
+            self._journal.flush()
+            if MEMORY_WRITER_FSYNC:
+                os.fsync(self._journal.fileno())
+            try:
+                self._fila.put_nowait(registro)
+                MEMORY_WRITER_QUEUE.inc()
+                return
+            except queue.Full:
+                pass
+        # Fila cheia: grava inline (fica no journal até a fila esvaziar)
+        logger.warning("[MEMÓRIA] Fila de gravação cheia — gravando inline")
+        self._gravar([registro])
+
+    def enfileirar_uso(self, ids: List[int]):
+        """Contagem de uso: sem journal; fila cheia → descarta (melhor-esforço)."""
+        self.iniciar()
+        try:
+            self._fila.put_nowait({_CHAVE_USO: ids})
+            MEMORY_WRITER_QUEUE.inc()
+        except queue.Full:
+            logger.debug(f"[MEMÓRIA] Fila cheia — uso de {len(ids)} memórias não registrado")
+
+    # ---------------- consumidor ----------------
+    def _loop(self):
+        try:
+            recuperar_journals_orfaos()
+        except Exception as e:
+            logger.error(f"[MEMÓRIA] Falha ao recuperar journals órfãos: {e}")
+        while True:
+            lote = [self._fila.get()]
+            while len(lote) < MEMORY_WRITER_BATCH:
+                try:
+                    lote.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                usos = [i for item in lote if _CHAVE_USO in item for i in item[_CHAVE_USO]]
+                registros = [item for item in lote if _CHAVE_USO not in item]
+                if registros:
+                    self._gravar(registros)
+                if usos:
+                    _registrar_uso(usos)
+            finally:
+                MEMORY_WRITER_QUEUE.dec(len(lote))
+                with self._lock:
+                    for _ in lote:
+                        self._fila.task_done()
+                    if self._com_erro:
+                        # Falha sem arquivo de pendentes: o journal inteiro fica
+                        # para a próxima inicialização e este processo segue noutro
+                        self._rotacionar_journal()
+                        self._com_erro = False
+                    elif self._fila.unfinished_tasks == 0:
+                        # Tudo que está no journal já foi gravado
+                        self._journal.truncate(0)
+
+    def _gravar(self, lote: List[Dict[str, Any]]):
+        try:
+            with cronometrar(MEMORY_WRITE_LATENCY):
+                persistir_memorias(lote)
+        except Exception as e:
+            logger.error(f"[MEMÓRIA] Erro ao gravar {len(lote)} memórias: {e}")
+            MEMORY_WRITES.labels(resultado="erro").inc(len(lote))
+            try:
+                _separar_pendentes(lote)
+            except OSError as e_arq:
+                logger.error(f"[MEMÓRIA] Falha ao separar memórias pendentes: {e_arq}")
+                self._com_erro = True
+
+
+def _separar_pendentes(lote: List[Dict[str, Any]]):
+    """
+    Lote que falhou → arquivo próprio, sem lock (órfão): regravado por
+    recuperar_journals_orfaos na próxima inicialização.
+    """
+    MEMORY_WRITER_DIR.mkdir(parents=True, exist_ok=True)
+    caminho = MEMORY_WRITER_DIR / f"{_PREFIXO_JOURNAL}falha.{os.getpid()}.{time.time_ns()}.jsonl"
+    with open(caminho, "wb") as f:
+        for registro in lote:
+            f.write(json.dumps(registro, ensure_ascii=False).encode("utf-8") + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _registrar_uso(ids: List[int]):
+    try:
+        registrar_uso(ids)
+    except Exception as e:
+        logger.warning(f"[MEMÓRIA] Falha ao registrar uso: {e}")
+
+
+def _ler_journal(caminho: Path) -> List[Dict[str, Any]]:
+    registros = []
+    with open(caminho, "rb") as f:
+        for linha in f:
+            try:
+                registros.append(json.loads(linha))
+            except ValueError:
+                break  # linha truncada (crash no meio da escrita)
+    return registros
+
+
+def recuperar_journals_orfaos() -> int:
+    """Regrava memórias de journals de processos que morreram antes do flush."""
+    if fcntl is None or not MEMORY_WRITER_DIR.exists():
+        return 0
+    total = 0
+    for caminho in sorted(MEMORY_WRITER_DIR.glob(f"{_PREFIXO_JOURNAL}*.jsonl")):
+        try:
+            f = open(caminho, "rb+")
+        except FileNotFoundError:
+            continue  # recuperado por outro processo
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                continue  # processo vivo (ou outro processo recuperando)
+            registros = _ler_journal(caminho)
+            for i in range(0, len(registros), MEMORY_WRITER_BATCH):
+                persistir_memorias(registros[i:i + MEMORY_WRITER_BATCH])
+            caminho.unlink()
+        total += len(registros)
+    if total:
+        logger.info(f"[MEMÓRIA] {total} memórias pendentes recuperadas de journals órfãos")
+    return total
+
+
+_writer = MemoryWriter()
+
+
+@atexit.register
+def _encerrar_ao_sair():
+    _writer.encerrar()
+
+
+# ================================================================
+# API
+# ================================================================
+def iniciar_escritor():
+    """Hook de startup: sobe a thread e recupera journals órfãos."""
+    if MEMORY_WRITER_ENABLED:
+        _writer.iniciar()
+
+
+def encerrar_escritor(timeout: float = MEMORY_WRITER_FLUSH_TIMEOUT):
+    """Hook de shutdown: espera as memórias pendentes serem gravadas."""
+    _writer.encerrar(timeout)
+
+
+def enfileirar_uso(ids: List[int]):
+    """
+    Hits / last_used das memórias entregues numa requisição (uma chamada por
+    requisição, ver engine.executar_lats) — gravados pela thread do escritor.
+    """
+    ids = list(dict.fromkeys(ids))
+    if not ids or somente_leitura():
+        return
+    if not MEMORY_WRITER_ENABLED:
+        _registrar_uso(ids)
+        return
+    try:
+        _writer.enfileirar_uso(ids)
+    except Exception as e:
+        logger.warning(f"[MEMÓRIA] Falha ao enfileirar uso: {e}")
+
+
+def enfileirar_memoria(
+    state,
+    node_id,
+    chosen_child,
+    justificativa_humana,
+    justificativa_modelo,
+    entropia_local,
+    avaliacoes,
+    probs
+):
+    """
+    Mesmos argumentos de salvar_memoria_if_applicable; só as regras rodam
+    na requisição — a gravação vai para o escritor em segundo plano.
+    """
+    if somente_leitura():
+        print("💾 [MEMÓRIA] Não será salva — banco de memórias somente leitura")
+        return
+    registro = preparar_memoria(
+        state, node_id, chosen_child, justificativa_humana,
+        justificativa_modelo, entropia_local, avaliacoes, probs,
+    )
+    if registro is None:
+        return
+    if MEMORY_WRITER_ENABLED:
+        _writer.enfileirar(registro)
+    else:
+        persistir_memorias([registro])
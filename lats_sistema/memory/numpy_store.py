@@ -0,0 +1,647 @@
+# lats_sistema/memory/numpy_store.py
+"""
+Backend de memórias HITL só com numpy (sem FAISS), para serverless.
+Mesma interface de faiss_store; escolha em memory_store.
+
+Arquivo memoria_vetores.bin: cabeçalho "LATSNPM1" + n + d (int64) | ids
+int64[n] ordenados | vetores float16[n × d] normalizados, aberto com
+np.memmap. Busca exata em blocos; inserções num log compactado no arquivo.
+Arquivo ausente → reconstruído do SQLite.
+
+Variáveis:
+- MEMORY_NUMPY_PATH       → arquivo (padrão ao lado do banco; /tmp em SERVERLESS_FAST_MODE)
+- MEMORY_NUMPY_BLOCK_ROWS → linhas por bloco da busca (padrão 4096)
+- MEMORY_INDEX_COMPACT_EVERY / MEMORY_INDEX_RELOAD_INTERVAL /
+  MEMORY_INDEX_FSYNC / MEMORY_INDEX_CHECK_ON_STARTUP / MEMORY_INDEX_REPAIR_MAX
+  → como em faiss_store
+
+    python -m lats_sistema.memory.numpy_store verificar | reparar | reconstruir | benchmark
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows (dev): sem lock entre processos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Serverless: o pacote é só-leitura e /tmp sobrevive entre invocações "quentes"
+# → a matriz reconstruída do SQLite fica em /tmp (uma vez por contêiner)
+_SERVERLESS = os.getenv("SERVERLESS_FAST_MODE", "0") == "1"
+_PADRAO_DIR = Path("/tmp/lats_memoria") if _SERVERLESS else Path(__file__).resolve().parent
+INDEX_PATH = Path(os.getenv("MEMORY_NUMPY_PATH", str(_PADRAO_DIR / "memoria_vetores.bin")))
+
+# Mesmos parâmetros de sincronização / consistência do faiss_store
+MEMORY_INDEX_COMPACT_EVERY = int(os.getenv("MEMORY_INDEX_COMPACT_EVERY", "256"))
+MEMORY_INDEX_RELOAD_INTERVAL = float(os.getenv("MEMORY_INDEX_RELOAD_INTERVAL", "1.0"))
+MEMORY_INDEX_FSYNC = os.getenv("MEMORY_INDEX_FSYNC", "1") == "1"
+MEMORY_INDEX_CHECK_ON_STARTUP = os.getenv("MEMORY_INDEX_CHECK_ON_STARTUP", "1") == "1"
+MEMORY_INDEX_REPAIR_MAX = int(os.getenv("MEMORY_INDEX_REPAIR_MAX", "1000"))
+# Linhas convertidas para float32 por vez na força bruta (4096 × 1536 ≈ 25 MB)
+MEMORY_NUMPY_BLOCK_ROWS = int(os.getenv("MEMORY_NUMPY_BLOCK_ROWS", "4096"))
+
+_MAGICO = b"LATSNPM1"
+_CABECALHO = len(_MAGICO) + 16
+
+
+def _log_path() -> Path:
+    return INDEX_PATH.with_suffix(".log")
+
+
+@contextmanager
+def _lock_arquivos():
+    """Lock exclusivo entre processos (append no log / compactação)."""
+    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(INDEX_PATH.with_suffix(".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _geracao(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def _normalizar(vetores: np.ndarray) -> np.ndarray:
+    vetores = np.asarray(vetores, dtype=np.float32)
+    return vetores / np.maximum(np.linalg.norm(vetores, axis=-1, keepdims=True), 1e-12)
+
+
+# -----------------------------------------------------------
+# Arquivo (cabeçalho + ids + float16)
+# -----------------------------------------------------------
+def gravar_matriz(ids: np.ndarray, vetores: np.ndarray, path: Optional[Path] = None):
+    """Grava (ids, vetores) atomicamente: ordenado por id, normalizado, float16."""
+    path = path or INDEX_PATH
+    ids = np.asarray(ids, dtype=np.int64)
+    ordem = np.argsort(ids, kind="stable")
+    ids = ids[ordem]
+    tmp = path.with_suffix(".bin.tmp")
+    with open(tmp, "wb") as f:
+        f.write(_MAGICO + np.array([len(ids), vetores.shape[1]], dtype=np.int64).tobytes())
+        f.write(ids.tobytes())
+        for i in range(0, len(ids), MEMORY_NUMPY_BLOCK_ROWS):
+            bloco = ordem[i:i + MEMORY_NUMPY_BLOCK_ROWS]
+            f.write(_normalizar(vetores[bloco]).astype(np.float16).tobytes())
+    os.replace(tmp, path)
+
+
+def abrir_matriz(path: Optional[Path] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """(ids, vetores float16) mapeados do arquivo (somente leitura)."""
+    path = path or INDEX_PATH
+    if not path.exists():
+        raise RuntimeError(f"Memory matrix not found at {path}. Run reconstruir_indice() first.")
+    with open(path, "rb") as f:
+        cabecalho = f.read(_CABECALHO)
+    if cabecalho[:len(_MAGICO)] != _MAGICO:
+        raise RuntimeError(f"Arquivo de memórias inválido: {path}")
+    n, d = (int(x) for x in np.frombuffer(cabecalho[len(_MAGICO):], dtype=np.int64))
+    if path.stat().st_size != _CABECALHO + n * 8 + n * d * 2:
+        raise RuntimeError(f"Arquivo de memórias truncado: {path}")
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty((0, d), dtype=np.float16)
+    ids = np.memmap(path, dtype=np.int64, mode="r", offset=_CABECALHO, shape=(n,))
+    vetores = np.memmap(path, dtype=np.float16, mode="r", offset=_CABECALHO + n * 8, shape=(n, d))
+    return ids, vetores
+
+
+# -----------------------------------------------------------
+# Top-k em blocos
+# -----------------------------------------------------------
+def _topk(scores: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(scores) > k:
+        sel = np.argpartition(-scores, k - 1)[:k]
+        scores, ids = scores[sel], ids[sel]
+    ordem = np.argsort(-scores, kind="stable")
+    return scores[ordem], ids[ordem]
+
+
+def buscar_blocos(vetores: np.ndarray, ids: np.ndarray, q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Produto interno exato de q (normalizado) contra todas as linhas, bloco a bloco."""
+    melhores_d, melhores_i = [], []
+    for i in range(0, len(ids), MEMORY_NUMPY_BLOCK_ROWS):
+        fim = i + MEMORY_NUMPY_BLOCK_ROWS
+        scores = vetores[i:fim].astype(np.float32) @ q
+        d, s = _topk(scores, np.asarray(ids[i:fim]), k)
+        melhores_d.append(d)
+        melhores_i.append(s)
+    if not melhores_d:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+    return _topk(np.concatenate(melhores_d), np.concatenate(melhores_i), k)
+
+
+# -----------------------------------------------------------
+# Matriz em memória + log write-behind
+# -----------------------------------------------------------
+class MemoryIndex:
+    """
+    Matriz de memórias (mapeada, somente leitura) + delta dos registros do
+    log, sincronizados via geração + log como no faiss_store.
+    """
+
+    cosseno = True  # vetores sempre normalizados: distância = produto interno
+    mmap = True
+
+    def __init__(self, reconstruir_ausente: bool = True):
+        self._lock = threading.RLock()
+        self.reconstruir_ausente = reconstruir_ausente
+        self.ids = None
+        self.vetores = None
+        self.d = None
+        self._delta_ids = []
+        self._delta_vetores = []
+        self._ids_delta = set()
+        self._geracao = None
+        self._offset_log = 0
+        self._ultima_checagem = 0.0
+        self._carregado = False
+        self._somente_memoria = False
+
+    # ---------------- sincronização com o disco ----------------
+    def _registro_bytes(self) -> int:
+        return 8 + 2 * self.d
+
+    def _recarregar(self):
+        self._carregado = True
+        if not INDEX_PATH.exists() and self.reconstruir_ausente and not self._somente_memoria:
+            try:
+                reconstruir_indice()
+            except (OSError, sqlite3.Error) as e:
+                self._carregar_do_sqlite(e)
+                return
+            except RuntimeError:
+                pass  # sem embeddings no SQLite: continua vazio até o primeiro add
+        if self._somente_memoria:
+            return
+        self._geracao = _geracao(INDEX_PATH)
+        if self._geracao is None:
+            self.ids = self.vetores = None
+            return
+        self.ids, self.vetores = abrir_matriz()
+        self.d = self.vetores.shape[1]
+        self._delta_ids, self._delta_vetores, self._ids_delta = [], [], set()
+        self._offset_log = 0
+        self._aplicar_log()
+        logger.info(f"[MEMÓRIA] Matriz numpy carregada: {self.ntotal_local} vetores (geração {self._geracao})")
+
+    def _carregar_do_sqlite(self, erro: Exception):
+        """Filesystem somente leitura: matriz do SQLite só neste processo."""
+        from lats_sistema.memory.db import carregar_embeddings
+
+        self._somente_memoria = True
+        try:
+            ids, vetores = carregar_embeddings()
+        except sqlite3.Error as e2:
+            logger.warning(f"[MEMÓRIA] Sem índice ({erro}) e SQLite ilegível ({e2}) — memória vazia")
+            return
+        if vetores is None:
+            return
+        ordem = np.argsort(ids, kind="stable")
+        self.ids = ids[ordem]
+        self.vetores = _normalizar(vetores[ordem]).astype(np.float16)
+        self.d = self.vetores.shape[1]
+        logger.warning(f"[MEMÓRIA] Sem escrita em {INDEX_PATH} ({erro}) — {len(self.ids)} vetores só em memória")
+
+    def _aplicar_log(self) -> int:
+        """Aplica os registros do log a partir do offset já lido."""
+        if self._somente_memoria or self.d is None:
+            return 0
+        try:
+            tamanho = _log_path().stat().st_size
+        except FileNotFoundError:
+            return 0
+        if tamanho < self._offset_log:
+            # Log zerado por compactação de outro processo → recarga completa
+            self._recarregar()
+            return 0
+
+        reg = self._registro_bytes()
+        n = (tamanho - self._offset_log) // reg  # ignora registro truncado no fim
+        if n <= 0:
+            return 0
+        with open(_log_path(), "rb") as f:
+            f.seek(self._offset_log)
+            bruto = f.read(n * reg)
+        if _geracao(INDEX_PATH) != self._geracao:
+            # Compactação concorrente: o log lido pode ser de outra geração
+            self._recarregar()
+            return 0
+        n = len(bruto) // reg
+        if n <= 0:
+            return 0
+        dados = np.frombuffer(bruto[: n * reg], dtype=np.uint8).reshape(n, reg)
+        ids = dados[:, :8].copy().view(np.int64).ravel()
+        vetores = dados[:, 8:].copy().view(np.float16)
+        novos = np.array([i not in self._ids_delta for i in ids.tolist()], dtype=bool)
+        self._delta_ids.append(ids[novos])
+        self._delta_vetores.append(vetores[novos])
+        self._ids_delta.update(ids.tolist())
+        self._offset_log += n * reg
+        return n
+
+    def sincronizar(self, forcar: bool = False):
+        with self._lock:
+            agora = time.monotonic()
+            if not forcar and self._carregado and agora - self._ultima_checagem < MEMORY_INDEX_RELOAD_INTERVAL:
+                return
+            self._ultima_checagem = agora
+            if self._somente_memoria:
+                return
+            if self._geracao is None or _geracao(INDEX_PATH) != self._geracao:
+                self._recarregar()
+            else:
+                self._aplicar_log()
+
+    # ---------------- escrita ----------------
+    def add(self, vec: np.ndarray, decision_id: int):
+        vec = np.ascontiguousarray(vec, dtype="float32").reshape(-1)
+        with self._lock:
+            self.sincronizar(forcar=True)
+            if self._geracao is None and not self._somente_memoria:
+                # Sem matriz nem embeddings no SQLite: cria vazia na dimensão do vetor
+                reconstruir_indice(dim=vec.shape[0])
+                self.sincronizar(forcar=True)
+            self.d = self.d or vec.shape[0]
+            if vec.shape[0] != self.d:
+                raise ValueError(f"Dimensão {vec.shape[0]} ≠ matriz {self.d}")
+            vec16 = _normalizar(vec).astype(np.float16)
+            if self._somente_memoria:
+                if not self.contem(decision_id):
+                    self._delta_ids.append(np.array([decision_id], dtype=np.int64))
+                    self._delta_vetores.append(vec16[None, :])
+                    self._ids_delta.add(int(decision_id))
+                return
+            registro = np.array([decision_id], dtype=np.int64).tobytes() + vec16.tobytes()
+
+            # Sob o lock de arquivos ninguém compacta: append + aplicação consistentes
+            with _lock_arquivos():
+                if _geracao(INDEX_PATH) != self._geracao:
+                    self._recarregar()
+                else:
+                    self._aplicar_log()
+                reg = len(registro)
+                if self.contem(decision_id):
+                    return  # já indexado (rebuild concorrente / regravação de journal)
+                with open(_log_path(), "ab") as f:
+                    sobra = f.tell() % reg
+                    if sobra:
+                        # Registro truncado de um crash anterior: descarta
+                        f.truncate(f.tell() - sobra)
+                    f.write(registro)
+                    f.flush()
+                    if MEMORY_INDEX_FSYNC:
+                        os.fsync(f.fileno())
+                self._aplicar_log()
+
+            if self._offset_log // reg >= MEMORY_INDEX_COMPACT_EVERY:
+                self.compactar()
+
+    def compactar(self):
+        """Grava a matriz com todo o log aplicado e zera o log."""
+        with self._lock, _lock_arquivos():
+            self.sincronizar(forcar=True)
+            if self._somente_memoria:
+                return
+            ids, vetores = self._delta()
+            if len(ids):
+                gravar_matriz(
+                    np.concatenate([self.ids, ids]),
+                    np.concatenate([np.asarray(self.vetores), vetores]),
+                )
+            _log_path().write_bytes(b"")
+            self._recarregar()
+            logger.info(f"[MEMÓRIA] Matriz compactada: {self.ntotal_local} vetores")
+
+    # ---------------- leitura ----------------
+    def _delta(self) -> Tuple[np.ndarray, np.ndarray]:
+        if not self._delta_ids:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.d or 0), dtype=np.float16)
+        if len(self._delta_ids) > 1:
+            self._delta_ids = [np.concatenate(self._delta_ids)]
+            self._delta_vetores = [np.concatenate(self._delta_vetores)]
+        return self._delta_ids[0], self._delta_vetores[0]
+
+    @property
+    def ntotal_local(self) -> int:
+        base = len(self.ids) if self.ids is not None else 0
+        return base + len(self._ids_delta)
+
+    def _posicoes(self, decision_ids: np.ndarray) -> np.ndarray:
+        """Posições na matriz base dos ids presentes nela."""
+        if self.ids is None or len(self.ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        pos = np.searchsorted(self.ids, decision_ids)
+        pos = pos[pos < len(self.ids)]
+        return np.unique(pos[np.isin(np.asarray(self.ids[pos]), decision_ids)])
+
+    def contem(self, decision_id: int) -> bool:
+        if int(decision_id) in self._ids_delta:
+            return True
+        return len(self._posicoes(np.array([decision_id], dtype=np.int64))) > 0
+
+    def search(self, vec: np.ndarray, k: int, ids_permitidos: Optional[Sequence[int]] = None):
+        with self._lock:
+            self.sincronizar()
+            if self.ntotal_local == 0:
+                return None
+            q = _normalizar(vec[0])
+            delta_ids, delta_vetores = self._delta()
+
+            if ids_permitidos is None:
+                partes = [buscar_blocos(self.vetores, self.ids, q, k)] if self.ids is not None else []
+            else:
+                permitidos = np.asarray(ids_permitidos, dtype=np.int64)
+                pos = self._posicoes(permitidos)
+                partes = [
+                    buscar_blocos(self.vetores[pos[i:i + MEMORY_NUMPY_BLOCK_ROWS]], self.ids[pos[i:i + MEMORY_NUMPY_BLOCK_ROWS]], q, k)
+                    for i in range(0, len(pos), MEMORY_NUMPY_BLOCK_ROWS)
+                ]
+                filtro = np.isin(delta_ids, permitidos)
+                delta_ids, delta_vetores = delta_ids[filtro], delta_vetores[filtro]
+            if len(delta_ids):
+                partes.append(buscar_blocos(delta_vetores, delta_ids, q, k))
+            if not partes:
+                return np.empty((1, 0), dtype=np.float32), np.empty((1, 0), dtype=np.int64)
+
+            d, i = _topk(np.concatenate([p[0] for p in partes]), np.concatenate([p[1] for p in partes]), k)
+            return d[None, :].astype(np.float32), i[None, :].astype(np.int64)
+
+    def ids_indexados(self) -> np.ndarray:
+        with self._lock:
+            self.sincronizar(forcar=True)
+            if self._geracao is None and not self._somente_memoria:
+                raise RuntimeError(f"Memory matrix not found at {INDEX_PATH}")
+            base = np.asarray(self.ids) if self.ids is not None else np.empty(0, dtype=np.int64)
+            return np.concatenate([base, self._delta()[0]]).astype(np.int64)
+
+    def reconstruir(self, decision_id: int) -> np.ndarray:
+        with self._lock:
+            if int(decision_id) in self._ids_delta:
+                ids, vetores = self._delta()
+                return vetores[np.flatnonzero(ids == decision_id)[-1]].astype(np.float32)
+            pos = self._posicoes(np.array([decision_id], dtype=np.int64))
+            if not len(pos):
+                raise RuntimeError(f"id {decision_id} ausente da matriz de memórias")
+            return self.vetores[pos[0]].astype(np.float32)
+
+    @property
+    def ntotal(self) -> int:
+        with self._lock:
+            self.sincronizar()
+            return self.ntotal_local
+
+
+_memory_index: Optional[MemoryIndex] = None
+_memory_index_lock = threading.Lock()
+
+
+def get_memory_index() -> MemoryIndex:
+    global _memory_index
+    with _memory_index_lock:
+        if _memory_index is None:
+            _memory_index = MemoryIndex()
+        return _memory_index
+
+
+# -----------------------------------------------------------
+# API (mesma do faiss_store)
+# -----------------------------------------------------------
+def add_vector(vec: np.ndarray, decision_id: int):
+    """Adiciona o vetor da memória decision_id (log durável + delta em memória)."""
+    get_memory_index().add(vec, decision_id)
+
+
+def search_vectors(vec: np.ndarray, k=3, ids_permitidos: Optional[Sequence[int]] = None):
+    """
+    Busca exata (cosseno) das memórias mais similares.
+    ids_permitidos: só entre esses ids (ex.: memórias de um nó).
+    Retorna (melhor primeiro): ids, distâncias (= similaridade de cosseno).
+    """
+    if vec.ndim == 1:
+        vec = vec.reshape(1, -1)
+
+    vec = vec.astype("float32")
+
+    if ids_permitidos is not None:
+        if len(ids_permitidos) == 0:
+            return [], []
+        k = min(k, len(ids_permitidos))
+
+    resultado = get_memory_index().search(vec, k, ids_permitidos)
+    if resultado is None:
+        return [], []
+
+    distances, ids = resultado
+    return ids[0], distances[0]
+
+
+def similaridade(distancia: float) -> float:
+    """Valor devolvido por search_vectors → similaridade de cosseno (já é)."""
+    return float(distancia)
+
+
+# -----------------------------------------------------------
+# Rebuild e consistência com o SQLite (fonte da verdade)
+# -----------------------------------------------------------
+def reconstruir_indice(dim: Optional[int] = None) -> dict:
+    """
+    Reconstrói memoria_vetores.bin a partir dos embeddings do SQLite e zera
+    o log. Banco sem embeddings → matriz vazia de dimensão `dim` (ou a atual).
+    """
+    from lats_sistema.memory.db import carregar_embeddings
+
+    with _lock_arquivos():
+        inicio = time.perf_counter()
+        ids, vetores = carregar_embeddings()
+        carga_s = time.perf_counter() - inicio
+        if vetores is None:
+            if dim is None:
+                try:
+                    dim = abrir_matriz()[1].shape[1]
+                except RuntimeError:
+                    raise RuntimeError("Sem embeddings no SQLite nem matriz legível: informe dim")
+            vetores = np.empty((0, dim), dtype="float32")
+
+        inicio = time.perf_counter()
+        gravar_matriz(ids, vetores)
+        _log_path().write_bytes(b"")
+        build_s = time.perf_counter() - inicio
+
+    logger.info(f"[MEMÓRIA] Matriz numpy reconstruída do SQLite: {len(ids)} vetores")
+    return {
+        "vetores": int(len(ids)),
+        "tipo": "numpy_f16",
+        "metrica": "cosine",
+        "carga_s": round(carga_s, 3),
+        "build_s": round(build_s, 3),
+    }
+
+
+def _verificar(amostra: int = 32) -> Tuple[dict, np.ndarray]:
+    from lats_sistema.memory.db import get_decision_ids_with_embedding, get_decisions_by_ids
+
+    ids_db = get_decision_ids_with_embedding()
+    rel = {"ok": False, "erro": None, "sqlite": int(len(ids_db)), "indice": 0,
+           "faltando": 0, "orfaos": 0, "duplicados": 0, "divergentes": 0}
+    vazio = np.empty(0, dtype=np.int64)
+
+    indice = MemoryIndex(reconstruir_ausente=False)
+    try:
+        ids_idx = indice.ids_indexados()
+    except Exception as e:
+        rel["erro"] = f"{type(e).__name__}: {e}"
+        return rel, vazio
+
+    unicos = np.unique(ids_idx)
+    faltando = np.setdiff1d(ids_db, unicos)
+    rel.update(
+        indice=int(len(ids_idx)),
+        duplicados=int(len(ids_idx) - len(unicos)),
+        faltando=int(len(faltando)),
+        orfaos=int(len(np.setdiff1d(unicos, ids_db))),
+    )
+
+    comuns = np.intersect1d(ids_db, unicos)
+    if len(comuns):
+        rng = np.random.default_rng(0)
+        escolhidos = rng.choice(comuns, size=min(amostra, len(comuns)), replace=False)
+        for row in get_decisions_by_ids(escolhidos.tolist()):
+            v = np.frombuffer(row["embedding"], dtype=np.float32)
+            if v.size != indice.d:
+                rel["divergentes"] += 1
+                continue
+            w = indice.reconstruir(row["id"])
+            cos = float(v @ w) / max(float(np.linalg.norm(v) * np.linalg.norm(w)), 1e-12)
+            if cos < 0.999:
+                rel["divergentes"] += 1
+
+    rel["ok"] = not (rel["faltando"] or rel["orfaos"] or rel["duplicados"] or rel["divergentes"])
+    return rel, faltando
+
+
+def verificar_consistencia(amostra: int = 32) -> dict:
+    """Compara a matriz (arquivo + log) com o SQLite. Não altera nada."""
+    return _verificar(amostra)[0]
+
+
+def garantir_indice_memoria(reparar: bool = True) -> dict:
+    """
+    Hook de inicialização (mesmo critério do faiss_store): poucos ids
+    faltando → adiciona do SQLite; qualquer outra divergência → rebuild.
+    """
+    from lats_sistema.memory.db import get_decisions_by_ids
+
+    rel, faltando = _verificar()
+    if rel["ok"]:
+        logger.info(f"[MEMÓRIA] Matriz consistente com o SQLite ({rel['indice']} vetores)")
+        return rel
+    if rel["erro"] and rel["sqlite"] == 0:
+        return rel  # sem matriz e sem memórias: o primeiro add cria
+    logger.warning(f"[MEMÓRIA] Matriz inconsistente com o SQLite: {rel}")
+    if not reparar:
+        return rel
+
+    so_faltando = not (rel["erro"] or rel["orfaos"] or rel["duplicados"] or rel["divergentes"])
+    if so_faltando and rel["faltando"] <= MEMORY_INDEX_REPAIR_MAX:
+        indice = get_memory_index()
+        for row in get_decisions_by_ids(faltando.tolist()):
+            indice.add(np.frombuffer(row["embedding"], dtype=np.float32), row["id"])
+    else:
+        reconstruir_indice()
+
+    rel = verificar_consistencia()
+    logger.info(f"[MEMÓRIA] Matriz reparada: {rel}")
+    return rel
+
+
+# -----------------------------------------------------------
+# Benchmark (float16 em blocos × float32 exato)
+# -----------------------------------------------------------
+def benchmark_memoria(n: int, dim: int = 1536, k: int = 3, n_queries: int = 100, seed: int = 0) -> dict:
+    """Recall@k contra float32 exato e latência p50/p95 (global e por nó)."""
+    import tempfile
+
+    rng = np.random.default_rng(seed)
+    n_nos = max(1, n // 500)
+    centros = rng.normal(size=(n_nos, dim)).astype("float32")
+    nos = rng.integers(0, n_nos, size=n)
+    vetores = _normalizar(centros[nos] + rng.normal(scale=0.8, size=(n, dim)).astype("float32"))
+    ids = np.arange(1, n + 1, dtype=np.int64)
+
+    amostra = rng.choice(n, size=min(n_queries, n), replace=False)
+    queries = _normalizar(vetores[amostra] + rng.normal(scale=0.3, size=(len(amostra), dim)).astype("float32"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "memoria_vetores.bin"
+        gravar_matriz(ids, vetores, path)
+        ids_m, vetores_m = abrir_matriz(path)
+        r = {"memoria_mb": round(path.stat().st_size / 2 ** 20, 2)}
+        for modo in ("global", "no"):
+            acertos, latencias = [], []
+            for j, q in zip(amostra, queries):
+                linhas = np.flatnonzero(nos == nos[j]) if modo == "no" else slice(None)
+                verdade = set(_topk(vetores[linhas] @ q, ids[linhas], k)[1].tolist())
+                t0 = time.perf_counter()
+                if modo == "no":
+                    _, achados = buscar_blocos(vetores_m[linhas], ids_m[linhas], q, k)
+                else:
+                    _, achados = buscar_blocos(vetores_m, ids_m, q, k)
+                latencias.append(time.perf_counter() - t0)
+                acertos.append(len(verdade & set(achados.tolist())) / k)
+            latencias.sort()
+            r[f"recall@{k}_{modo}"] = round(float(np.mean(acertos)), 4)
+            r[f"p50_ms_{modo}"] = round(latencias[len(latencias) // 2] * 1000, 3)
+            r[f"p95_ms_{modo}"] = round(latencias[int(0.95 * (len(latencias) - 1))] * 1000, 3)
+        del ids_m, vetores_m
+    return r
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Matriz numpy das memórias HITL (backend sem FAISS)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("verificar", help="Compara a matriz com o SQLite (sem alterar)")
+    sub.add_parser("reconstruir", help="Reconstrói a matriz a partir do SQLite")
+    sub.add_parser("reparar", help="Verifica e repara (o mesmo do startup)")
+    bench = sub.add_parser("benchmark", help="Recall / latência em dados sintéticos")
+    bench.add_argument("--tamanhos", nargs="+", type=int, default=[1_000, 10_000, 50_000])
+    bench.add_argument("--dim", type=int, default=1536)
+    bench.add_argument("--k", type=int, default=3)
+    bench.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.comando == "verificar":
+        relatorio = verificar_consistencia()
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+        raise SystemExit(0 if relatorio["ok"] else 1)
+    elif args.comando == "reconstruir":
+        print(json.dumps(reconstruir_indice(), indent=2, ensure_ascii=False))
+    elif args.comando == "reparar":
+        print(json.dumps(garantir_indice_memoria(), indent=2, ensure_ascii=False))
+    else:
+        for n in args.tamanhos:
+            print(f"N = {n} × {args.dim}")
+            print(json.dumps(benchmark_memoria(n, args.dim, args.k, args.queries), indent=2))
@@ -0,0 +1,197 @@
+# lats_sistema/memory/retencao.py
+"""
+Retenção, deduplicação e despejo das memórias HITL (job por nó).
+
+Quase-duplicatas viram um grupo com um representante (escolhas iguais → o
+mais usado; conflitantes → o mais recente), que herda hits / last_used. As
+remoções são feitas numa transação e o índice vetorial é reconstruído do
+SQLite.
+
+Variáveis:
+- MEMORY_DEDUP_SIMILARIDADE     → cosseno mínimo para duplicata (padrão o do memory_saver)
+- MEMORY_RETENTION_MAX_AGE_DAYS → remove as sem uso há N dias (0 = desligado)
+- MEMORY_RETENTION_MIN_HITS     → ... com menos de N hits (padrão 1)
+- MEMORY_RETENTION_MAX_PER_NODE → mantém as N mais ativas do nó (0 = sem limite)
+
+Sem --aplicar só relata o que seria removido:
+    python -m lats_sistema.memory.retencao [--aplicar]
+"""
+
+import os
+import json
+import logging
+import datetime
+import argparse
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from lats_sistema.memory.db import delete_decisions, get_node_ids, iso_utc, iter_decisions, transacao
+from lats_sistema.memory.memory_saver import DUPLICATE_SIMILARITY_THRESHOLD
+from lats_sistema.utils.metrics import MEMORY_COMPACTION
+
+logger = logging.getLogger(__name__)
+
+MEMORY_DEDUP_SIMILARIDADE = float(os.getenv("MEMORY_DEDUP_SIMILARIDADE", str(DUPLICATE_SIMILARITY_THRESHOLD)))
+MEMORY_RETENTION_MAX_AGE_DAYS = int(os.getenv("MEMORY_RETENTION_MAX_AGE_DAYS", "0"))  # 0 = desligado
+MEMORY_RETENTION_MIN_HITS = int(os.getenv("MEMORY_RETENTION_MIN_HITS", "1"))
+MEMORY_RETENTION_MAX_PER_NODE = int(os.getenv("MEMORY_RETENTION_MAX_PER_NODE", "0"))  # 0 = sem limite
+
+
+def _atividade(m: Dict[str, Any]) -> str:
+    """Última atividade (ISO): último uso ou criação."""
+    return max(m.get("last_used") or "", m.get("timestamp") or "")
+
+
+def _matriz(memorias: List[Dict[str, Any]]) -> Tuple[List[int], Optional[np.ndarray]]:
+    """
+    Matriz normalizada das memórias com embedding na dimensão majoritária do
+    nó, e os índices (em `memorias`) de cada linha. Embeddings ausentes ou de
+    outra dimensão ficam fora da dedup (sem derrubar a dedup do nó inteiro).
+    """
+    tamanhos = Counter(
+        len(m["embedding"]) for m in memorias
+        if m["embedding"] and len(m["embedding"]) % 4 == 0
+    )
+    if not tamanhos:
+        return [], None
+    tamanho = max(tamanhos, key=lambda t: (tamanhos[t], t))
+    validos = [i for i, m in enumerate(memorias) if m["embedding"] and len(m["embedding"]) == tamanho]
+    matriz = np.frombuffer(b"".join(memorias[i]["embedding"] for i in validos), dtype=np.float32)
+    matriz = matriz.reshape(len(validos), -1).copy()
+    matriz /= np.maximum(np.linalg.norm(matriz, axis=1, keepdims=True), 1e-12)
+    return validos, matriz
+
+
+# ===================================================================
+# DEDUPLICAÇÃO (POR NÓ)
+# ===================================================================
+def agrupar_duplicatas(memorias: List[Dict[str, Any]], limiar: float = MEMORY_DEDUP_SIMILARIDADE) -> List[List[int]]:
+    """
+    Agrupamento guloso por líder: do mais recente para o mais antigo, cada
+    memória ainda livre puxa as livres com cosseno ≥ limiar. Retorna grupos
+    de índices (em `memorias`) com 2+ elementos.
+    """
+    validos, matriz = _matriz(memorias)
+    if matriz is None or len(validos) < 2:
+        return []
+
+    ordem = sorted(range(len(validos)), key=lambda j: memorias[validos[j]]["id"], reverse=True)
+    livre = np.ones(len(validos), dtype=bool)
+    grupos = []
+    for lider in ordem:
+        if not livre[lider]:
+            continue
+        sims = matriz @ matriz[lider]
+        membros = np.flatnonzero(livre & (sims >= limiar))
+        livre[membros] = False
+        if len(membros) > 1:
+            grupos.append([validos[j] for j in membros])
+    return grupos
+
+
+def representante(grupo: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if len({m["chosen_child"] for m in grupo}) > 1:
+        # Decisões humanas conflitantes para o mesmo evento: vale a mais nova
+        return max(grupo, key=lambda m: m["id"])
+    return max(grupo, key=lambda m: (m.get("hits") or 0, m["id"]))
+
+
+# ===================================================================
+# PLANO DE COMPACTAÇÃO
+# ===================================================================
+def planejar_no(node_id: str, agora: Optional[datetime.datetime] = None) -> Dict[str, Any]:
+    """
+    O que compactar num nó (sem alterar nada):
+        {"node_id", "total", "remover": {id: motivo}, "atualizar": {id: (hits, last_used)}}
+    """
+    agora = agora or datetime.datetime.now(datetime.timezone.utc)
+    memorias = list(iter_decisions(node_id))
+    remover: Dict[int, str] = {}
+    atualizar: Dict[int, tuple] = {}
+
+    # 1) Quase-duplicatas → um representante com o uso somado
+    for grupo_idx in agrupar_duplicatas(memorias):
+        grupo = [memorias[i] for i in grupo_idx]
+        rep = representante(grupo)
+        for m in grupo:
+            if m["id"] != rep["id"]:
+                remover[m["id"]] = "duplicada"
+        usos = [m.get("last_used") for m in grupo if m.get("last_used")]
+        atualizar[rep["id"]] = (sum(m.get("hits") or 0 for m in grupo), max(usos) if usos else None)
+        rep["hits"], rep["last_used"] = atualizar[rep["id"]]
+
+    restantes = [m for m in memorias if m["id"] not in remover]
+
+    # 2) Idade: sem atividade há N dias e pouco usadas
+    if MEMORY_RETENTION_MAX_AGE_DAYS > 0:
+        corte = iso_utc(agora - datetime.timedelta(days=MEMORY_RETENTION_MAX_AGE_DAYS))
+        for m in restantes:
+            if _atividade(m) < corte and (m.get("hits") or 0) < MEMORY_RETENTION_MIN_HITS:
+                remover[m["id"]] = "idade"
+        restantes = [m for m in restantes if m["id"] not in remover]
+
+    # 3) Limite por nó: mantém as mais ativas
+    if MEMORY_RETENTION_MAX_PER_NODE > 0 and len(restantes) > MEMORY_RETENTION_MAX_PER_NODE:
+        restantes.sort(key=lambda m: (_atividade(m), m.get("hits") or 0, m["id"]), reverse=True)
+        for m in restantes[MEMORY_RETENTION_MAX_PER_NODE:]:
+            remover[m["id"]] = "limite"
+
+    for did in remover:
+        atualizar.pop(did, None)
+    return {"node_id": node_id, "total": len(memorias), "remover": remover, "atualizar": atualizar}
+
+
+# ===================================================================
+# EXECUÇÃO
+# ===================================================================
+def compactar_memorias(aplicar: bool = False, reconstruir: bool = True) -> Dict[str, Any]:
+    """
+    Planeja (e, com aplicar=True, executa) a compactação de todos os nós.
+    Remoções + herança de uso numa transação; depois rebuild atômico do índice.
+    """
+    planos = [planejar_no(node_id) for node_id in get_node_ids()]
+    remover = {did: motivo for p in planos for did, motivo in p["remover"].items()}
+    atualizar = {did: v for p in planos for did, v in p["atualizar"].items()}
+
+    relatorio: Dict[str, Any] = {
+        "memorias": sum(p["total"] for p in planos),
+        "nos": len(planos),
+        "remover": len(remover),
+        "por_motivo": {},
+        "aplicado": False,
+    }
+    for motivo in remover.values():
+        relatorio["por_motivo"][motivo] = relatorio["por_motivo"].get(motivo, 0) + 1
+
+    if not aplicar or not remover:
+        return relatorio
+
+    with transacao() as conn:
+        for did, (hits, last_used) in atualizar.items():
+            conn.execute("UPDATE decisions SET hits=?, last_used=? WHERE id=?", (hits, last_used, did))
+        delete_decisions(remover, conn)
+
+    for motivo, n in relatorio["por_motivo"].items():
+        MEMORY_COMPACTION.labels(motivo=motivo).inc(n)
+    relatorio["aplicado"] = True
+    logger.info(f"[MEMÓRIA] Compactação: {len(remover)} memórias removidas {relatorio['por_motivo']}")
+
+    if reconstruir:
+        from lats_sistema.memory.memory_store import reconstruir_indice
+        relatorio["indice"] = reconstruir_indice()
+    return relatorio
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Compactação / retenção das memórias HITL")
+    parser.add_argument("--aplicar", action="store_true", help="Executa (sem isso, só relata)")
+    parser.add_argument("--sem-rebuild", action="store_true", help="Não reconstrói o índice vetorial")
+    args = parser.parse_args()
+
+    print(json.dumps(
+        compactar_memorias(aplicar=args.aplicar, reconstruir=not args.sem_rebuild),
+        indent=2, ensure_ascii=False,
+    ))
@@ -0,0 +1,192 @@
+# lats_sistema/models/cached_embeddings.py
+"""
+Cache de embeddings compartilhado entre requisições e processos
+(CachedEmbeddings, injetado em get_embedding_model).
+
+Chave = sha256(modelo + texto); LRU em memória + SQLite opcional.
+
+Variáveis:
+- EMBED_CACHE       → liga / desliga (padrão 1)
+- EMBED_CACHE_MAX   → entradas no LRU (padrão 4096)
+- EMBED_CACHE_PATH  → SQLite do cache ("" desliga; vazio em SERVERLESS_FAST_MODE)
+- EMBED_CACHE_DTYPE → float32 | float16 no disco (padrão float32)
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from lats_sistema.utils.metrics import registrar_cache
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+_SERVERLESS = os.getenv("SERVERLESS_FAST_MODE", "0") == "1"
+
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE", "1") == "1"
+EMBED_CACHE_MAX = int(os.getenv("EMBED_CACHE_MAX", "4096"))
+EMBED_CACHE_PATH = os.getenv(
+    "EMBED_CACHE_PATH",
+    "" if _SERVERLESS else str(BASE_DIR / "data" / "embedding_cache.db"),
+)
+# float16 reduz o disco pela metade (erro ~1e-3 por componente)
+EMBED_CACHE_DTYPE = np.dtype(os.getenv("EMBED_CACHE_DTYPE", "float32"))
+
+
+def chave_embedding(modelo: str, texto: str) -> str:
+    return hashlib.sha256(f"{modelo}\0{texto}".encode("utf-8")).hexdigest()
+
+
+# ===================================================================
+# NÍVEL 2 — SQLITE
+# ===================================================================
+class EmbeddingStore:
+    """Blob store SQLite (uma conexão por thread, WAL)."""
+
+    def __init__(self, path: str, dtype: np.dtype = EMBED_CACHE_DTYPE):
+        self.path = path
+        self.dtype = dtype
+        self._local = threading.local()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    chave TEXT PRIMARY KEY,
+                    dtype TEXT,
+                    vetor BLOB,
+                    criado_em REAL
+                )
+            """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, chaves: List[str]) -> Dict[str, np.ndarray]:
+        if not chaves:
+            return {}
+        marcadores = ",".join("?" * len(chaves))
+        linhas = self._conn().execute(
+            f"SELECT chave, dtype, vetor FROM embeddings WHERE chave IN ({marcadores})", chaves
+        ).fetchall()
+        return {
+            chave: np.frombuffer(blob, dtype=np.dtype(dtype)).astype("float32")
+            for chave, dtype, blob in linhas
+        }
+
+    def put_many(self, itens: Dict[str, np.ndarray]):
+        if not itens:
+            return
+        agora = time.time()
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (chave, dtype, vetor, criado_em) VALUES (?, ?, ?, ?)",
+                [
+                    (chave, self.dtype.name, np.asarray(v, dtype=self.dtype).tobytes(), agora)
+                    for chave, v in itens.items()
+                ],
+            )
+
+
+# ===================================================================
+# WRAPPER
+# ===================================================================
+class CachedEmbeddings(Embeddings):
+    """Embeddings com cache LRU (memória) + SQLite (disco)."""
+
+    def __init__(self, inner: Embeddings, modelo: str, path: Optional[str] = EMBED_CACHE_PATH,
+                 max_entradas: int = EMBED_CACHE_MAX):
+        self.inner = inner
+        self.modelo = modelo
+        self.max_entradas = max_entradas
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._store = None
+        if path:
+            try:
+                self._store = EmbeddingStore(path)
+            except Exception as e:
+                logger.warning(f"[EMBED CACHE] SQLite indisponível ({e}) — só cache em memória")
+
+    # -------------------------------------------------------------
+    # LRU
+    # -------------------------------------------------------------
+    def _lru_get(self, chave: str) -> Optional[np.ndarray]:
+        with self._lock:
+            v = self._lru.get(chave)
+            if v is not None:
+                self._lru.move_to_end(chave)
+            return v
+
+    def _lru_put(self, chave: str, v: np.ndarray):
+        with self._lock:
+            self._lru[chave] = v
+            self._lru.move_to_end(chave)
+            while len(self._lru) > self.max_entradas:
+                self._lru.popitem(last=False)
+
+    # -------------------------------------------------------------
+    # API Embeddings
+    # -------------------------------------------------------------
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        chaves = [chave_embedding(self.modelo, t) for t in texts]
+        vetores: Dict[str, np.ndarray] = {}
+
+        for chave in chaves:
+            v = self._lru_get(chave)
+            if v is not None:
+                vetores[chave] = v
+        registrar_cache("embeddings_memoria", hit=len(vetores) == len(set(chaves)))
+
+        faltando = [c for c in dict.fromkeys(chaves) if c not in vetores]
+        if faltando and self._store is not None:
+            try:
+                do_disco = self._store.get_many(faltando)
+            except Exception as e:
+                logger.warning(f"[EMBED CACHE] Falha na leitura do SQLite: {e}")
+                do_disco = {}
+            registrar_cache("embeddings_disco", hit=len(do_disco) == len(faltando))
+            for chave, v in do_disco.items():
+                vetores[chave] = v
+                self._lru_put(chave, v)
+            faltando = [c for c in faltando if c not in vetores]
+
+        if faltando:
+            # Uma chamada para todas as faltas (textos deduplicados)
+            texto_por_chave = dict(zip(chaves, texts))
+            novos = self.inner.embed_documents([texto_por_chave[c] for c in faltando])
+            calculados = {c: np.asarray(v, dtype="float32") for c, v in zip(faltando, novos)}
+            for chave, v in calculados.items():
+                vetores[chave] = v
+                self._lru_put(chave, v)
+            if self._store is not None:
+                try:
+                    self._store.put_many(calculados)
+                except Exception as e:
+                    logger.warning(f"[EMBED CACHE] Falha na escrita do SQLite: {e}")
+
+        return [vetores[c].tolist() for c in chaves]
+
+    def embed_query(self, text: str) -> List[float]:
+        # OpenAIEmbeddings.embed_query == embed_documents([text])[0] → mesma chave
+        return self.embed_documents([text])[0]
+
+    def __getattr__(self, name):
+        # Atributos do modelo original (model, dimensions, ...)
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
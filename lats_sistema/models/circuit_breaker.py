@@ -0,0 +1,197 @@
+# lats_sistema/models/circuit_breaker.py
+"""
+Circuit breaker para as chamadas LLM.
+
+Problema: quando o endpoint OpenAI degrada, cada requisição ainda queima os
+timeouts completos antes de avaliar_filhos_llm falhar e o engine cair no
+"fallback uniforme".
+
+Estados:
+- FECHADO  → chamadas normais; falhas e chamadas lentas são contabilizadas
+- ABERTO   → chamadas remotas são recusadas imediatamente (CircuitOpenError);
+             o engine usa o caminho de pontuação local (modo degradado)
+- SEMI_ABERTO → após CB_OPEN_SECONDS, UMA chamada de sonda é liberada;
+             sucesso fecha o circuito, falha reabre
+
+Só contam como falha erros do endpoint (5xx, timeout, conexão) e chamadas
+lentas. 429 é do governador (pausa + retry) e 4xx permanentes (contexto,
+auth, request inválido) não dizem nada sobre a saúde do endpoint: passam
+sem registro.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict
+
+from lats_sistema.models.governor import _eh_rate_limit, _eh_transitorio
+from lats_sistema.utils.metrics import CIRCUIT_OPENED, CIRCUIT_STATE
+
+logger = logging.getLogger(__name__)
+
+# ===================================================================
+# CONFIGURAÇÃO
+# ===================================================================
+CB_ENABLED = os.getenv("CB_ENABLED", "1") == "1"
+
+# Abre se houver N falhas consecutivas...
+CB_CONSECUTIVE_FAILURES = int(os.getenv("CB_CONSECUTIVE_FAILURES", "3"))
+# ...ou se a taxa de falhas na janela passar do limite (com mínimo de chamadas)
+CB_WINDOW = int(os.getenv("CB_WINDOW", "20"))
+CB_MIN_CALLS = int(os.getenv("CB_MIN_CALLS", "5"))
+CB_FAILURE_RATE = float(os.getenv("CB_FAILURE_RATE", "0.5"))
+
+# Chamadas mais lentas que isso contam como falha (segundos)
+CB_SLOW_CALL_S = float(os.getenv("CB_SLOW_CALL_S", "20"))
+
+# Tempo em ABERTO antes de liberar a sonda (segundos)
+CB_OPEN_SECONDS = float(os.getenv("CB_OPEN_SECONDS", "30"))
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+SEMI_ABERTO = "semi_aberto"
+
+_VALOR_ESTADO = {FECHADO: 0, SEMI_ABERTO: 1, ABERTO: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """Chamada recusada porque o circuito está aberto."""
+
+
+def falha_do_endpoint(e: Exception) -> bool:
+    """Erro que indica endpoint degradado (conta para abrir o circuito)."""
+    if _eh_rate_limit(e):
+        return False
+    return _eh_transitorio(e) or isinstance(e, (TimeoutError, ConnectionError))
+
+
+class CircuitBreaker:
+    def __init__(self, nome: str):
+        self.nome = nome
+        self._lock = threading.Lock()
+        self._estado = FECHADO
+        self._aberto_em = 0.0
+        self._sonda_em_voo = False
+        self._consecutivas = 0
+        self._janela = deque(maxlen=CB_WINDOW)  # True = falha
+        self.stats = {"aberturas": 0, "rejeitadas": 0, "falhas": 0, "lentas": 0}
+
+    # -------------------------------------------------------------
+    # Estado
+    # -------------------------------------------------------------
+    def estado(self) -> str:
+        with self._lock:
+            if self._estado == ABERTO and time.monotonic() - self._aberto_em >= CB_OPEN_SECONDS:
+                self._estado = SEMI_ABERTO
+                self._sonda_em_voo = False
+                CIRCUIT_STATE.labels(recurso=self.nome).set(_VALOR_ESTADO[SEMI_ABERTO])
+                logger.info(f"[CIRCUIT:{self.nome}] SEMI-ABERTO — liberando sonda")
+            return self._estado
+
+    def aberto(self) -> bool:
+        """True se chamadas remotas devem ser evitadas agora."""
+        if not CB_ENABLED:
+            return False
+        estado = self.estado()
+        if estado == ABERTO:
+            return True
+        with self._lock:
+            return estado == SEMI_ABERTO and self._sonda_em_voo
+
+    def _abrir(self, motivo: str):
+        self._estado = ABERTO
+        self._aberto_em = time.monotonic()
+        self._sonda_em_voo = False
+        self.stats["aberturas"] += 1
+        CIRCUIT_OPENED.labels(recurso=self.nome).inc()
+        CIRCUIT_STATE.labels(recurso=self.nome).set(_VALOR_ESTADO[ABERTO])
+        logger.warning(f"[CIRCUIT:{self.nome}] ABERTO — {motivo}")
+
+    # -------------------------------------------------------------
+    # Registro de resultados
+    # -------------------------------------------------------------
+    def _registrar(self, falha: bool, lenta: bool = False):
+        with self._lock:
+            if self._estado == SEMI_ABERTO:
+                self._sonda_em_voo = False
+                if falha:
+                    self._abrir("sonda falhou")
+                else:
+                    self._estado = FECHADO
+                    self._consecutivas = 0
+                    self._janela.clear()
+                    CIRCUIT_STATE.labels(recurso=self.nome).set(_VALOR_ESTADO[FECHADO])
+                    logger.info(f"[CIRCUIT:{self.nome}] FECHADO — sonda bem-sucedida")
+                return
+
+            self._janela.append(falha)
+            if not falha:
+                self._consecutivas = 0
+                return
+
+            self.stats["lentas" if lenta else "falhas"] += 1
+            self._consecutivas += 1
+            taxa = sum(self._janela) / len(self._janela)
+
+            if self._estado == FECHADO:
+                if self._consecutivas >= CB_CONSECUTIVE_FAILURES:
+                    self._abrir(f"{self._consecutivas} falhas consecutivas")
+                elif len(self._janela) >= CB_MIN_CALLS and taxa >= CB_FAILURE_RATE:
+                    self._abrir(f"taxa de falhas {taxa:.0%} na janela")
+
+    def _liberar_sonda(self):
+        """Sonda terminou sem veredito (429 / 4xx): a próxima chamada vira sonda."""
+        with self._lock:
+            self._sonda_em_voo = False
+
+    def chamar(self, fn: Callable[[], Any]) -> Any:
+        """Executa `fn` sob o circuito (recusa se aberto, registra resultado)."""
+        if not CB_ENABLED:
+            return fn()
+
+        estado = self.estado()
+        with self._lock:
+            if estado == ABERTO or (estado == SEMI_ABERTO and self._sonda_em_voo):
+                self.stats["rejeitadas"] += 1
+                raise CircuitOpenError(f"[CIRCUIT:{self.nome}] circuito aberto")
+            if estado == SEMI_ABERTO:
+                self._sonda_em_voo = True
+
+        inicio = time.monotonic()
+        try:
+            resultado = fn()
+        except Exception as e:
+            if falha_do_endpoint(e):
+                self._registrar(falha=True)
+            else:
+                self._liberar_sonda()
+            raise
+
+        lenta = (time.monotonic() - inicio) > CB_SLOW_CALL_S
+        self._registrar(falha=lenta, lenta=lenta)
+        return resultado
+
+
+# ===================================================================
+# INSTÂNCIAS DO PROCESSO
+# ===================================================================
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(recurso: str = "chat") -> CircuitBreaker:
+    with _breakers_lock:
+        if recurso not in _breakers:
+            _breakers[recurso] = CircuitBreaker(recurso)
+        return _breakers[recurso]
+
+
+def llm_disponivel() -> bool:
+    """Atalho usado pelo engine: False quando o circuito do chat está aberto."""
+    return not get_breaker("chat").aberto()
+
+
+def get_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    return {nome: dict(b.stats, estado=b.estado()) for nome, b in _breakers.items()}
@@ -0,0 +1,397 @@
+# lats_sistema/models/governor.py
+"""
+Governador de concorrência para chamadas à API OpenAI (chat + embeddings).
+
+Problema: com classificações concorrentes (vários workers da API, jobs em lote,
+refinamento offline) estouramos os limites de taxa da OpenAI e a recuperação
+dependia do max_retries de cada cliente → tempestade de retries e cauda longa.
+
+Solução (por processo):
+- Token bucket de requisições/minuto (RPM) e tokens/minuto (TPM) por recurso
+- Fila justa: FIFO dentro de cada classe de prioridade
+- Classes de prioridade: "interativo" passa na frente de "batch"
+- Backoff exponencial com jitter em 429 (respeitando Retry-After) e em
+  erros transitórios; um 429 pausa o recurso para TODOS os chamadores
+"""
+
+import os
+import time
+import heapq
+import random
+import logging
+import threading
+import itertools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from lats_sistema.utils.metrics import LLM_QUEUE_WAIT, LLM_RATE_LIMITED, LLM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# ===================================================================
+# CONFIGURAÇÃO
+# ===================================================================
+LLM_GOVERNOR_ENABLED = os.getenv("LLM_GOVERNOR", "1") == "1"
+
+LLM_RPM = int(os.getenv("LLM_RPM", "500"))
+LLM_TPM = int(os.getenv("LLM_TPM", "200000"))
+EMBED_RPM = int(os.getenv("EMBED_RPM", "3000"))
+EMBED_TPM = int(os.getenv("EMBED_TPM", "1000000"))
+
+# Retries passam a ser feitos aqui (clientes OpenAI ficam com max_retries=0)
+GOVERNOR_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+GOVERNOR_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+GOVERNOR_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+
+# Tempo máximo na fila antes de desistir (segundos)
+GOVERNOR_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "120"))
+
+# Classes de prioridade (menor = mais prioritário)
+PRIORIDADES = {"interativo": 0, "batch": 1}
+PRIORIDADE_PADRAO = os.getenv("LLM_DEFAULT_PRIORITY", "interativo")
+
+_prioridade_atual: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "llm_prioridade", default=PRIORIDADE_PADRAO
+)
+
+
+class GovernorTimeout(RuntimeError):
+    """Chamador esperou mais que GOVERNOR_QUEUE_TIMEOUT na fila."""
+
+
+# ===================================================================
+# PRIORIDADE (contexto)
+# ===================================================================
+@contextmanager
+def prioridade(classe: str):
+    """
+    Define a classe de prioridade das chamadas feitas dentro do bloco.
+
+    Exemplo (jobs em lote):
+        with prioridade("batch"):
+            processar_eventos(eventos)
+    """
+    if classe not in PRIORIDADES:
+        raise ValueError(f"Prioridade inválida: {classe}. Use {list(PRIORIDADES)}")
+    token = _prioridade_atual.set(classe)
+    try:
+        yield
+    finally:
+        _prioridade_atual.reset(token)
+
+
+def prioridade_atual() -> str:
+    return _prioridade_atual.get()
+
+
+# ===================================================================
+# TOKEN BUCKET
+# ===================================================================
+class TokenBucket:
+    """Bucket com capacidade = limite por minuto e reposição contínua."""
+
+    def __init__(self, por_minuto: int):
+        self.capacidade = float(max(por_minuto, 1))
+        self.taxa = self.capacidade / 60.0  # unidades por segundo
+        self.disponivel = self.capacidade
+        self.ultimo = time.monotonic()
+
+    def _repor(self, agora: float):
+        self.disponivel = min(
+            self.capacidade, self.disponivel + (agora - self.ultimo) * self.taxa
+        )
+        self.ultimo = agora
+
+    def espera_para(self, n: float, agora: float) -> float:
+        """Segundos até haver `n` unidades (0 se já há)."""
+        self._repor(agora)
+        n = min(n, self.capacidade)
+        if self.disponivel >= n:
+            return 0.0
+        return (n - self.disponivel) / self.taxa
+
+    def consumir(self, n: float):
+        self.disponivel -= min(n, self.capacidade)
+
+    def ajustar(self, delta: float):
+        """Corrige estimativa após a resposta (delta > 0 consome mais)."""
+        self.disponivel -= delta
+
+    def esvaziar(self):
+        self.disponivel = min(self.disponivel, 0.0)
+
+
+# ===================================================================
+# GOVERNADOR
+# ===================================================================
+class LLMGovernor:
+    """Fila com prioridade + buckets RPM/TPM para um recurso da API."""
+
+    def __init__(self, nome: str, rpm: int, tpm: int):
+        self.nome = nome
+        self.rpm = TokenBucket(rpm)
+        self.tpm = TokenBucket(tpm)
+        self._cond = threading.Condition()
+        self._fila: List = []
+        self._seq = itertools.count()
+        self._pausa_ate = 0.0
+        self.stats = {
+            "chamadas": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "espera_total_s": 0.0,
+            "fila_max": 0,
+        }
+
+    # -------------------------------------------------------------
+    # Admissão
+    # -------------------------------------------------------------
+    def adquirir(self, tokens: int, classe: Optional[str] = None) -> float:
+        """Bloqueia até haver orçamento. Retorna o tempo de espera (s)."""
+        classe = classe or prioridade_atual()
+        entrada = (PRIORIDADES.get(classe, 0), next(self._seq))
+        inicio = time.monotonic()
+        limite = inicio + GOVERNOR_QUEUE_TIMEOUT
+
+        with self._cond:
+            heapq.heappush(self._fila, entrada)
+            self.stats["fila_max"] = max(self.stats["fila_max"], len(self._fila))
+            try:
+                while True:
+                    agora = time.monotonic()
+                    if self._fila[0] == entrada:
+                        espera = max(
+                            self._pausa_ate - agora,
+                            self.rpm.espera_para(1, agora),
+                            self.tpm.espera_para(tokens, agora),
+                        )
+                        if espera <= 0:
+                            self.rpm.consumir(1)
+                            self.tpm.consumir(tokens)
+                            break
+                    else:
+                        espera = 0.25  # aguardando a vez na fila
+
+                    if agora + espera > limite:
+                        raise GovernorTimeout(
+                            f"[GOVERNOR:{self.nome}] Tempo máximo na fila excedido "
+                            f"({GOVERNOR_QUEUE_TIMEOUT:.0f}s)"
+                        )
+                    self._cond.wait(timeout=espera)
+            finally:
+                self._fila.remove(entrada)
+                heapq.heapify(self._fila)
+                self._cond.notify_all()
+
+        esperado = time.monotonic() - inicio
+        with self._cond:
+            self.stats["chamadas"] += 1
+            self.stats["espera_total_s"] += esperado
+        LLM_QUEUE_WAIT.labels(recurso=self.nome).observe(esperado)
+        return esperado
+
+    def em_espera(self) -> int:
+        """Número de chamadores aguardando na fila."""
+        return len(self._fila)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Cópia consistente dos contadores (+ tamanho atual da fila)."""
+        with self._cond:
+            return dict(self.stats, fila=len(self._fila))
+
+    def ajustar_tokens(self, estimado: int, real: Optional[int]):
+        if real is None:
+            return
+        with self._cond:
+            self.tpm.ajustar(real - estimado)
+
+    def pausar(self, segundos: float):
+        """429 recebido: pausa o recurso para todos e zera os buckets."""
+        with self._cond:
+            self._pausa_ate = max(self._pausa_ate, time.monotonic() + segundos)
+            self.rpm.esvaziar()
+            self.tpm.esvaziar()
+            self.stats["rate_limited"] += 1
+        LLM_RATE_LIMITED.labels(recurso=self.nome).inc()
+
+    # -------------------------------------------------------------
+    # Execução com backoff
+    # -------------------------------------------------------------
+    def executar(
+        self,
+        fn: Callable[[], Any],
+        tokens: int,
+        classe: Optional[str] = None,
+        uso_real: Optional[Callable[[Any], Optional[int]]] = None,
+        call_site: str = "geral",
+    ) -> Any:
+        """
+        Executa `fn` respeitando o orçamento, com retries em 429/transitórios.
+
+        Args:
+            fn: Chamada à API (sem argumentos)
+            tokens: Tokens estimados (prompt + saída máxima)
+            classe: Classe de prioridade (default: contexto atual)
+            uso_real: Extrai tokens reais da resposta para corrigir o bucket
+            call_site: Identificação do chamador (métricas de retry)
+        """
+        for tentativa in range(GOVERNOR_MAX_RETRIES + 1):
+            self.adquirir(tokens, classe)
+            try:
+                resultado = fn()
+            except Exception as e:
+                if tentativa >= GOVERNOR_MAX_RETRIES or not _eh_transitorio(e):
+                    raise
+
+                espera = _backoff(tentativa)
+                if _eh_rate_limit(e):
+                    espera = max(espera, _retry_after(e) or 0.0)
+                    self.pausar(espera)
+                    logger.warning(
+                        f"[GOVERNOR:{self.nome}] 429 recebido — pausando {espera:.2f}s "
+                        f"(tentativa {tentativa + 1}/{GOVERNOR_MAX_RETRIES})"
+                    )
+                else:
+                    logger.warning(
+                        f"[GOVERNOR:{self.nome}] Erro transitório ({type(e).__name__}) — "
+                        f"retry em {espera:.2f}s"
+                    )
+
+                with self._cond:
+                    self.stats["retries"] += 1
+                LLM_RETRIES.labels(
+                    call_site=call_site,
+                    motivo="rate_limit" if _eh_rate_limit(e) else "transitorio",
+                ).inc()
+                time.sleep(espera)
+                continue
+
+            if uso_real is not None:
+                try:
+                    self.ajustar_tokens(tokens, uso_real(resultado))
+                except Exception:
+                    pass
+            return resultado
+
+
+# ===================================================================
+# CLASSIFICAÇÃO DE ERROS
+# ===================================================================
+def _status(e: Exception) -> Optional[int]:
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(getattr(e, "response", None), "status_code", None)
+    return status
+
+
+def _eh_rate_limit(e: Exception) -> bool:
+    return _status(e) == 429 or type(e).__name__ == "RateLimitError"
+
+
+def _eh_transitorio(e: Exception) -> bool:
+    if _eh_rate_limit(e):
+        return True
+    if type(e).__name__ in ("APITimeoutError", "APIConnectionError", "InternalServerError"):
+        return True
+    status = _status(e)
+    return status is not None and status >= 500
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    valor = headers.get("retry-after") if hasattr(headers, "get") else None
+    try:
+        return float(valor) if valor is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(tentativa: int) -> float:
+    """Backoff exponencial com full jitter: uniforme em [0, teto]."""
+    teto = min(GOVERNOR_BACKOFF_MAX, GOVERNOR_BACKOFF_BASE * (2 ** tentativa))
+    return random.uniform(0, teto)
+
+
+# ===================================================================
+# ESTIMATIVA DE TOKENS
+# ===================================================================
+def estimar_tokens(entrada: Any) -> int:
+    """Estimativa barata (~4 chars/token) para str, mensagens ou listas."""
+    if isinstance(entrada, str):
+        return len(entrada) // 4 + 1
+    if isinstance(entrada, (list, tuple)):
+        return sum(estimar_tokens(x) for x in entrada)
+    conteudo = getattr(entrada, "content", None)
+    if conteudo is not None:
+        return estimar_tokens(conteudo)
+    return len(str(entrada)) // 4 + 1
+
+
+# ===================================================================
+# INSTÂNCIAS DO PROCESSO
+# ===================================================================
+_governors: Dict[str, LLMGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(recurso: str = "chat") -> LLMGovernor:
+    """Retorna o governador do processo para 'chat' ou 'embeddings'."""
+    with _governors_lock:
+        gov = _governors.get(recurso)
+        if gov is None:
+            if recurso == "embeddings":
+                gov = LLMGovernor(recurso, EMBED_RPM, EMBED_TPM)
+            else:
+                gov = LLMGovernor(recurso, LLM_RPM, LLM_TPM)
+            _governors[recurso] = gov
+        return gov
+
+
+def get_governor_stats() -> Dict[str, Dict[str, Any]]:
+    """Estatísticas de todos os governadores (para métricas)."""
+    with _governors_lock:
+        governors = dict(_governors)
+    return {nome: gov.estatisticas() for nome, gov in governors.items()}
+
+
+# ===================================================================
+# EMBEDDINGS GOVERNADOS
+# ===================================================================
+from langchain_core.embeddings import Embeddings
+
+
+class GovernedEmbeddings(Embeddings):
+    """
+    Wrapper de Embeddings que passa cada chamada pelo governador (quando
+    LLM_GOVERNOR=1) e registra métricas de chamadas/latência.
+    Compatível com FAISS.load_local e com todos os call sites existentes.
+    """
+
+    def __init__(self, inner: Embeddings):
+        self.inner = inner
+
+    def _executar(self, tipo: str, fn: Callable[[], Any], textos: List[str]) -> Any:
+        from lats_sistema.utils.metrics import (
+            EMBEDDING_CALLS, EMBEDDING_TEXTS, EMBEDDING_LATENCY, cronometrar,
+        )
+        EMBEDDING_CALLS.labels(tipo=tipo).inc()
+        EMBEDDING_TEXTS.labels(tipo=tipo).inc(len(textos))
+        with cronometrar(EMBEDDING_LATENCY, tipo=tipo):
+            if not LLM_GOVERNOR_ENABLED:
+                return fn()
+            return get_governor("embeddings").executar(
+                fn, estimar_tokens(textos), call_site=f"embeddings_{tipo}"
+            )
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._executar("query", lambda: self.inner.embed_query(text), [text])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._executar("documents", lambda: self.inner.embed_documents(texts), texts)
+
+    def __getattr__(self, name):
+        # Atributos do modelo original (model, dimensions, ...)
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
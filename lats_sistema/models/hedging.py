@@ -0,0 +1,192 @@
+# lats_sistema/models/hedging.py
+"""
+Hedged requests para cortar a cauda de latência das chamadas LLM.
+
+Problema: cada classificação faz várias chamadas LLM em série; com
+LLM_TIMEOUT=30 e retries, UMA chamada lenta segura a classificação inteira
+por 30-90s (p99 dominado pela cauda da chamada mais lenta).
+
+Solução (opt-in, LLM_HEDGING=1):
+- Mantém uma janela de latências por call site (evaluator, rerank, ...)
+- Se a chamada passar do percentil configurado (ex.: p95), dispara uma
+  duplicata e usa a que responder primeiro
+- Hedges limitados a uma fração do tráfego (LLM_HEDGE_MAX_FRACTION)
+- Não dispara hedge se o governador já tem fila (saturação)
+
+As chamadas LLM do sistema são idempotentes (temperature=0, somente leitura),
+então a resposta perdedora é simplesmente descartada.
+"""
+
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Optional
+
+from lats_sistema.utils.metrics import LLM_HEDGES, LLM_HEDGE_WINS
+
+logger = logging.getLogger(__name__)
+
+# ===================================================================
+# CONFIGURAÇÃO
+# ===================================================================
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MAX_FRACTION = float(os.getenv("LLM_HEDGE_MAX_FRACTION", "0.10"))
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0"))  # segundos
+HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+HEDGE_WORKERS = int(os.getenv("LLM_HEDGE_WORKERS", "16"))
+
+
+# ===================================================================
+# JANELA DE LATÊNCIAS POR CALL SITE
+# ===================================================================
+class LatencyWindow:
+    """Janela deslizante de latências para cálculo de percentil."""
+
+    def __init__(self, tamanho: int = HEDGE_WINDOW):
+        self.amostras = deque(maxlen=tamanho)
+        self.lock = threading.Lock()
+
+    def registrar(self, segundos: float):
+        with self.lock:
+            self.amostras.append(segundos)
+
+    def percentil(self, p: float) -> Optional[float]:
+        with self.lock:
+            if len(self.amostras) < HEDGE_MIN_SAMPLES:
+                return None
+            ordenadas = sorted(self.amostras)
+        idx = min(len(ordenadas) - 1, int(round(p / 100.0 * (len(ordenadas) - 1))))
+        return ordenadas[idx]
+
+
+_janelas: Dict[str, LatencyWindow] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _janela(call_site: str) -> LatencyWindow:
+    with _lock:
+        if call_site not in _janelas:
+            _janelas[call_site] = LatencyWindow()
+            _stats[call_site] = {"chamadas": 0, "hedges": 0, "vitorias_hedge": 0}
+        return _janelas[call_site]
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=HEDGE_WORKERS, thread_name_prefix="llm-hedge"
+            )
+        return _executor
+
+
+def _contar(call_site: str, campo: str):
+    with _lock:
+        _stats[call_site][campo] += 1
+
+
+def _reservar_hedge(call_site: str) -> bool:
+    """Checa a cota de hedges e já conta o novo (atômico entre threads)."""
+    with _lock:
+        st = _stats[call_site]
+        if st["hedges"] >= HEDGE_MAX_FRACTION * max(st["chamadas"], 1):
+            return False
+        st["hedges"] += 1
+        return True
+
+
+def _submeter(fn: Callable[[], Any]):
+    # Copia o contexto (prioridade do governador) para a thread do pool
+    ctx = contextvars.copy_context()
+    return _get_executor().submit(ctx.run, fn)
+
+
+# ===================================================================
+# EXECUÇÃO COM HEDGE
+# ===================================================================
+def executar_com_hedge(
+    fn: Callable[[], Any],
+    call_site: str,
+    saturado: Optional[Callable[[], bool]] = None,
+) -> Any:
+    """
+    Executa `fn` e, se passar do limiar de latência, dispara uma duplicata.
+
+    Args:
+        fn: Chamada idempotente (sem argumentos)
+        call_site: Identificação do chamador (janela de latência própria)
+        saturado: Se retornar True, não dispara hedge (ex.: fila no governador)
+
+    Returns:
+        Resultado da primeira chamada bem-sucedida
+    """
+    if not LLM_HEDGING_ENABLED:
+        return fn()
+
+    janela = _janela(call_site)
+    _contar(call_site, "chamadas")
+
+    limiar = janela.percentil(HEDGE_PERCENTILE)
+    inicio = time.monotonic()
+
+    # Sem histórico suficiente → chamada simples (mas alimenta a janela)
+    if limiar is None:
+        resultado = fn()
+        janela.registrar(time.monotonic() - inicio)
+        return resultado
+
+    limiar = max(limiar, HEDGE_MIN_DELAY)
+    primaria = _submeter(fn)
+    feitos, _ = wait([primaria], timeout=limiar)
+
+    if feitos or (saturado is not None and saturado()) or not _reservar_hedge(call_site):
+        resultado = primaria.result()
+        janela.registrar(time.monotonic() - inicio)
+        return resultado
+
+    # -------------------------------------------------------------
+    # HEDGE: duplicata após o limiar
+    # -------------------------------------------------------------
+    LLM_HEDGES.labels(call_site=call_site).inc()
+    logger.info(f"[HEDGE] {call_site}: chamada passou de {limiar:.2f}s — disparando duplicata")
+    hedge = _submeter(fn)
+
+    pendentes = {primaria, hedge}
+    erro = None
+    while pendentes:
+        feitos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+        for f in feitos:
+            if f.exception() is None:
+                if f is hedge:
+                    _contar(call_site, "vitorias_hedge")
+                    LLM_HEDGE_WINS.labels(call_site=call_site).inc()
+                janela.registrar(time.monotonic() - inicio)
+                return f.result()
+            erro = f.exception()
+
+    # Ambas falharam
+    raise erro
+
+
+def get_hedge_stats() -> Dict[str, Dict[str, Any]]:
+    """Taxa de hedge e vitórias por call site (para métricas)."""
+    with _lock:
+        copia = {call_site: dict(st) for call_site, st in _stats.items()}
+    out = {}
+    for call_site, st in copia.items():
+        chamadas = max(st["chamadas"], 1)
+        out[call_site] = dict(
+            st,
+            taxa_hedge=st["hedges"] / chamadas,
+            limiar_s=_janelas[call_site].percentil(HEDGE_PERCENTILE),
+        )
+    return out
@@ -5,7 +5,22 @@ Usa factory pattern com OpenAI exclusivo.
 Lazy loading para compatibilidade com serverless (Vercel).
 """
 
+import time
+from typing import Any, Optional
+
 from lats_sistema.models.llm_factory import get_chat_model
+from lats_sistema.models.governor import (
+    LLM_GOVERNOR_ENABLED,
+    get_governor,
+    estimar_tokens,
+)
+from lats_sistema.models.hedging import executar_com_hedge
+from lats_sistema.models.circuit_breaker import get_breaker, CircuitOpenError
+from lats_sistema.utils.metrics import (
+    LLM_CALL_LATENCY,
+    LLM_TOKENS,
+    atualizar_gauges_pool,
+)
 
 # Lazy loading: modelos são criados via factory sob demanda
 # O factory já implementa cache interno, então múltiplas chamadas
@@ -34,3 +49,83 @@ def __getattr__(name):
             _cache["llm_json"] = get_llm_json()
         return _cache["llm_json"]
     raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+# ================================================================
+# CAMADA DE INVOCAÇÃO (circuit breaker + governador de taxa + hedging)
+# ================================================================
+def _tokens_saida(llm) -> int:
+    """Orçamento de saída considerado pela OpenAI no TPM (max_tokens)."""
+    from lats_sistema.config.fast_mode import LLM_MAX_TOKENS
+    return getattr(llm, "max_tokens", None) or LLM_MAX_TOKENS
+
+
+def _uso_real(response) -> Optional[int]:
+    uso = getattr(response, "usage_metadata", None) or {}
+    return uso.get("total_tokens")
+
+
+def invoke_llm(llm, entrada: Any, call_site: str = "geral", prioridade: Optional[str] = None):
+    """
+    Ponto único de chamada aos chat models.
+
+    Passa pelo governador do processo (RPM/TPM, fila com prioridade e
+    backoff em 429) quando LLM_GOVERNOR=1, e dispara uma chamada duplicata
+    quando a latência passa do percentil do call site (LLM_HEDGING=1).
+
+    Se o circuit breaker do chat estiver aberto, falha imediatamente com
+    CircuitOpenError (sem fila e sem timeout).
+
+    Args:
+        llm: Chat model (llm_text / llm_json)
+        entrada: Prompt (str) ou lista de mensagens
+        call_site: Identificação do chamador (evaluator, rerank, hyde, ...)
+        prioridade: "interativo" | "batch" (default: contexto atual)
+
+    Returns:
+        Resposta do modelo (AIMessage)
+    """
+    inicio = time.perf_counter()
+    try:
+        response = _invoke_llm(llm, entrada, call_site, prioridade)
+    except Exception:
+        LLM_CALL_LATENCY.labels(call_site=call_site, resultado="erro").observe(
+            time.perf_counter() - inicio
+        )
+        raise
+
+    LLM_CALL_LATENCY.labels(call_site=call_site, resultado="ok").observe(
+        time.perf_counter() - inicio
+    )
+    uso = getattr(response, "usage_metadata", None) or {}
+    LLM_TOKENS.labels(call_site=call_site, tipo="input").inc(uso.get("input_tokens", 0))
+    LLM_TOKENS.labels(call_site=call_site, tipo="output").inc(uso.get("output_tokens", 0))
+    atualizar_gauges_pool()
+    return response
+
+
+def _invoke_llm(llm, entrada: Any, call_site: str, prioridade: Optional[str]):
+    breaker = get_breaker("chat")
+    if breaker.aberto():
+        raise CircuitOpenError(f"[CIRCUIT:chat] chamada '{call_site}' recusada (circuito aberto)")
+
+    def remota():
+        return breaker.chamar(lambda: llm.invoke(entrada))
+
+    if not LLM_GOVERNOR_ENABLED:
+        return executar_com_hedge(remota, call_site)
+
+    gov = get_governor("chat")
+    tokens = estimar_tokens(entrada) + _tokens_saida(llm)
+
+    def chamada():
+        return gov.executar(
+            remota,
+            tokens,
+            classe=prioridade,
+            uso_real=_uso_real,
+            call_site=call_site,
+        )
+
+    # Cada duplicata também passa pelo governador; sem hedge se houver fila
+    return executar_com_hedge(chamada, call_site, saturado=lambda: gov.em_espera() > 0)
@@ -55,6 +55,21 @@ if not OPENAI_API_KEY:
 # ================================================================
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
+# Pool HTTP compartilhado (um cliente sync + um async por processo)
+from lats_sistema.config.http_pool import (
+    get_shared_http_client,
+    get_shared_async_http_client,
+)
+
+# Governador de taxa: quando ativo, os retries (429/transitórios) são feitos
+# por ele com backoff + jitter, e não pelo cliente OpenAI
+from lats_sistema.models.governor import LLM_GOVERNOR_ENABLED, GovernedEmbeddings
+
+# Cache de embeddings entre requisições (LRU em memória + SQLite)
+from lats_sistema.models.cached_embeddings import EMBED_CACHE_ENABLED, CachedEmbeddings
+
+CLIENT_MAX_RETRIES = 0 if LLM_GOVERNOR_ENABLED else LLM_MAX_RETRIES
+
 # ================================================================
 # CACHE (Singleton)
 # ================================================================
@@ -89,7 +104,9 @@ def get_chat_model(force_json: bool = False):
         "model": OPENAI_CHAT_MODEL,
         "temperature": 0,
         "timeout": LLM_TIMEOUT,
-        "max_retries": LLM_MAX_RETRIES,
+        "max_retries": CLIENT_MAX_RETRIES,
+        "http_client": get_shared_http_client(),
+        "http_async_client": get_shared_async_http_client(),
     }
 
     # FAST_MODE: limitar tokens
@@ -129,10 +146,22 @@ def get_embedding_model():
     model = OpenAIEmbeddings(
         model=OPENAI_EMBED_MODEL,
         timeout=LLM_TIMEOUT,
-        max_retries=LLM_MAX_RETRIES,
+        max_retries=CLIENT_MAX_RETRIES,
+        http_client=get_shared_http_client(),
+        http_async_client=get_shared_async_http_client(),
     )
 
-    logging.info(f"✓ OpenAIEmbeddings criado | model={OPENAI_EMBED_MODEL}")
+    # Wrapper sempre presente (métricas); governador só se LLM_GOVERNOR=1
+    model = GovernedEmbeddings(model)
+
+    # Cache compartilhado (memória + SQLite): só as faltas chegam à API
+    if EMBED_CACHE_ENABLED:
+        model = CachedEmbeddings(model, OPENAI_EMBED_MODEL)
+
+    logging.info(
+        f"✓ OpenAIEmbeddings criado | model={OPENAI_EMBED_MODEL} | "
+        f"governor={LLM_GOVERNOR_ENABLED} | cache={EMBED_CACHE_ENABLED}"
+    )
 
     _embed_model_cache[cache_key] = model
     return model
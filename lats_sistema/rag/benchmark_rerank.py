@@ -0,0 +1,166 @@
+# lats_sistema/rag/benchmark_rerank.py
+"""
+Benchmark: rerank local (RRF) × rerank LLM.
+
+Para cada evento, recupera os candidatos (BM25 + semântico, como no_rag)
+e mede:
+- latência de cada estratégia (p50 / p95)
+- qualidade:
+    • com rótulos ("relevantes": [chunk_id, ...] no JSONL) → Recall@N e MRR
+      de cada estratégia
+    • sem rótulos → concordância do RRF com o ranking LLM (overlap@N e
+      posição do top-1 do LLM no ranking local)
+
+Uso:
+    python -m lats_sistema.rag.benchmark_rerank                 # dados_historicos.jsonl
+    python -m lats_sistema.rag.benchmark_rerank --eventos arq.jsonl --n 30
+    python -m lats_sistema.rag.benchmark_rerank --sem-llm       # só latência local
+"""
+
+import json
+import time
+import argparse
+from pathlib import Path
+from statistics import median
+from typing import Dict, List, Optional
+
+from lats_sistema.config.fast_mode import (
+    RAG_BM25_K,
+    RAG_SEMANTIC_K,
+    RAG_RERANK_TOP_N,
+    RAG_RRF_K,
+    RAG_LEXICAL_WEIGHT,
+)
+from lats_sistema.rag.bm25_search import buscar_bm25_ids
+from lats_sistema.rag.semantic_search import buscar_semantico_ids
+from lats_sistema.rag.fusion import rrf_fusao, sobreposicao_lexical
+from lats_sistema.vectorstore.chunk_store import get_chunk_store
+
+EVENTOS_PADRAO = Path(__file__).resolve().parents[1] / "evolution" / "data" / "dados_historicos.jsonl"
+
+
+def _p95(valores: List[float]) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(0.95 * (len(ordenados) - 1))))]
+
+
+def _candidatos(evento: str) -> Dict[str, list]:
+    store = get_chunk_store()
+    bm25_ids = [cid for cid, _ in buscar_bm25_ids(evento, n=RAG_BM25_K)]
+    return {
+        "bm25": list(zip(bm25_ids, store.textos(bm25_ids))),
+        "semantico": buscar_semantico_ids(evento, k=RAG_SEMANTIC_K),
+    }
+
+
+def _ids_do_ranking_llm(ranking_llm: List[Dict], candidatos: Dict[str, str]) -> List[str]:
+    """Mapeia os trechos devolvidos pelo LLM de volta para chunk_ids."""
+    ids = []
+    for item in ranking_llm:
+        trecho = (item.get("trecho") or "").strip()
+        if not trecho:
+            continue
+        # O LLM pode truncar/parafrasear o trecho → casa pelo mais parecido
+        cid = max(candidatos, key=lambda c: sobreposicao_lexical(trecho, candidatos[c]))
+        if cid not in ids:
+            ids.append(cid)
+    return ids
+
+
+def _recall_mrr(ids: List[str], relevantes: set, n: int):
+    recall = len(set(ids[:n]) & relevantes) / max(len(relevantes), 1)
+    mrr = next((1.0 / i for i, cid in enumerate(ids, start=1) if cid in relevantes), 0.0)
+    return recall, mrr
+
+
+def executar_benchmark(eventos: List[Dict], usar_llm: bool = True, top_n: int = RAG_RERANK_TOP_N) -> Dict:
+    lat_local, lat_llm = [], []
+    qualidade = {"local": {"recall": [], "mrr": []}, "llm": {"recall": [], "mrr": []}}
+    concordancia = {"overlap": [], "pos_top1_llm": []}
+
+    if usar_llm:
+        from lats_sistema.rag.reranker import rerank
+
+    for ev in eventos:
+        evento = ev["descricao_evento"]
+        rankings = _candidatos(evento)
+        candidatos = {cid: t for lista in rankings.values() for cid, t in lista}
+        if not candidatos:
+            continue
+
+        inicio = time.perf_counter()
+        local = rrf_fusao(evento, rankings, k=RAG_RRF_K, peso_lexical=RAG_LEXICAL_WEIGHT)
+        lat_local.append(time.perf_counter() - inicio)
+        ids_local = [x["chunk_id"] for x in local]
+
+        ids_llm: Optional[List[str]] = None
+        if usar_llm:
+            inicio = time.perf_counter()
+            ranking_llm = rerank(evento, list(candidatos.values()), force_llm=True)
+            lat_llm.append(time.perf_counter() - inicio)
+            ids_llm = _ids_do_ranking_llm(ranking_llm, candidatos)
+
+        relevantes = set(ev.get("relevantes") or [])
+        if relevantes:
+            for nome, ids in (("local", ids_local), ("llm", ids_llm)):
+                if ids is None:
+                    continue
+                r, m = _recall_mrr(ids, relevantes, top_n)
+                qualidade[nome]["recall"].append(r)
+                qualidade[nome]["mrr"].append(m)
+        elif ids_llm:
+            concordancia["overlap"].append(len(set(ids_local[:top_n]) & set(ids_llm[:top_n])) / top_n)
+            if ids_llm[0] in ids_local:
+                concordancia["pos_top1_llm"].append(ids_local.index(ids_llm[0]) + 1)
+
+    def _media(v):
+        return sum(v) / len(v) if v else None
+
+    resumo = {
+        "eventos": len(lat_local),
+        "top_n": top_n,
+        "latencia_local_ms": {
+            "p50": median(lat_local) * 1000 if lat_local else None,
+            "p95": _p95(lat_local) * 1000 if lat_local else None,
+        },
+    }
+    if lat_llm:
+        resumo["latencia_llm_ms"] = {"p50": median(lat_llm) * 1000, "p95": _p95(lat_llm) * 1000}
+    if any(qualidade["local"].values()):
+        resumo["qualidade"] = {
+            nome: {f"recall@{top_n}": _media(q["recall"]), "mrr": _media(q["mrr"])}
+            for nome, q in qualidade.items() if q["recall"]
+        }
+    if concordancia["overlap"]:
+        resumo["concordancia_com_llm"] = {
+            f"overlap@{top_n}": _media(concordancia["overlap"]),
+            "posicao_media_top1_llm": _media(concordancia["pos_top1_llm"]),
+        }
+    return resumo
+
+
+def carregar_eventos(path: Path, n: int) -> List[Dict]:
+    eventos = []
+    with open(path, "r", encoding="utf-8") as f:
+        for linha in f:
+            try:
+                eventos.append(json.loads(linha))
+            except Exception:
+                continue
+            if len(eventos) >= n:
+                break
+    return eventos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark rerank RRF local × LLM")
+    parser.add_argument("--eventos", type=Path, default=EVENTOS_PADRAO)
+    parser.add_argument("--n", type=int, default=20, help="Número de eventos")
+    parser.add_argument("--top-n", type=int, default=RAG_RERANK_TOP_N)
+    parser.add_argument("--sem-llm", action="store_true", help="Não chama o rerank LLM")
+    args = parser.parse_args()
+
+    resultado = executar_benchmark(
+        carregar_eventos(args.eventos, args.n), usar_llm=not args.sem_llm, top_n=args.top_n
+    )
+    print(json.dumps(resultado, ensure_ascii=False, indent=2))
@@ -0,0 +1,312 @@
+# lats_sistema/rag/bm25_index.py
+"""
+Índice BM25 pré-construído do corpus normativo: matriz termo-documento
+esparsa (CSC em numpy) com os pesos BM25 já calculados, persistida em
+data/bm25/ e carregada com mmap. Documentos = chunks do chunk store
+(mesmos chunk_ids do índice FAISS); o build é incremental por chunk_id.
+
+    python -m lats_sistema.rag.bm25_index
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+CORPUS_DIR = BASE_DIR / "padroes_petrobras"
+INDEX_DIR = BASE_DIR / "data" / "bm25"
+
+# Parâmetros BM25 (mesmos defaults do rank_bm25.BM25Okapi)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+INDEX_VERSION = 2
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenizar(texto: str) -> List[str]:
+    return _TOKEN_RE.findall(texto.lower())
+
+
+# ===================================================================
+# ÍNDICE
+# ===================================================================
+class BM25Index:
+    """Índice BM25 esparso com pesos pré-calculados por posting."""
+
+    def __init__(self, vocab: Dict[str, int], indptr, indices, pesos, docs: List[Dict]):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.indices = indices
+        self.pesos = pesos
+        self.docs = docs
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.docs)
+
+    def ids(self, posicoes) -> List[str]:
+        """chunk_ids dos documentos nas posições dadas."""
+        return [self.docs[int(i)]["id"] for i in posicoes]
+
+    # -------------------------------------------------------------
+    # Construção
+    # -------------------------------------------------------------
+    @classmethod
+    def from_term_counts(cls, contagens: List[Dict[str, int]], docs: List[Dict]) -> "BM25Index":
+        """Monta a matriz a partir das contagens de termos por documento."""
+        vocab: Dict[str, int] = {}
+        termos, doc_ids, tfs = [], [], []
+        doc_len = np.zeros(len(contagens), dtype=np.float32)
+
+        for d, cont in enumerate(contagens):
+            doc_len[d] = sum(cont.values())
+            for termo, tf in cont.items():
+                termos.append(vocab.setdefault(termo, len(vocab)))
+                doc_ids.append(d)
+                tfs.append(tf)
+
+        termos = np.asarray(termos, dtype=np.int64)
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        tfs = np.asarray(tfs, dtype=np.float32)
+
+        # Ordena postings por termo (CSC)
+        ordem = np.lexsort((doc_ids, termos))
+        termos, doc_ids, tfs = termos[ordem], doc_ids[ordem], tfs[ordem]
+        df = np.bincount(termos, minlength=len(vocab))
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+
+        # Pesos BM25 por posting (idf sempre positivo, variante Lucene)
+        n = max(len(contagens), 1)
+        avgdl = float(doc_len.mean()) if len(doc_len) else 1.0
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[doc_ids] / (avgdl or 1.0))
+        pesos = idf[termos] * tfs * (BM25_K1 + 1) / (tfs + norm)
+
+        return cls(vocab, indptr, doc_ids, pesos.astype(np.float32), docs)
+
+    @classmethod
+    def from_textos(cls, textos: List[str]) -> "BM25Index":
+        """Índice em memória para um corpus ad-hoc (não persistido)."""
+        from lats_sistema.vectorstore.chunk_store import chunk_id
+
+        contagens = [dict(Counter(tokenizar(t))) for t in textos]
+        docs = [{"id": chunk_id(t), "texto": t} for t in textos]
+        return cls.from_term_counts(contagens, docs)
+
+    # -------------------------------------------------------------
+    # Consulta
+    # -------------------------------------------------------------
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for termo, qtf in Counter(tokenizar(query)).items():
+            col = self.vocab.get(termo)
+            if col is None:
+                continue
+            ini, fim = self.indptr[col], self.indptr[col + 1]
+            # doc ids são únicos dentro de uma coluna → soma direta
+            scores[self.indices[ini:fim]] += qtf * self.pesos[ini:fim]
+        return scores
+
+    def top_k(self, query: str, n: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Retorna (posições dos docs, scores) ordenados por relevância."""
+        if self.n_docs == 0 or n <= 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        scores = self.scores(query)
+        n = min(n, self.n_docs)
+        if n < self.n_docs:
+            idx = np.argpartition(-scores, n - 1)[:n]
+        else:
+            idx = np.arange(self.n_docs)
+        idx = idx[np.argsort(-scores[idx], kind="stable")]
+        return idx, scores[idx]
+
+    # -------------------------------------------------------------
+    # Persistência
+    # -------------------------------------------------------------
+    def salvar(self, index_dir: Path, manifest: Dict):
+        index_dir.mkdir(parents=True, exist_ok=True)
+
+        def _gravar(nome, escrever):
+            tmp = index_dir / f".{nome}.tmp"
+            escrever(tmp)
+            os.replace(tmp, index_dir / nome)
+
+        def _npy(arr):
+            def escrever(tmp):
+                with open(tmp, "wb") as f:
+                    np.save(f, arr)
+            return escrever
+
+        def _json(obj):
+            def escrever(tmp):
+                tmp.write_text(json.dumps(obj, ensure_ascii=False), encoding="utf-8")
+            return escrever
+
+        _gravar("indptr.npy", _npy(self.indptr))
+        _gravar("indices.npy", _npy(self.indices))
+        _gravar("pesos.npy", _npy(self.pesos))
+        _gravar("vocab.json", _json(list(self.vocab)))
+        _gravar("docs.json", _json(self.docs))
+        # Manifest por último: só é válido quando todo o resto já foi gravado
+        _gravar("manifest.json", _json(manifest))
+
+    @classmethod
+    def carregar(cls, index_dir: Path) -> "BM25Index":
+        vocab = json.loads((index_dir / "vocab.json").read_text(encoding="utf-8"))
+        docs = json.loads((index_dir / "docs.json").read_text(encoding="utf-8"))
+        return cls(
+            {t: i for i, t in enumerate(vocab)},
+            np.load(index_dir / "indptr.npy", mmap_mode="r"),
+            np.load(index_dir / "indices.npy", mmap_mode="r"),
+            np.load(index_dir / "pesos.npy", mmap_mode="r"),
+            docs,
+        )
+
+
+# ===================================================================
+# BUILD INCREMENTAL
+# ===================================================================
+def _ler_manifest(index_dir: Path) -> Optional[Dict]:
+    path = index_dir / "manifest.json"
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def construir_indice(
+    corpus_dir: Path = CORPUS_DIR,
+    index_dir: Path = INDEX_DIR,
+    forcar: bool = False,
+) -> BM25Index:
+    """
+    Constrói/atualiza o índice persistido a partir do chunk store.
+
+    Chunks cujo id (hash do conteúdo) já está no cache (index_dir/tf.json)
+    reaproveitam as contagens de termos; só os novos são tokenizados.
+    """
+    from lats_sistema.vectorstore.chunk_store import (
+        STORE_DIR, construir_chunk_store, store_desatualizado, get_chunk_store,
+    )
+
+    if store_desatualizado(corpus_dir, STORE_DIR):
+        store = construir_chunk_store(corpus_dir, STORE_DIR)
+    else:
+        store = get_chunk_store()
+
+    index_dir.mkdir(parents=True, exist_ok=True)
+    tf_path = index_dir / "tf.json"
+    cache = {}
+    if tf_path.exists() and not forcar:
+        try:
+            cache = json.loads(tf_path.read_text(encoding="utf-8"))
+        except Exception:
+            cache = {}
+
+    contagens, docs, novo_cache = [], [], {}
+    novos = 0
+    for cid in store.ids:
+        cont = cache.get(cid)
+        if cont is None:
+            cont = dict(Counter(tokenizar(store.texto(cid))))
+            novos += 1
+        novo_cache[cid] = cont  # chunks removidos saem do cache
+        contagens.append(cont)
+        docs.append({"id": cid, "source": store.fonte(cid)})
+
+    tmp = index_dir / ".tf.json.tmp"
+    tmp.write_text(json.dumps(novo_cache, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, tf_path)
+
+    index = BM25Index.from_term_counts(contagens, docs)
+    manifest = {
+        "versao": INDEX_VERSION,
+        "k1": BM25_K1,
+        "b": BM25_B,
+        "chunk_store": _assinatura_store(STORE_DIR),
+        "n_docs": len(docs),
+        "n_termos": len(index.vocab),
+    }
+    index.salvar(index_dir, manifest)
+
+    logger.info(
+        f"[BM25] Índice salvo em {index_dir} | docs={len(docs)} | "
+        f"termos={len(index.vocab)} | chunks retokenizados={novos}"
+    )
+    return index
+
+
+def _assinatura_store(store_dir: Path) -> Optional[Dict]:
+    """Hashes dos arquivos registrados no manifest do chunk store."""
+    path = store_dir / "manifest.json"
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("arquivos")
+    except Exception:
+        return None
+
+
+def indice_desatualizado(corpus_dir: Path = CORPUS_DIR, index_dir: Path = INDEX_DIR) -> bool:
+    """True se o corpus mudou ou se o índice não corresponde ao chunk store atual."""
+    from lats_sistema.vectorstore.chunk_store import STORE_DIR, store_desatualizado
+
+    manifest = _ler_manifest(index_dir)
+    if not manifest or manifest.get("versao") != INDEX_VERSION:
+        return True
+    if store_desatualizado(corpus_dir, STORE_DIR):
+        return True
+    return manifest.get("chunk_store") != _assinatura_store(STORE_DIR)
+
+
+# ===================================================================
+# SINGLETON DO PROCESSO
+# ===================================================================
+_index: Optional[BM25Index] = None
+_lock = threading.Lock()
+
+
+def get_bm25_index() -> BM25Index:
+    """
+    Retorna o índice do processo (carregado do disco uma única vez).
+    Se não existir ou estiver desatualizado, (re)constrói incrementalmente.
+    """
+    global _index
+    if _index is not None:
+        return _index
+
+    with _lock:
+        if _index is None:
+            if indice_desatualizado():
+                logger.info("[BM25] Índice ausente/desatualizado — construindo...")
+                _index = construir_indice()
+            else:
+                _index = BM25Index.carregar(INDEX_DIR)
+                logger.info(f"[BM25] Índice carregado de {INDEX_DIR} ({_index.n_docs} docs)")
+    return _index
+
+
+def recarregar_indice():
+    """Descarta o índice em memória (próxima consulta recarrega do disco)."""
+    global _index
+    with _lock:
+        _index = None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    construir_indice()
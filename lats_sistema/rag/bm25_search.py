@@ -1,8 +1,28 @@
-from rank_bm25 import BM25Okapi
-
-def buscar_bm25(query, corpus, n=5):
-    tokens = [c.split() for c in corpus]
-    bm25 = BM25Okapi(tokens)
-    scores = bm25.get_scores(query.split())
-    idx = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:n]
-    return [corpus[i] for i in idx]
+from typing import List, Tuple
+
+from lats_sistema.rag.bm25_index import BM25Index, get_bm25_index
+
+
+def buscar_bm25_ids(query: str, n: int = 5) -> List[Tuple[str, float]]:
+    """Busca no índice persistido e retorna [(chunk_id, score)]."""
+    index = get_bm25_index()
+    idx, scores = index.top_k(query, n)
+    return list(zip(index.ids(idx), (float(s) for s in scores)))
+
+
+def buscar_bm25(query, corpus=None, n=5):
+    """
+    Busca lexical BM25.
+
+    ⚡ OTIMIZAÇÃO: sem `corpus`, usa o índice persistido do corpus normativo
+    (construído uma vez, carregado com mmap) e lê os textos do chunk store.
+    Com `corpus` (lista de strings), monta um índice em memória apenas para
+    aquela lista.
+    """
+    if corpus is None:
+        from lats_sistema.vectorstore.chunk_store import get_chunk_store
+        return get_chunk_store().textos([cid for cid, _ in buscar_bm25_ids(query, n)])
+
+    index = BM25Index.from_textos(list(corpus))
+    idx, _ = index.top_k(query, n)
+    return [index.docs[i]["texto"] for i in idx]
@@ -0,0 +1,161 @@
+# lats_sistema/rag/cache.py
+"""
+Cache de resultados do RAG (contexto sintetizado, candidatos e ranking).
+
+Chave = fingerprint do evento + perfil de configuração do RAG. Guardado no
+state (retomada de HITL) e num LRU do processo; cada entrada vale só para a
+versão da árvore + corpus em que foi gerada.
+
+Variáveis:
+- RAG_CACHE     → liga / desliga (padrão 1)
+- RAG_CACHE_MAX → entradas no LRU (padrão 256)
+- RAG_CACHE_TTL → validade em s (padrão 3600)
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from lats_sistema.utils.metrics import registrar_cache
+
+RAG_CACHE_ENABLED = os.getenv("RAG_CACHE", "1") == "1"
+RAG_CACHE_MAX = int(os.getenv("RAG_CACHE_MAX", "256"))
+RAG_CACHE_TTL = float(os.getenv("RAG_CACHE_TTL", "3600"))  # segundos
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+_MANIFESTS = (
+    BASE_DIR / "data" / "chunks" / "manifest.json",
+    BASE_DIR / "data" / "faiss" / "index_anp" / "manifest.json",
+)
+
+
+# ===================================================================
+# CHAVE E VERSÃO
+# ===================================================================
+def fingerprint_evento(evento: str) -> str:
+    normalizado = re.sub(r"\s+", " ", (evento or "").strip().lower())
+    return hashlib.sha256(normalizado.encode("utf-8")).hexdigest()[:32]
+
+
+def perfil_rag() -> Dict[str, Any]:
+    """Parâmetros que mudam o resultado do RAG."""
+    from lats_sistema.config import fast_mode as fm
+
+    return {
+        "hyde": fm.RAG_HYDE_ENABLED,
+        "bm25_k": fm.RAG_BM25_K,
+        "semantic_k": fm.RAG_SEMANTIC_K,
+        "top_n": fm.RAG_RERANK_TOP_N,
+        "max_ctx": fm.RAG_MAX_CONTEXT_LENGTH,
+        "rerank_llm": fm.RAG_RERANK_LLM,
+        "rrf_k": fm.RAG_RRF_K,
+        "lexical": fm.RAG_LEXICAL_WEIGHT,
+    }
+
+
+def chave_rag(evento: str) -> str:
+    perfil = json.dumps(perfil_rag(), sort_keys=True)
+    return fingerprint_evento(evento) + ":" + hashlib.sha256(perfil.encode()).hexdigest()[:12]
+
+
+def versao_atual() -> str:
+    """Versão da árvore + corpus (mtime dos manifests dos índices)."""
+    from lats_sistema.lats.tree_loader import TREE_VERSION
+
+    partes = [TREE_VERSION]
+    for path in _MANIFESTS:
+        try:
+            partes.append(str(path.stat().st_mtime_ns))
+        except OSError:
+            partes.append("-")
+    return ":".join(partes)
+
+
+# ===================================================================
+# LRU DO PROCESSO
+# ===================================================================
+class RagCache:
+    def __init__(self, max_entradas: int = RAG_CACHE_MAX, ttl: float = RAG_CACHE_TTL):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._dados: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave: str, versao: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is None:
+                return None
+            if entrada["versao"] != versao or time.time() - entrada["criado_em"] > self.ttl:
+                del self._dados[chave]
+                return None
+            self._dados.move_to_end(chave)
+            return entrada
+
+    def put(self, chave: str, versao: str, valor: Dict[str, Any]):
+        with self._lock:
+            self._dados[chave] = dict(valor, versao=versao, criado_em=time.time())
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+
+_cache = RagCache()
+
+
+# ===================================================================
+# API USADA PELO no_rag
+# ===================================================================
+def buscar_rag_cache(state: Dict[str, Any], evento: str) -> Optional[Dict[str, Any]]:
+    """
+    Retorna {"contexto", "candidatos", "ranking"} se houver resultado válido
+    (no state ou no LRU do processo), senão None.
+    """
+    if not RAG_CACHE_ENABLED:
+        return None
+
+    chave, versao = chave_rag(evento), versao_atual()
+
+    # 1) State (retomada de HITL)
+    no_state = state.get("_rag_cache") or {}
+    if no_state.get("chave") == chave and no_state.get("versao") == versao:
+        registrar_cache("rag", hit=True)
+        return no_state
+
+    # 2) LRU do processo (eventos repetidos)
+    entrada = _cache.get(chave, versao)
+    registrar_cache("rag", hit=entrada is not None)
+    return entrada
+
+
+def salvar_rag_cache(state: Dict[str, Any], evento: str, contexto: str, candidatos, ranking):
+    if not RAG_CACHE_ENABLED:
+        return
+
+    chave, versao = chave_rag(evento), versao_atual()
+    valor = {
+        "contexto": contexto,
+        "candidatos": list(candidatos),
+        "ranking": [
+            {"chunk_id": x.get("chunk_id"), "score": float(x.get("score", 0.0))} for x in ranking
+        ],
+    }
+    _cache.put(chave, versao, valor)
+    state["_rag_cache"] = dict(valor, chave=chave, versao=versao)
+
+
+def limpar_rag_cache():
+    _cache.limpar()
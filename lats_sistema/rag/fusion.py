@@ -0,0 +1,66 @@
+# lats_sistema/rag/fusion.py
+"""
+Reranking local por Reciprocal Rank Fusion (RRF) dos rankings BM25 e
+semântico (score = Σ 1 / (k + posição)), mais sobreposição lexical evento ×
+trecho. O rerank LLM fica como 2º estágio opcional sobre o top-N.
+
+Variáveis (config/fast_mode.py):
+- RAG_RRF_K          → k do RRF (padrão 60)
+- RAG_LEXICAL_WEIGHT → peso da sobreposição lexical (padrão 0.5)
+- RAG_RERANK_LLM     → rerank LLM sobre o top-N (padrão 0)
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+from lats_sistema.rag.bm25_index import tokenizar
+
+# Constante clássica do RRF (Cormack et al.): amortece o peso do topo
+RRF_K = 60
+
+
+def sobreposicao_lexical(evento: str, trecho: str) -> float:
+    """Fração dos termos (distintos) do evento que aparecem no trecho."""
+    termos_evento = set(tokenizar(evento))
+    if not termos_evento:
+        return 0.0
+    return len(termos_evento & set(tokenizar(trecho))) / len(termos_evento)
+
+
+def rrf_fusao(
+    evento: str,
+    rankings: Dict[str, Sequence[Tuple[str, str]]],
+    k: int = RRF_K,
+    peso_lexical: float = 0.0,
+) -> List[Dict]:
+    """
+    Funde rankings [(chunk_id, texto)] por RRF (deduplicando por chunk_id).
+
+    Args:
+        evento: Descrição do evento (para a feature lexical)
+        rankings: {nome_do_retriever: [(chunk_id, texto), ...]} em ordem
+        k: Constante do RRF
+        peso_lexical: Peso da sobreposição lexical (0 desativa). Como o
+            score RRF de um 1º lugar é 1/(k+1), o peso é aplicado na mesma
+            escala: peso_lexical * sobreposição / (k + 1)
+
+    Returns:
+        Lista de dicts {"trecho", "score", "chunk_id", "fontes"} ordenada
+        (mesmo formato de rerank()).
+    """
+    acumulado: Dict[str, Dict] = {}
+    for nome, lista in rankings.items():
+        for posicao, (cid, texto) in enumerate(lista, start=1):
+            if not texto or not texto.strip():
+                continue
+            item = acumulado.setdefault(
+                cid, {"trecho": texto.strip(), "score": 0.0, "chunk_id": cid, "fontes": []}
+            )
+            item["score"] += 1.0 / (k + posicao)
+            item["fontes"].append(nome)
+
+    if peso_lexical > 0:
+        for item in acumulado.values():
+            item["score"] += peso_lexical * sobreposicao_lexical(evento, item["trecho"]) / (k + 1)
+
+    # Ordem estável: empate mantém a ordem de chegada
+    return sorted(acumulado.values(), key=lambda x: x["score"], reverse=True)
@@ -1,5 +1,5 @@
 from langchain_core.prompts import ChatPromptTemplate
-from lats_sistema.models.llm import llm_text
+from lats_sistema.models.llm import llm_text, invoke_llm
 
 
 def hyde_generate(evento: str) -> str:
@@ -9,4 +9,5 @@ Gere um trecho técnico hipotético relacionado ao evento:
 EVENTO:
 {evento}
 """)
-    return (prompt | llm_text).invoke({"evento": evento}).content
+    mensagens = prompt.format_messages(evento=evento)
+    return invoke_llm(llm_text, mensagens, call_site="hyde").content
@@ -0,0 +1,172 @@
+# lats_sistema/rag/pipeline.py
+"""
+Etapas de recuperação do RAG executadas como um pequeno DAG concorrente:
+
+    ┌─ bm25 (evento)                       ─┐
+    ├─ semantico (embedding do evento)      ├─→ fusão RRF → síntese
+    └─ hyde (LLM) ─→ bm25_hyde (evento+doc) ─┘
+
+Etapa lenta ou com erro é descartada e o RAG segue com as que terminaram.
+executar_retrieval_no faz o mesmo (sem HyDE) para evento + pergunta do nó
+(RAG sob demanda).
+
+Variáveis:
+- RAG_TIMEOUT_HYDE / RAG_TIMEOUT_BM25 / RAG_TIMEOUT_SEMANTIC → timeouts em s
+  a partir do início do pipeline (padrão 8 / 2 / 5)
+- RAG_WORKERS → threads do pool (padrão 8)
+"""
+
+import os
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional
+
+from lats_sistema.utils.metrics import RAG_STAGE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# ===================================================================
+# CONFIGURAÇÃO
+# ===================================================================
+RAG_TIMEOUT_HYDE = float(os.getenv("RAG_TIMEOUT_HYDE", "8"))
+RAG_TIMEOUT_BM25 = float(os.getenv("RAG_TIMEOUT_BM25", "2"))
+RAG_TIMEOUT_SEMANTIC = float(os.getenv("RAG_TIMEOUT_SEMANTIC", "5"))
+RAG_WORKERS = int(os.getenv("RAG_WORKERS", "8"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=RAG_WORKERS, thread_name_prefix="rag")
+        return _executor
+
+
+def _submeter(fn: Callable[[], Any]):
+    # Copia o contexto (prioridade do governador) para a thread do pool
+    ctx = contextvars.copy_context()
+    return _get_executor().submit(ctx.run, fn)
+
+
+# ===================================================================
+# ETAPAS
+# ===================================================================
+def _bm25(query: str, k: int):
+    from lats_sistema.rag.bm25_search import buscar_bm25_ids
+    from lats_sistema.vectorstore.chunk_store import get_chunk_store
+
+    ids = [cid for cid, _ in buscar_bm25_ids(query, n=k)]
+    return list(zip(ids, get_chunk_store().textos(ids)))
+
+
+def _semantico(state: Dict[str, Any], evento: str, k: int):
+    from lats_sistema.rag.semantic_search import buscar_semantico_ids
+    from lats_sistema.utils.embedding_cache import get_event_embedding
+
+    vetor = get_event_embedding(state, evento)
+    return buscar_semantico_ids(evento, k=k, vetor=vetor)
+
+
+def _hyde(evento: str, k: int):
+    from lats_sistema.rag.hyde import hyde_generate
+
+    hyde_doc = hyde_generate(evento)
+    return hyde_doc, _bm25(evento + " " + hyde_doc, k)
+
+
+# ===================================================================
+# EXECUÇÃO
+# ===================================================================
+def executar_retrieval(
+    state: Dict[str, Any],
+    evento: str,
+    usar_hyde: bool,
+    bm25_k: int,
+    semantic_k: int,
+) -> Dict[str, Any]:
+    """
+    Roda as etapas de recuperação em paralelo.
+
+    Returns:
+        {
+          "rankings": {"bm25": [(chunk_id, texto)], "semantico": [...],
+                       "bm25_hyde": [...], "hyde": [...]},   # só as que terminaram
+          "hyde_doc": str,
+          "etapas": {etapa: "ok" | "timeout" | "erro"}
+        }
+    """
+    inicio = time.monotonic()
+    etapas = {
+        "bm25": (_submeter(lambda: _bm25(evento, bm25_k)), RAG_TIMEOUT_BM25),
+        "semantico": (_submeter(lambda: _semantico(state, evento, semantic_k)), RAG_TIMEOUT_SEMANTIC),
+    }
+    if usar_hyde:
+        etapas["hyde"] = (_submeter(lambda: _hyde(evento, bm25_k)), RAG_TIMEOUT_HYDE)
+
+    resultados, status = {}, {}
+    for nome, (futuro, timeout) in etapas.items():
+        restante = max(0.0, inicio + timeout - time.monotonic())
+        try:
+            resultados[nome] = futuro.result(timeout=restante)
+            status[nome] = "ok"
+        except FutureTimeout:
+            status[nome] = "timeout"
+            logger.warning(f"[RAG] Etapa '{nome}' excedeu {timeout:.1f}s — seguindo sem ela")
+        except Exception as e:
+            status[nome] = "erro"
+            logger.warning(f"[RAG] Etapa '{nome}' falhou ({e}) — seguindo sem ela")
+        RAG_STAGE_LATENCY.labels(etapa=nome, resultado=status[nome]).observe(time.monotonic() - inicio)
+
+    rankings = {}
+    if "bm25" in resultados:
+        rankings["bm25"] = resultados["bm25"]
+    if "semantico" in resultados:
+        rankings["semantico"] = resultados["semantico"]
+
+    hyde_doc = ""
+    if "hyde" in resultados:
+        from lats_sistema.vectorstore.chunk_store import chunk_id
+
+        hyde_doc, bm25_hyde = resultados["hyde"]
+        rankings["bm25_hyde"] = bm25_hyde
+        rankings["hyde"] = [(chunk_id(hyde_doc), hyde_doc)]
+
+    return {"rankings": rankings, "hyde_doc": hyde_doc, "etapas": status}
+
+
+def executar_retrieval_no(query: str, bm25_k: int, semantic_k: int) -> Dict[str, Any]:
+    """
+    Recuperação direcionada (consulta = evento + pergunta do nó).
+
+    Returns:
+        {"rankings": {"bm25": [...], "semantico": [...]}, "etapas": {etapa: status}}
+    """
+    from lats_sistema.rag.semantic_search import buscar_semantico_ids
+
+    inicio = time.monotonic()
+    etapas = {
+        "bm25": (_submeter(lambda: _bm25(query, bm25_k)), RAG_TIMEOUT_BM25),
+        "semantico": (_submeter(lambda: buscar_semantico_ids(query, k=semantic_k)), RAG_TIMEOUT_SEMANTIC),
+    }
+
+    rankings, status = {}, {}
+    for nome, (futuro, timeout) in etapas.items():
+        restante = max(0.0, inicio + timeout - time.monotonic())
+        try:
+            rankings[nome] = futuro.result(timeout=restante)
+            status[nome] = "ok"
+        except FutureTimeout:
+            status[nome] = "timeout"
+            logger.warning(f"[RAG NÓ] Etapa '{nome}' excedeu {timeout:.1f}s — seguindo sem ela")
+        except Exception as e:
+            status[nome] = "erro"
+            logger.warning(f"[RAG NÓ] Etapa '{nome}' falhou ({e}) — seguindo sem ela")
+        RAG_STAGE_LATENCY.labels(etapa=f"no_{nome}", resultado=status[nome]).observe(time.monotonic() - inicio)
+
+    return {"rankings": rankings, "etapas": status}
@@ -67,7 +67,8 @@ def rerank(evento, trechos, force_llm: bool = False):
             llm_json,
             full_prompt,
             max_retries=2,
-            schema_hint='{"ranking": [{"trecho": "...", "score": 0.0}]}'
+            schema_hint='{"ranking": [{"trecho": "...", "score": 0.0}]}',
+            call_site="rerank",
         )
     except Exception as e:
         print(f"[ERRO] Rerank JSON inválido: {e}")
@@ -77,3 +78,29 @@ def rerank(evento, trechos, force_llm: bool = False):
     ranking = data.get("ranking", [])
     ranking.sort(key=lambda x: x.get("score", 0.0), reverse=True)
     return ranking
+
+
+def rerank_fusao(evento, rankings, top_n: int = 5):
+    """
+    Rerank do caminho quente: RRF local sobre os rankings dos retrievers.
+
+    ⚡ OTIMIZAÇÃO: sem chamada LLM por padrão. Com RAG_RERANK_LLM=1, o
+    rerank LLM roda como 2º estágio apenas sobre o top do RRF (2 × top_n).
+
+    Args:
+        evento: Descrição do evento
+        rankings: {nome_do_retriever: [(chunk_id, texto), ...]}
+        top_n: Quantidade de trechos retornados
+
+    Returns:
+        Lista de dicts {"trecho": str, "score": float, ...} ordenada
+    """
+    from lats_sistema.config.fast_mode import RAG_RERANK_LLM, RAG_RRF_K, RAG_LEXICAL_WEIGHT
+    from lats_sistema.rag.fusion import rrf_fusao
+
+    ranking = rrf_fusao(evento, rankings, k=RAG_RRF_K, peso_lexical=RAG_LEXICAL_WEIGHT)
+    print(f"⚡ Rerank local (RRF): {len(ranking)} candidatos")
+
+    if RAG_RERANK_LLM and len(ranking) > RERANK_MIN_CANDIDATES:
+        return rerank(evento, [x["trecho"] for x in ranking[:2 * top_n]])[:top_n]
+    return ranking[:top_n]
@@ -1,7 +1,35 @@
+from typing import List, Tuple
+
 from lats_sistema.vectorstore.faiss_loader import load_faiss_store
 
+
 def buscar_semantico(query):
     store = load_faiss_store()
     if store is None:
         return []  # RAG desativado
     return store.similarity_search(query, k=4)
+
+
+def buscar_semantico_ids(query: str, k: int = 4, vetor=None) -> List[Tuple[str, str]]:
+    """
+    Busca semântica retornando [(chunk_id, texto)].
+
+    Índices gerados a partir do chunk store trazem `chunk_id` nos metadados
+    (mesmo id do BM25). Para índices antigos, o id é o hash do conteúdo.
+
+    Se `vetor` (embedding da query já calculado) for passado, não há nova
+    chamada à API de embeddings.
+    """
+    from lats_sistema.vectorstore.chunk_store import chunk_id
+
+    store = load_faiss_store()
+    if store is None:
+        return []  # RAG desativado
+    if vetor is not None:
+        docs = store.similarity_search_by_vector(list(map(float, vetor)), k=k)
+    else:
+        docs = store.similarity_search(query, k=k)
+    return [
+        (d.metadata.get("chunk_id") or chunk_id(d.page_content), d.page_content)
+        for d in docs
+    ]
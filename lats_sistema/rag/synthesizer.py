@@ -1,5 +1,5 @@
 from langchain_core.prompts import ChatPromptTemplate
-from lats_sistema.models.llm import llm_text
+from lats_sistema.models.llm import llm_text, invoke_llm
 
 prompt_synth = ChatPromptTemplate.from_template("""
 Crie um resumo técnico relacionando o evento aos trechos normativos:
@@ -15,7 +15,5 @@ RESUMO:
 
 def sintetizar(evento, ranking):
     melhores = "\n\n".join(x["trecho"] for x in ranking[:5])
-    return (prompt_synth | llm_text).invoke({
-        "evento": evento,
-        "trechos": melhores
-    }).content
+    mensagens = prompt_synth.format_messages(evento=evento, trechos=melhores)
+    return invoke_llm(llm_text, mensagens, call_site="synthesizer").content
@@ -0,0 +1,31 @@
+import os
+import importlib
+
+import pytest
+
+from lats_sistema.memory import db
+
+# CI: LATS_TESTS_EXIGIR_FAISS=1 → faiss ausente falha em vez de pular (o
+# faiss_store é o backend padrão fora do serverless)
+EXIGIR_FAISS = os.getenv("LATS_TESTS_EXIGIR_FAISS", "0") == "1"
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """SQLite das memórias isolado em tmp_path (conexão da thread reaberta)."""
+    db.fechar_conexao()
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "decisions.db")
+    yield db
+    db.fechar_conexao()
+
+
+@pytest.fixture
+def faiss_isolado(banco, tmp_path, monkeypatch):
+    """faiss_store com índice / log em tmp_path e sem atraso de recarga."""
+    if not EXIGIR_FAISS:
+        pytest.importorskip("faiss")
+    faiss_store = importlib.import_module("lats_sistema.memory.faiss_store")
+    monkeypatch.setattr(faiss_store, "INDEX_PATH", tmp_path / "faiss_index.bin")
+    monkeypatch.setattr(faiss_store, "MEMORY_INDEX_RELOAD_INTERVAL", 0.0)
+    monkeypatch.setattr(faiss_store, "_memory_index", None)
+    return faiss_store
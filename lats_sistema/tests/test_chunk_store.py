@@ -0,0 +1,94 @@
+"""
+Chunk store incremental: deve produzir exatamente o mesmo store que um
+build limpo, inclusive com chunks repetidos entre arquivos.
+
+O chunking real usa tiktoken; aqui um chunker por parágrafo mantém o teste
+independente do tokenizer (a lógica sob teste é a do reaproveitamento).
+
+    python -m pytest lats_sistema/tests/test_chunk_store.py -q
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from lats_sistema.vectorstore import chunk_store
+
+
+def _chunkar_paragrafos(texto, *args, **kwargs):
+    chunks, inicio = [], 0
+    for paragrafo in texto.split("\n\n"):
+        fim = inicio + len(paragrafo)
+        if paragrafo.strip():
+            chunks.append({"texto": paragrafo, "inicio": inicio, "fim": fim})
+        inicio = fim + 2
+    return chunks
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    monkeypatch.setattr(chunk_store, "chunkar", _chunkar_paragrafos)
+    pasta = tmp_path / "corpus"
+    pasta.mkdir()
+    (pasta / "a.md").write_text("Seção própria de A.\n\nTrecho comum aos dois padrões.", encoding="utf-8")
+    (pasta / "b.md").write_text("Trecho comum aos dois padrões.\n\nSeção própria de B.", encoding="utf-8")
+    return pasta
+
+
+def _estado(store_dir):
+    store = chunk_store.ChunkStore.carregar(store_dir)
+    manifest = json.loads((store_dir / "manifest.json").read_text(encoding="utf-8"))
+    return {
+        "meta": np.asarray(store.meta).tolist(),
+        "fontes": store.fontes,
+        "textos": {cid: store.texto(cid) for cid in store.ids},
+        "chunks": manifest["chunks"],
+    }
+
+
+def _comparar_com_build_limpo(corpus, store_dir, tmp_path):
+    limpo = tmp_path / "limpo"
+    chunk_store.construir_chunk_store(corpus, limpo)
+    assert _estado(store_dir) == _estado(limpo)
+
+
+def test_chunk_comum_sobrevive_a_alteracao_do_primeiro_arquivo(corpus, tmp_path):
+    store_dir = tmp_path / "store"
+    chunk_store.construir_chunk_store(corpus, store_dir)
+    comum = chunk_store.chunk_id("Trecho comum aos dois padrões.")
+    assert comum in chunk_store.ChunkStore.carregar(store_dir)
+
+    # A perde o trecho comum; B (inalterado) é reaproveitado do store anterior
+    (corpus / "a.md").write_text("Seção própria de A, revisada.", encoding="utf-8")
+    store = chunk_store.construir_chunk_store(corpus, store_dir)
+
+    assert comum in store
+    assert store.fonte(comum) == "b.md"
+    _comparar_com_build_limpo(corpus, store_dir, tmp_path)
+
+
+def test_remocao_do_primeiro_arquivo(corpus, tmp_path):
+    store_dir = tmp_path / "store"
+    chunk_store.construir_chunk_store(corpus, store_dir)
+
+    (corpus / "a.md").unlink()
+    store = chunk_store.construir_chunk_store(corpus, store_dir)
+
+    assert chunk_store.chunk_id("Trecho comum aos dois padrões.") in store
+    _comparar_com_build_limpo(corpus, store_dir, tmp_path)
+
+
+def test_arquivo_inalterado_nao_e_rechunkado(corpus, tmp_path, monkeypatch):
+    store_dir = tmp_path / "store"
+    chunk_store.construir_chunk_store(corpus, store_dir)
+    assert not chunk_store.store_desatualizado(corpus, store_dir)
+
+    lidos = []
+    monkeypatch.setattr(chunk_store, "chunkar", lambda texto, *a, **k: lidos.append(texto) or _chunkar_paragrafos(texto))
+    (corpus / "a.md").write_text("Seção própria de A.\n\nTrecho novo.", encoding="utf-8")
+    assert chunk_store.store_desatualizado(corpus, store_dir)
+    chunk_store.construir_chunk_store(corpus, store_dir)
+
+    assert lidos == ["Seção própria de A.\n\nTrecho novo."]
+    _comparar_com_build_limpo(corpus, store_dir, tmp_path)
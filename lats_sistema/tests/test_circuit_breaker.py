@@ -0,0 +1,140 @@
+"""
+Transições do circuit breaker do LLM e quais erros contam como falha.
+
+    python -m pytest lats_sistema/tests/test_circuit_breaker.py -q
+"""
+
+import pytest
+
+from lats_sistema.models import circuit_breaker as cb
+
+
+class _ErroHTTP(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    monkeypatch.setattr(cb, "CB_ENABLED", True)
+    monkeypatch.setattr(cb, "CB_CONSECUTIVE_FAILURES", 3)
+    monkeypatch.setattr(cb, "CB_MIN_CALLS", 5)
+    monkeypatch.setattr(cb, "CB_FAILURE_RATE", 0.5)
+    monkeypatch.setattr(cb, "CB_SLOW_CALL_S", 60.0)
+    monkeypatch.setattr(cb, "CB_OPEN_SECONDS", 30.0)
+    return cb.CircuitBreaker("teste")
+
+
+def _falhar(breaker, erro: Exception):
+    def fn():
+        raise erro
+    with pytest.raises(type(erro)):
+        breaker.chamar(fn)
+
+
+def _abrir(breaker):
+    for _ in range(cb.CB_CONSECUTIVE_FAILURES):
+        _falhar(breaker, _ErroHTTP(503))
+    assert breaker.estado() == cb.ABERTO
+
+
+def test_falhas_consecutivas_abrem_e_recusam(breaker):
+    _falhar(breaker, _ErroHTTP(500))
+    _falhar(breaker, APITimeoutError())
+    assert breaker.estado() == cb.FECHADO
+    _falhar(breaker, ConnectionError())
+    assert breaker.estado() == cb.ABERTO
+    assert breaker.aberto()
+
+    with pytest.raises(cb.CircuitOpenError):
+        breaker.chamar(lambda: "não chamado")
+    assert breaker.stats["rejeitadas"] == 1
+
+
+@pytest.mark.parametrize("status", [429, 400, 401, 404])
+def test_rate_limit_e_4xx_nao_contam(breaker, status):
+    for _ in range(10):
+        _falhar(breaker, _ErroHTTP(status))
+    assert breaker.estado() == cb.FECHADO
+    assert breaker.stats["falhas"] == 0
+
+
+def test_sucesso_zera_as_consecutivas(breaker):
+    _falhar(breaker, _ErroHTTP(502))
+    _falhar(breaker, _ErroHTTP(502))
+    assert breaker.chamar(lambda: "ok") == "ok"
+    _falhar(breaker, _ErroHTTP(502))
+    assert breaker.estado() == cb.FECHADO
+
+
+def test_taxa_de_falhas_na_janela(breaker):
+    for _ in range(3):
+        breaker.chamar(lambda: "ok")
+        _falhar(breaker, _ErroHTTP(500))
+    assert breaker.estado() == cb.ABERTO
+
+
+def test_chamada_lenta_conta_como_falha(breaker, monkeypatch):
+    monkeypatch.setattr(cb, "CB_SLOW_CALL_S", -1.0)
+    for _ in range(3):
+        assert breaker.chamar(lambda: "ok") == "ok"
+    assert breaker.estado() == cb.ABERTO
+    assert breaker.stats["lentas"] == 3
+
+
+def test_sonda_bem_sucedida_fecha(breaker, monkeypatch):
+    _abrir(breaker)
+    monkeypatch.setattr(cb, "CB_OPEN_SECONDS", 0.0)
+    assert breaker.estado() == cb.SEMI_ABERTO
+    assert not breaker.aberto()
+
+    assert breaker.chamar(lambda: "ok") == "ok"
+    assert breaker.estado() == cb.FECHADO
+
+
+def test_sonda_com_falha_reabre(breaker, monkeypatch):
+    _abrir(breaker)
+    monkeypatch.setattr(cb, "CB_OPEN_SECONDS", 0.0)
+    assert breaker.estado() == cb.SEMI_ABERTO
+
+    _falhar(breaker, _ErroHTTP(500))
+    assert breaker._estado == cb.ABERTO
+    assert breaker.stats["aberturas"] == 2
+
+
+def test_sonda_em_voo_recusa_as_demais(breaker, monkeypatch):
+    _abrir(breaker)
+    monkeypatch.setattr(cb, "CB_OPEN_SECONDS", 0.0)
+
+    def sonda():
+        # Enquanto a sonda está em voo, outra chamada é recusada
+        assert breaker.aberto()
+        with pytest.raises(cb.CircuitOpenError):
+            breaker.chamar(lambda: "concorrente")
+        return "ok"
+
+    assert breaker.chamar(sonda) == "ok"
+    assert breaker.estado() == cb.FECHADO
+
+
+def test_sonda_com_429_libera_nova_sonda(breaker, monkeypatch):
+    _abrir(breaker)
+    monkeypatch.setattr(cb, "CB_OPEN_SECONDS", 0.0)
+
+    _falhar(breaker, _ErroHTTP(429))
+    assert breaker.estado() == cb.SEMI_ABERTO
+    assert not breaker.aberto()
+    assert breaker.chamar(lambda: "ok") == "ok"
+    assert breaker.estado() == cb.FECHADO
+
+
+def test_desligado_so_repassa(breaker, monkeypatch):
+    monkeypatch.setattr(cb, "CB_ENABLED", False)
+    for _ in range(5):
+        _falhar(breaker, _ErroHTTP(500))
+    assert not breaker.aberto()
@@ -0,0 +1,151 @@
+"""
+Governador de chamadas à OpenAI: prioridade da fila, 429 com Retry-After,
+retries só em erros transitórios e timeout da fila.
+
+    python -m pytest lats_sistema/tests/test_governor.py -q
+"""
+
+import time
+import threading
+
+import pytest
+
+from lats_sistema.models import governor as gv
+
+
+class _Resposta:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class _ErroHTTP(Exception):
+    def __init__(self, status_code: int, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = _Resposta({"retry-after": retry_after} if retry_after is not None else {})
+
+
+@pytest.fixture
+def esperas(monkeypatch):
+    """Backoff fixo e time.sleep registrado (sem dormir de fato)."""
+    registradas = []
+    monkeypatch.setattr(gv, "_backoff", lambda tentativa: 0.01)
+    monkeypatch.setattr(gv.time, "sleep", registradas.append)
+    return registradas
+
+
+def _falhas_e_depois(erros, resultado="ok"):
+    chamadas = []
+
+    def fn():
+        chamadas.append(1)
+        if len(chamadas) <= len(erros):
+            raise erros[len(chamadas) - 1]
+        return resultado
+
+    return fn, chamadas
+
+
+def test_interativo_passa_na_frente_de_batch():
+    gov = gv.LLMGovernor("teste", rpm=120, tpm=10 ** 6)  # 1 requisição a cada 0,5 s
+    gov.rpm.disponivel = 0.0
+    ordem = []
+
+    def chamar(classe, rotulo):
+        gov.adquirir(1, classe)
+        ordem.append(rotulo)
+
+    threads = []
+    for classe, rotulo in [("batch", "batch1"), ("batch", "batch2"), ("interativo", "interativo")]:
+        t = threading.Thread(target=chamar, args=(classe, rotulo))
+        t.start()
+        threads.append(t)
+        time.sleep(0.05)  # ordem de chegada definida
+    for t in threads:
+        t.join(5)
+
+    # Interativo chegou por último mas é atendido primeiro; batch em FIFO
+    assert ordem == ["interativo", "batch1", "batch2"]
+    assert gov.em_espera() == 0
+    assert gov.estatisticas()["fila_max"] == 3
+
+
+def test_prioridade_do_contexto():
+    with gv.prioridade("batch"):
+        assert gv.prioridade_atual() == "batch"
+    assert gv.prioridade_atual() == gv.PRIORIDADE_PADRAO
+    with pytest.raises(ValueError):
+        with gv.prioridade("urgente"):
+            pass
+
+
+def test_429_respeita_retry_after_e_pausa_o_recurso(esperas):
+    gov = gv.LLMGovernor("teste", rpm=10 ** 6, tpm=10 ** 9)
+    fn, chamadas = _falhas_e_depois([_ErroHTTP(429, retry_after="0.2")])
+
+    inicio = time.monotonic()
+    assert gov.executar(fn, tokens=10) == "ok"
+
+    assert len(chamadas) == 2
+    assert esperas == [0.2]  # max(backoff, Retry-After)
+    # A pausa vale para todos: a nova admissão esperou o Retry-After
+    assert time.monotonic() - inicio >= 0.15
+    stats = gov.estatisticas()
+    assert stats["rate_limited"] == 1 and stats["retries"] == 1 and stats["chamadas"] == 2
+
+
+def test_retry_after_menor_que_o_backoff(esperas, monkeypatch):
+    monkeypatch.setattr(gv, "_backoff", lambda tentativa: 0.05)
+    gov = gv.LLMGovernor("teste", rpm=10 ** 6, tpm=10 ** 9)
+    fn, _ = _falhas_e_depois([_ErroHTTP(429, retry_after="0")])
+    gov.executar(fn, tokens=10)
+    assert esperas == [0.05]
+
+
+def test_transitorio_tenta_ate_o_limite(esperas, monkeypatch):
+    monkeypatch.setattr(gv, "GOVERNOR_MAX_RETRIES", 2)
+    gov = gv.LLMGovernor("teste", rpm=10 ** 6, tpm=10 ** 9)
+    fn, chamadas = _falhas_e_depois([_ErroHTTP(503)] * 5)
+
+    with pytest.raises(_ErroHTTP):
+        gov.executar(fn, tokens=10)
+    assert len(chamadas) == 3
+    assert gov.estatisticas()["rate_limited"] == 0
+
+
+def test_erro_permanente_nao_tem_retry(esperas):
+    gov = gv.LLMGovernor("teste", rpm=10 ** 6, tpm=10 ** 9)
+    fn, chamadas = _falhas_e_depois([_ErroHTTP(400)])
+    with pytest.raises(_ErroHTTP):
+        gov.executar(fn, tokens=10)
+    assert len(chamadas) == 1 and esperas == []
+
+
+def test_uso_real_corrige_o_bucket_de_tokens():
+    gov = gv.LLMGovernor("teste", rpm=10 ** 6, tpm=6000)
+    gov.executar(lambda: {"total": 10}, tokens=1000, uso_real=lambda r: r["total"])
+    # Estimou 1000, usou 10: o bucket recebe 990 de volta
+    assert gov.tpm.disponivel == pytest.approx(6000 - 10, abs=5)
+
+
+def test_timeout_na_fila(monkeypatch):
+    monkeypatch.setattr(gv, "GOVERNOR_QUEUE_TIMEOUT", 0.1)
+    gov = gv.LLMGovernor("teste", rpm=1, tpm=10 ** 6)
+    gov.rpm.disponivel = 0.0
+    with pytest.raises(gv.GovernorTimeout):
+        gov.adquirir(1)
+    assert gov.em_espera() == 0
+
+
+def test_backoff_com_full_jitter():
+    for tentativa in range(8):
+        teto = min(gv.GOVERNOR_BACKOFF_MAX, gv.GOVERNOR_BACKOFF_BASE * 2 ** tentativa)
+        valores = [gv._backoff(tentativa) for _ in range(200)]
+        assert all(0 <= v <= teto for v in valores)
+        assert min(valores) < teto / 4  # full jitter: não fica preso perto do teto
+
+
+def test_retry_after_invalido():
+    assert gv._retry_after(_ErroHTTP(429, retry_after="amanhã")) is None
+    assert gv._retry_after(_ErroHTTP(429)) is None
+    assert gv._retry_after(_ErroHTTP(429, retry_after="1.5")) == 1.5
@@ -0,0 +1,104 @@
+"""
+Banco das memórias aberto só-leitura (bundle serverless) e empacotamento.
+
+O diretório sem escrita é simulado forçando db._gravavel() → False (como
+root, os.access não enxerga permissões).
+
+    python -m pytest lats_sistema/tests/test_memory_db.py -q
+"""
+
+import shutil
+import sqlite3
+
+import pytest
+
+from lats_sistema.memory import db
+
+
+@pytest.fixture
+def alternar(banco, monkeypatch):
+    """alternar(True/False): reabre a conexão com / sem escrita no diretório."""
+    estado = {"somente_leitura": False}
+    monkeypatch.setattr(db, "_gravavel", lambda: not estado["somente_leitura"])
+
+    def _alternar(somente_leitura: bool):
+        db.fechar_conexao()
+        estado["somente_leitura"] = somente_leitura
+
+    return _alternar
+
+
+def test_banco_ausente_vira_schema_vazio(alternar):
+    alternar(True)
+    assert db.somente_leitura()
+    assert db.count_decisions() == 0
+    assert db.count_decisions_by_node() == {}
+    assert not db.DB_PATH.exists()
+
+
+def test_gravacoes_falham_e_leituras_funcionam(alternar):
+    ids = db.insert_decisions([{"node_id": "no", "embedding": b"\0" * 16}])
+    assert not db.somente_leitura()
+    db.empacotar()
+
+    alternar(True)
+    assert db.somente_leitura()
+    assert db.get_decision_ids_by_node("no") == ids
+    with pytest.raises(sqlite3.OperationalError):
+        db.insert_decisions([{"node_id": "no"}])
+
+
+def test_banco_antigo_sem_colunas_de_uso(alternar):
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.execute("CREATE TABLE decisions (id INTEGER PRIMARY KEY, event_text TEXT, node_id TEXT, "
+                 "chosen_child TEXT, model_suggestion TEXT, justification_human TEXT, "
+                 "justification_model TEXT, entropy REAL, timestamp TEXT, embedding BLOB)")
+    conn.execute("INSERT INTO decisions (node_id, chosen_child) VALUES ('no', 'filho')")
+    conn.commit()
+    conn.close()
+
+    alternar(True)
+    [row] = db.get_decisions_by_node("no")
+    assert (row["chosen_child"], row["hits"], row["last_used"]) == ("filho", 0, None)
+
+
+def test_empacotar_leva_os_commits_do_wal(alternar, tmp_path, monkeypatch):
+    db.init_db()
+    db.fechar_conexao()
+
+    # Cópia (como num bundle) feita com commits ainda só no -wal
+    escritor = sqlite3.connect(db.DB_PATH)
+    escritor.execute("PRAGMA wal_autocheckpoint=0")
+    escritor.execute("INSERT INTO decisions (node_id) VALUES ('no')")
+    escritor.commit()
+    bundle = tmp_path / "bundle"
+    bundle.mkdir()
+    for sufixo in ("", "-wal"):
+        shutil.copy(f"{db.DB_PATH}{sufixo}", bundle / f"decisions.db{sufixo}")
+    escritor.close()
+    monkeypatch.setattr(db, "DB_PATH", bundle / "decisions.db")
+
+    alternar(True)
+    assert db.count_decisions() == 0  # immutable não lê o -wal
+
+    alternar(False)
+    assert db.empacotar() == 1
+    assert not (bundle / "decisions.db-wal").exists()
+
+    alternar(True)
+    assert db.count_decisions() == 1
+
+
+def test_escritor_pula_uso_e_memorias_no_somente_leitura(alternar, monkeypatch):
+    memory_writer = pytest.importorskip("lats_sistema.memory.memory_writer")
+    alternar(True)
+
+    def nao_chamar(*args, **kwargs):
+        raise AssertionError("gravação com o banco somente leitura")
+
+    monkeypatch.setattr(memory_writer, "registrar_uso", nao_chamar)
+    monkeypatch.setattr(memory_writer, "preparar_memoria", nao_chamar)
+    monkeypatch.setattr(memory_writer, "MEMORY_WRITER_ENABLED", False)
+
+    memory_writer.enfileirar_uso([1, 2])
+    memory_writer.enfileirar_memoria({}, "no", "filho", "", "", 2.0, [], [])
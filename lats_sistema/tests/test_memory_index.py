@@ -0,0 +1,190 @@
+"""
+Índice das memórias HITL: log write-behind entre instâncias (= processos),
+registro truncado, compactação e, no faiss_store, delta mmap, busca exata
+por subconjunto, migração de tipo e reconstrução a partir do SQLite.
+
+Os cenários de log rodam nos dois backends; os do faiss pulam sem faiss,
+exceto com LATS_TESTS_EXIGIR_FAISS=1 (CI), em que falham.
+
+    python -m pytest lats_sistema/tests/test_memory_index.py -q
+"""
+
+import numpy as np
+import pytest
+
+from lats_sistema.memory import db, numpy_store
+
+DIM = 16
+
+
+def _vetor(semente: int) -> np.ndarray:
+    return np.random.default_rng(semente).normal(size=DIM).astype("float32")
+
+
+def _melhor(indice, vec: np.ndarray, k: int = 1, ids_permitidos=None) -> list:
+    resultado = indice.search(vec.reshape(1, -1), k, ids_permitidos)
+    return [] if resultado is None else resultado[1][0].tolist()
+
+
+def _inserir(n: int, node_id: str = "no_a") -> list:
+    return db.insert_decisions([
+        {"event_text": f"evento {i}", "node_id": node_id, "chosen_child": "filho",
+         "embedding": _vetor(i).tobytes()}
+        for i in range(n)
+    ])
+
+
+@pytest.fixture(params=["numpy", "faiss"])
+def store(request, banco, tmp_path, monkeypatch):
+    """Backend vetorial com arquivos em tmp_path e sem atraso de recarga."""
+    if request.param == "faiss":
+        return request.getfixturevalue("faiss_isolado")
+    monkeypatch.setattr(numpy_store, "INDEX_PATH", tmp_path / "memoria_vetores.bin")
+    monkeypatch.setattr(numpy_store, "MEMORY_INDEX_RELOAD_INTERVAL", 0.0)
+    monkeypatch.setattr(numpy_store, "_memory_index", None)
+    return numpy_store
+
+
+# ===================================================================
+# LOG COMPARTILHADO ENTRE INSTÂNCIAS (= processos)
+# ===================================================================
+def test_duas_instancias_compartilham_log(store):
+    a, b = store.MemoryIndex(), store.MemoryIndex()
+    a.add(_vetor(1), 1)
+    assert _melhor(b, _vetor(1)) == [1]
+
+    b.add(_vetor(2), 2)
+    assert _melhor(a, _vetor(2)) == [2]
+    assert a.ntotal == b.ntotal == 2
+
+    # Mesmo id pelas duas instâncias: um registro só
+    a.add(_vetor(2), 2)
+    assert b.ntotal == 2
+
+
+def test_registro_truncado_no_fim_do_log(store):
+    a = store.MemoryIndex()
+    a.add(_vetor(1), 1)
+    a.add(_vetor(2), 2)
+    log = store._log_path()
+    tamanho_registro = log.stat().st_size // 2
+    with open(log, "ab") as f:
+        f.write(b"\x07" * (tamanho_registro // 2))  # crash no meio de um append
+
+    b = store.MemoryIndex()
+    assert b.ntotal == 2
+
+    # O próximo append descarta o pedaço truncado
+    b.add(_vetor(3), 3)
+    assert log.stat().st_size == 3 * tamanho_registro
+    c = store.MemoryIndex()
+    assert c.ntotal == 3
+    assert _melhor(c, _vetor(3)) == [3]
+
+
+def test_compactacao_no_meio_da_leitura(store):
+    a, b = store.MemoryIndex(), store.MemoryIndex()
+    for i in range(1, 4):
+        a.add(_vetor(i), i)
+    assert b.ntotal == 3  # b leu o log até o fim
+
+    a.compactar()
+    assert store._log_path().stat().st_size == 0
+    a.add(_vetor(4), 4)  # log novo, menor que o offset de b
+
+    assert b.ntotal == 4
+    for i in range(1, 5):
+        assert _melhor(b, _vetor(i)) == [i]
+
+
+def test_compactacao_automatica(store, monkeypatch):
+    monkeypatch.setattr(store, "MEMORY_INDEX_COMPACT_EVERY", 2)
+    a, b = store.MemoryIndex(), store.MemoryIndex()
+    for i in range(1, 6):
+        a.add(_vetor(i), i)
+        assert b.ntotal == i
+    assert store._log_path().stat().st_size < 2 * (8 + 4 * DIM)
+
+
+# ===================================================================
+# FAISS_STORE (backend padrão fora do serverless)
+# ===================================================================
+def test_faiss_delta_mmap_e_compactacao(faiss_isolado):
+    fs = faiss_isolado
+    if not hasattr(fs.faiss, "IO_FLAG_MMAP_IFC"):
+        pytest.skip("faiss sem IO_FLAG_MMAP_IFC")
+    fs.create_index(DIM)
+    indice = fs.MemoryIndex(mmap=True)
+    for i in range(1, 4):
+        indice.add(_vetor(i), i)
+
+    # Registros do log vão para o delta (o índice mapeado é só leitura)
+    assert indice.index.ntotal == 0 and indice.delta.ntotal == 3
+    assert _melhor(indice, _vetor(2)) == [2]
+    assert _melhor(indice, _vetor(2), k=2, ids_permitidos=[1, 3])[0] in (1, 3)
+
+    indice.compactar()
+    assert indice.index.ntotal == 3 and indice.delta.ntotal == 0
+    assert fs._log_path().stat().st_size == 0
+    assert _melhor(fs.MemoryIndex(mmap=True), _vetor(3)) == [3]
+
+
+@pytest.mark.parametrize("tipo", ["flat", "hnsw"])
+def test_faiss_busca_exata_igual_ao_seletor(faiss_isolado, monkeypatch, tipo):
+    fs = faiss_isolado
+    vetores = np.stack([_vetor(i) for i in range(200)])
+    ids = np.arange(1000, 1200, dtype=np.int64)
+    index = fs.construir_indice_memoria(vetores, ids, tipo, "cosine")
+    permitidos = ids[::7]
+    q = _vetor(5000).reshape(1, -1)
+
+    exata = fs.buscar(index, q, 5, permitidos)
+    monkeypatch.setattr(fs, "MEMORY_FILTER_EXACT_MAX", 0)  # força o IDSelector
+    seletor = fs.buscar(index, q, 5, permitidos)
+
+    assert set(exata[1][0].tolist()) <= set(permitidos.tolist())
+    if tipo == "flat":
+        assert exata[1][0].tolist() == seletor[1][0].tolist()
+        assert np.allclose(exata[0], seletor[0], atol=1e-5)
+
+    # id sem vetor no índice → cai no seletor em vez de falhar
+    assert fs._busca_exata(index, q, np.array([1, 2], dtype=np.int64), 5) is None
+
+
+def test_faiss_migracao_mantem_ids_e_recarrega_outros(faiss_isolado):
+    fs = faiss_isolado
+    a, b = fs.MemoryIndex(mmap=False), fs.MemoryIndex(mmap=False)
+    for i in range(1, 21):
+        a.add(_vetor(i), i)
+    assert b.ntotal == 20
+
+    rel = fs.migrar_indice("hnsw", "cosine")
+    assert rel["depois"] == {"tipo": "hnsw", "metrica": "cosine"} and rel["vetores"] == 20
+    assert fs._log_path().stat().st_size == 0
+    assert fs.INDEX_PATH.with_suffix(".bin.bak").exists()
+
+    # b recarrega pela geração nova
+    assert fs.tipo_do_indice(b.index) == "flat"
+    for i in (1, 10, 20):
+        assert _melhor(b, _vetor(i)) == [i]
+    assert fs.tipo_do_indice(b.index) == "hnsw"
+
+
+def test_faiss_indice_perdido_reconstruido_do_sqlite(faiss_isolado):
+    fs = faiss_isolado
+    ids = _inserir(5)
+    fs.reconstruir_indice(dim=DIM)
+    assert fs.verificar_consistencia()["ok"]
+
+    fs.INDEX_PATH.unlink()
+    rel = fs.verificar_consistencia()
+    assert not rel["ok"] and rel["erro"]
+    assert fs.garantir_indice_memoria()["ok"]
+
+    # add com o arquivo sumido: reconstrói do SQLite antes de anexar
+    fs.INDEX_PATH.unlink()
+    [novo] = db.insert_decisions([{"node_id": "no_b", "embedding": _vetor(99).tobytes()}])
+    indice = fs.MemoryIndex(mmap=False)
+    indice.add(_vetor(99), novo)
+    assert sorted(indice.ids_indexados().tolist()) == sorted(ids + [novo])
+    assert fs.verificar_consistencia()["ok"]
@@ -0,0 +1,129 @@
+"""
+Gravação das memórias em segundo plano (memory_writer): fila + journal,
+lote com falha separado em arquivo de pendentes e journals órfãos.
+
+Backend numpy isolado em tmp_path (roda sem faiss).
+
+    python -m pytest lats_sistema/tests/test_memory_writer.py -q
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from lats_sistema.memory import db, numpy_store
+
+memory_saver = pytest.importorskip("lats_sistema.memory.memory_saver")
+memory_writer = pytest.importorskip("lats_sistema.memory.memory_writer")
+
+pytestmark = pytest.mark.skipif(memory_writer.fcntl is None, reason="journals dependem de fcntl")
+
+DIM = 16
+
+
+def _registro(i: int) -> dict:
+    return {
+        "event_text": f"evento {i}", "node_id": "no_a", "chosen_child": "filho",
+        "model_suggestion": "filho", "justification_human": "ok", "justification_model": "",
+        "entropy": 1.5, "motivo": "teste",
+        "embedding": np.random.default_rng(i).normal(size=DIM).astype("float32").tolist(),
+    }
+
+
+def _escrever_journal(caminho, registros, truncado: bool = False):
+    with open(caminho, "wb") as f:
+        for r in registros:
+            f.write(json.dumps(r).encode("utf-8") + b"\n")
+        if truncado:
+            f.write(b'{"event_text": "trunc')  # processo morreu no meio da linha
+
+
+@pytest.fixture
+def pendentes(banco, tmp_path, monkeypatch):
+    """Diretório de journals isolado; persistir_memorias no numpy isolado."""
+    monkeypatch.setattr(numpy_store, "INDEX_PATH", tmp_path / "memoria_vetores.bin")
+    monkeypatch.setattr(numpy_store, "MEMORY_INDEX_RELOAD_INTERVAL", 0.0)
+    monkeypatch.setattr(numpy_store, "_memory_index", None)
+    # persistir_memorias usa o backend escolhido no import: fixa o numpy isolado
+    monkeypatch.setattr(memory_saver, "add_vector", numpy_store.add_vector)
+    monkeypatch.setattr(memory_saver, "search_vectors", numpy_store.search_vectors)
+    monkeypatch.setattr(memory_saver, "similaridade", numpy_store.similaridade)
+    pasta = tmp_path / "pendentes"
+    monkeypatch.setattr(memory_writer, "MEMORY_WRITER_DIR", pasta)
+    monkeypatch.setattr(memory_writer, "MEMORY_WRITER_FSYNC", False)
+    return pasta
+
+
+def _journals(pasta):
+    return sorted(pasta.glob("memorias_pendentes.*.jsonl"))
+
+
+def test_journal_orfao_regravado(pendentes):
+    registros = [_registro(i) for i in range(3)]
+    journal = pendentes / "memorias_pendentes.99999.1.jsonl"
+    pendentes.mkdir()
+    _escrever_journal(journal, registros, truncado=True)
+
+    assert memory_writer.recuperar_journals_orfaos() == 3
+    assert not journal.exists()
+    assert db.count_decisions() == 3
+    assert numpy_store.verificar_consistencia()["ok"]
+
+    # Regravar o mesmo journal (crash depois do commit) não duplica
+    _escrever_journal(journal, registros)
+    memory_writer.recuperar_journals_orfaos()
+    assert db.count_decisions() == 3
+
+
+def test_gravacao_em_segundo_plano_zera_o_journal(pendentes):
+    escritor = memory_writer.MemoryWriter()
+    for i in range(3):
+        escritor.enfileirar(_registro(i))
+    assert escritor.flush(5)
+
+    assert db.count_decisions() == 3
+    [journal] = _journals(pendentes)
+    assert journal.stat().st_size == 0
+    # Journal do processo vivo (com flock) não é tratado como órfão
+    assert memory_writer.recuperar_journals_orfaos() == 0
+
+
+def test_lote_com_falha_vai_para_pendentes(pendentes, monkeypatch):
+    gravar = memory_writer.persistir_memorias
+
+    def falhar(lote):
+        raise RuntimeError("disco cheio")
+
+    monkeypatch.setattr(memory_writer, "persistir_memorias", falhar)
+    escritor = memory_writer.MemoryWriter()
+    escritor.enfileirar(_registro(1))
+    assert escritor.flush(5)
+
+    falhas = [p for p in _journals(pendentes) if ".falha." in p.name]
+    [journal] = [p for p in _journals(pendentes) if ".falha." not in p.name]
+    assert len(falhas) == 1
+    assert journal.stat().st_size == 0  # o journal do processo continua sendo zerado
+    assert db.count_decisions() == 0
+
+    # Próxima inicialização: o arquivo de pendentes é regravado
+    monkeypatch.setattr(memory_writer, "persistir_memorias", gravar)
+    assert memory_writer.recuperar_journals_orfaos() == 1
+    assert db.count_decisions() == 1
+    assert not falhas[0].exists()
+
+    # E o escritor segue gravando normalmente
+    escritor.enfileirar(_registro(2))
+    assert escritor.flush(5)
+    assert db.count_decisions() == 2
+
+
+def test_uso_registrado_pela_fila(pendentes):
+    [did] = db.insert_decisions([{"node_id": "no_a"}])
+    escritor = memory_writer.MemoryWriter()
+    escritor.enfileirar_uso([did])
+    escritor.enfileirar_uso([did])
+    assert escritor.flush(5)
+
+    [row] = db.get_decisions_by_ids([did])
+    assert row["hits"] == 2 and row["last_used"]
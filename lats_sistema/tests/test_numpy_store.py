@@ -0,0 +1,149 @@
+"""
+Backend numpy das memórias (numpy_store): matriz float16 mapeada,
+reconstrução / reparo a partir do SQLite e modo só-leitura do serverless.
+Roda sem faiss. Os cenários de log compartilhado / compactação ficam em
+test_memory_index.py (parametrizados pelos dois backends).
+
+    python -m pytest lats_sistema/tests/test_numpy_store.py -q
+"""
+
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from lats_sistema.memory import db, numpy_store
+
+DIM = 16
+
+
+def _vetor(semente: int) -> np.ndarray:
+    return np.random.default_rng(semente).normal(size=DIM).astype("float32")
+
+
+def _melhor(indice, vec: np.ndarray, k: int = 1, ids_permitidos=None) -> list:
+    resultado = indice.search(vec.reshape(1, -1), k, ids_permitidos)
+    return [] if resultado is None else resultado[1][0].tolist()
+
+
+def _inserir(n: int, node_id: str = "no_a") -> list:
+    return db.insert_decisions([
+        {"event_text": f"evento {i}", "node_id": node_id, "chosen_child": "filho",
+         "embedding": _vetor(i).tobytes()}
+        for i in range(n)
+    ])
+
+
+@pytest.fixture
+def numpy_isolado(banco, tmp_path, monkeypatch):
+    monkeypatch.setattr(numpy_store, "INDEX_PATH", tmp_path / "memoria_vetores.bin")
+    monkeypatch.setattr(numpy_store, "MEMORY_INDEX_RELOAD_INTERVAL", 0.0)
+    monkeypatch.setattr(numpy_store, "_memory_index", None)
+    return numpy_store
+
+
+def test_arquivo_da_matriz(numpy_isolado):
+    ids = np.array([3, 1, 2], dtype=np.int64)
+    vetores = np.stack([_vetor(i) for i in range(3)])
+    numpy_store.gravar_matriz(ids, vetores)
+
+    lidos, matriz = numpy_store.abrir_matriz()
+    assert lidos.tolist() == [1, 2, 3]
+    assert matriz.dtype == np.float16 and matriz.shape == (3, DIM)
+    esperado = vetores[2] / np.linalg.norm(vetores[2])
+    assert np.allclose(matriz[1], esperado, atol=1e-3)  # id 2: linha 1 depois de ordenar
+
+    with open(numpy_store.INDEX_PATH, "r+b") as f:
+        f.truncate(numpy_store.INDEX_PATH.stat().st_size - 10)
+    with pytest.raises(RuntimeError, match="truncado"):
+        numpy_store.abrir_matriz()
+
+
+def test_busca_em_blocos_igual_a_exata(numpy_isolado, monkeypatch):
+    monkeypatch.setattr(numpy_store, "MEMORY_NUMPY_BLOCK_ROWS", 7)
+    vetores = np.stack([_vetor(i) for i in range(50)])
+    ids = np.arange(100, 150, dtype=np.int64)
+    numpy_store.gravar_matriz(ids, vetores)
+
+    q = _vetor(1000)
+    normalizados = vetores / np.linalg.norm(vetores, axis=1, keepdims=True)
+    esperado = ids[np.argsort(-(normalizados @ (q / np.linalg.norm(q))))[:5]]
+    assert _melhor(numpy_store.MemoryIndex(), q, k=5) == esperado.tolist()
+
+
+# ===================================================================
+# SQLITE COMO FONTE DA VERDADE
+# ===================================================================
+def test_arquivo_perdido_reconstruido_do_sqlite(numpy_isolado):
+    ids = _inserir(5)
+    assert not numpy_store.INDEX_PATH.exists()
+
+    indice = numpy_store.MemoryIndex()
+    assert indice.ntotal == 5
+    assert numpy_store.INDEX_PATH.exists()
+    assert _melhor(indice, _vetor(3)) == [ids[3]]
+
+    numpy_store.INDEX_PATH.unlink()
+    numpy_store._log_path().unlink()
+    assert numpy_store.MemoryIndex().ntotal == 5
+    assert numpy_store.verificar_consistencia()["ok"]
+
+
+def test_garantir_indice_completa_e_reconstroi(numpy_isolado):
+    ids = _inserir(4)
+    numpy_store.reconstruir_indice()
+
+    # Memórias gravadas no SQLite sem chegar ao índice (crash entre os dois)
+    novos = db.insert_decisions([
+        {"event_text": "nova", "node_id": "no_b", "chosen_child": "filho", "embedding": _vetor(10).tobytes()}
+    ])
+    rel = numpy_store.verificar_consistencia()
+    assert not rel["ok"] and rel["faltando"] == 1
+    assert numpy_store.garantir_indice_memoria()["ok"]
+
+    # Órfão no índice (apagado do SQLite) → rebuild
+    db.delete_decisions([ids[0]])
+    assert numpy_store.verificar_consistencia()["orfaos"] == 1
+    assert numpy_store.garantir_indice_memoria()["ok"]
+    assert sorted(numpy_store.MemoryIndex().ids_indexados().tolist()) == sorted(ids[1:] + novos)
+
+
+def test_busca_restrita_aos_ids_do_no(numpy_isolado):
+    ids_a = _inserir(3, "no_a")
+    indice = numpy_store.MemoryIndex()
+    indice.add(_vetor(100), 100)  # no delta (log), fora da matriz
+
+    assert _melhor(indice, _vetor(1), k=3, ids_permitidos=ids_a[2:] + [100])[0] in (ids_a[2], 100)
+    assert set(_melhor(indice, _vetor(1), k=5, ids_permitidos=[ids_a[0], 100])) == {ids_a[0], 100}
+
+
+# ===================================================================
+# SERVERLESS: SEM ESCRITA
+# ===================================================================
+@pytest.mark.skipif(not Path("/proc/self").exists(), reason="precisa de um caminho sem escrita (/proc)")
+def test_sem_escrita_matriz_so_em_memoria(numpy_isolado, monkeypatch):
+    ids = _inserir(3)
+    db.empacotar()
+    db.fechar_conexao()
+    monkeypatch.setattr(db, "_gravavel", lambda: False)  # banco só-leitura (immutable)
+    monkeypatch.setattr(numpy_store, "INDEX_PATH", Path("/proc/lats_sem_escrita/memoria_vetores.bin"))
+
+    indice = numpy_store.MemoryIndex()
+    assert _melhor(indice, _vetor(2)) == [ids[2]]
+    assert indice._somente_memoria
+
+    indice.add(_vetor(50), 50)  # só neste processo
+    assert _melhor(indice, _vetor(50)) == [50]
+
+
+def test_sqlite_ilegivel_deixa_memoria_vazia(numpy_isolado, monkeypatch):
+    def falhar(*args, **kwargs):
+        raise sqlite3.OperationalError("unable to open database file")
+
+    monkeypatch.setattr(numpy_store, "reconstruir_indice", falhar)
+    monkeypatch.setattr(db, "carregar_embeddings", falhar)
+
+    indice = numpy_store.MemoryIndex()
+    assert indice.ntotal == 0
+    assert _melhor(indice, _vetor(1)) == []
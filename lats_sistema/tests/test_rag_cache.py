@@ -0,0 +1,94 @@
+"""
+Cache do RAG: hit no state e no LRU do processo, invalidação por versão
+da árvore / corpus, perfil do RAG e TTL.
+
+    python -m pytest lats_sistema/tests/test_rag_cache.py -q
+"""
+
+import os
+
+import pytest
+
+from lats_sistema.lats import tree_loader
+from lats_sistema.rag import cache
+
+
+@pytest.fixture
+def rag(tmp_path, monkeypatch):
+    """LRU vazio e manifests dos índices em tmp_path."""
+    manifests = (tmp_path / "chunks_manifest.json", tmp_path / "faiss_manifest.json")
+    for path in manifests:
+        path.write_text("{}")
+    monkeypatch.setattr(cache, "RAG_CACHE_ENABLED", True)
+    monkeypatch.setattr(cache, "_MANIFESTS", manifests)
+    monkeypatch.setattr(cache, "_cache", cache.RagCache())
+    tree_loader._load_tree()
+    return manifests
+
+
+def _salvar(state, evento="Vazamento de óleo na P-50"):
+    ranking = [{"chunk_id": "c1", "score": 0.9}, {"chunk_id": "c2", "score": 0.4}]
+    cache.salvar_rag_cache(state, evento, "contexto", ["c1", "c2"], ranking)
+
+
+def test_hit_no_state_e_no_processo(rag):
+    state = {}
+    _salvar(state)
+
+    assert cache.buscar_rag_cache(state, "  vazamento de ÓLEO  na P-50")["contexto"] == "contexto"
+    # Outro worker (state sem cache) acha no LRU do processo
+    entrada = cache.buscar_rag_cache({}, "Vazamento de óleo na P-50")
+    assert entrada["candidatos"] == ["c1", "c2"]
+    assert cache.buscar_rag_cache({}, "Incêndio no convés") is None
+
+
+def test_corpus_reindexado_invalida(rag):
+    state = {}
+    _salvar(state)
+
+    chunks_manifest = rag[0]
+    st = chunks_manifest.stat()
+    os.utime(chunks_manifest, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+    assert cache.buscar_rag_cache(state, "Vazamento de óleo na P-50") is None
+    assert cache.buscar_rag_cache({}, "Vazamento de óleo na P-50") is None
+    assert len(cache._cache) == 0  # entrada velha descartada
+
+
+def test_manifest_removido_invalida(rag):
+    _salvar({})
+    rag[1].unlink()
+    assert cache.buscar_rag_cache({}, "Vazamento de óleo na P-50") is None
+
+
+def test_arvore_nova_invalida(rag, monkeypatch):
+    state = {}
+    _salvar(state)
+    monkeypatch.setitem(tree_loader._cache, "TREE_VERSION", "outra_arvore")
+
+    assert cache.buscar_rag_cache(state, "Vazamento de óleo na P-50") is None
+    assert cache.buscar_rag_cache({}, "Vazamento de óleo na P-50") is None
+
+
+def test_perfil_do_rag_muda_a_chave(rag, monkeypatch):
+    state = {}
+    _salvar(state)
+    monkeypatch.setattr(cache, "perfil_rag", lambda: {"hyde": True, "top_n": 99})
+
+    assert cache.buscar_rag_cache(state, "Vazamento de óleo na P-50") is None
+    assert cache.buscar_rag_cache({}, "Vazamento de óleo na P-50") is None
+
+
+def test_ttl_e_limite_do_lru(monkeypatch):
+    lru = cache.RagCache(max_entradas=2, ttl=60)
+    agora = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: agora[0])
+
+    for chave in ("a", "b"):
+        lru.put(chave, "v1", {"contexto": chave})
+    assert lru.get("a", "v1")  # "a" vira a mais recente
+    lru.put("c", "v1", {"contexto": "c"})
+    assert lru.get("b", "v1") is None and len(lru) == 2
+
+    agora[0] += 61
+    assert lru.get("a", "v1") is None
@@ -0,0 +1,72 @@
+"""
+Retenção / deduplicação das memórias HITL (retencao.py).
+
+    python -m pytest lats_sistema/tests/test_retencao.py -q
+"""
+
+import datetime
+
+import numpy as np
+
+from lats_sistema.memory import retencao
+
+DIM = 16
+
+
+def _embedding(semente: int, ruido: float = 0.0, dim: int = DIM) -> bytes:
+    base = np.random.default_rng(semente).normal(size=dim)
+    return (base + ruido * np.random.default_rng(semente + 1000).normal(size=dim)).astype(np.float32).tobytes()
+
+
+def _memoria(did: int, embedding, escolha: str = "filho", **extra) -> dict:
+    return {"id": did, "embedding": embedding, "chosen_child": escolha, "hits": 0,
+            "last_used": None, "timestamp": "2026-01-01T00:00:00", **extra}
+
+
+def test_dedup_ignora_embeddings_ausentes_e_de_outra_dimensao():
+    memorias = [
+        _memoria(1, _embedding(1)),
+        _memoria(2, None),
+        _memoria(3, _embedding(1, ruido=0.01)),
+        _memoria(4, _embedding(1, dim=8)),
+        _memoria(5, _embedding(1, ruido=0.02)),
+        _memoria(6, _embedding(2)),
+    ]
+    assert [sorted(g) for g in retencao.agrupar_duplicatas(memorias)] == [[0, 2, 4]]
+
+
+def test_representante():
+    iguais = [_memoria(1, None, hits=5), _memoria(2, None, hits=1)]
+    assert retencao.representante(iguais)["id"] == 1
+    conflitantes = [_memoria(1, None, "a", hits=5), _memoria(2, None, "b", hits=1)]
+    assert retencao.representante(conflitantes)["id"] == 2
+
+
+def test_compactacao_por_duplicata_e_idade(banco, monkeypatch):
+    monkeypatch.setattr(retencao, "MEMORY_RETENTION_MAX_AGE_DAYS", 30)
+    agora = datetime.datetime.now(datetime.timezone.utc)
+    recente = banco.iso_utc(agora - datetime.timedelta(days=1))
+    antigo = banco.iso_utc(agora - datetime.timedelta(days=90))
+
+    ids = banco.insert_decisions([
+        {"node_id": "no", "chosen_child": "a", "embedding": _embedding(1), "timestamp": recente},
+        {"node_id": "no", "chosen_child": "a", "embedding": _embedding(1, ruido=0.01), "timestamp": recente},
+        {"node_id": "no", "chosen_child": "a", "embedding": _embedding(2), "timestamp": antigo},
+        {"node_id": "no", "chosen_child": "a", "embedding": None, "timestamp": recente},
+    ])
+    banco.registrar_uso([ids[0], ids[0], ids[1]])
+
+    plano = retencao.planejar_no("no")
+    assert plano["remover"] == {ids[1]: "duplicada", ids[2]: "idade"}
+
+    relatorio = retencao.compactar_memorias(aplicar=True, reconstruir=False)
+    assert relatorio["por_motivo"] == {"duplicada": 1, "idade": 1}
+    restantes = {m["id"]: m for m in banco.iter_decisions("no")}
+    assert set(restantes) == {ids[0], ids[3]}
+    assert restantes[ids[0]]["hits"] == 3  # herda o uso da duplicada
+
+
+def test_iso_utc_comparavel_com_timestamps_gravados():
+    local = datetime.datetime(2026, 1, 1, 12, tzinfo=datetime.timezone(datetime.timedelta(hours=-3)))
+    assert retencao.iso_utc(local) == "2026-01-01T15:00:00"
+    assert retencao.iso_utc() > "2026-01-01T00:00:00"
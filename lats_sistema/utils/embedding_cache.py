@@ -4,11 +4,16 @@ Cache global de embeddings do evento para evitar recálculo.
 
 OTIMIZAÇÃO: O embedding do evento é imutável durante todo o LATS-P.
 Calcular uma vez e reutilizar economiza ~50-80% das chamadas à API de embeddings.
+
+Este é o nível "por requisição" (no state). Entre requisições, o modelo de
+embeddings já vem envolvido por CachedEmbeddings (models/cached_embeddings.py),
+então eventos repetidos e retomadas de HITL também não chamam a API.
 """
 
 from typing import Optional
 import numpy as np
 from lats_sistema.models.embeddings import embeddings
+from lats_sistema.utils.metrics import registrar_cache
 
 
 def get_event_embedding(state: dict, evento_texto: str) -> np.ndarray:
@@ -25,6 +30,8 @@ def get_event_embedding(state: dict, evento_texto: str) -> np.ndarray:
     # Verificar se já existe no cache
     cached_embedding = state.get("_event_embedding_cache")
 
+    registrar_cache("event_embedding", hit=cached_embedding is not None)
+
     if cached_embedding is not None:
         # Cache hit - não fazer nova chamada à API
         return np.array(cached_embedding).astype("float32")
@@ -7,12 +7,16 @@ Implementa retry automático e parsing robusto.
 import json
 from typing import Any, Dict, Optional
 
+from lats_sistema.models.llm import invoke_llm
+from lats_sistema.utils.metrics import LLM_RETRIES
+
 
 def invoke_json(
     llm,
     prompt: str,
     max_retries: int = 2,
-    schema_hint: Optional[str] = None
+    schema_hint: Optional[str] = None,
+    call_site: str = "geral",
 ) -> Dict[str, Any]:
     """
     Invoca um LLM e garante que a resposta seja JSON válido.
@@ -22,6 +26,7 @@ def invoke_json(
         prompt: Prompt base do usuário
         max_retries: Número máximo de tentativas de correção
         schema_hint: String descrevendo o schema esperado (opcional)
+        call_site: Identificação do chamador (para governador/métricas)
 
     Returns:
         Dict parseado do JSON
@@ -40,8 +45,8 @@ def invoke_json(
 
     for attempt in range(max_retries + 1):
         try:
-            # Invocar LLM
-            response = llm.invoke(full_prompt)
+            # Invocar LLM (via governador de taxa)
+            response = invoke_llm(llm, full_prompt, call_site=call_site)
 
             # Extrair conteúdo
             if hasattr(response, "content"):
@@ -68,6 +73,7 @@ def invoke_json(
         except json.JSONDecodeError as e:
             if attempt < max_retries:
                 # Retry com instrução de correção
+                LLM_RETRIES.labels(call_site=call_site, motivo="json_invalido").inc()
                 full_prompt = (
                     f"A resposta anterior não foi JSON válido. Erro: {e}\n\n"
                     f"Resposta anterior:\n{text}\n\n"
@@ -8,7 +8,7 @@ adequado para comunicação à ANP, sem mencionar o funcionamento interno do sis
 
 from typing import Dict, Any, List
 from langchain_core.prompts import ChatPromptTemplate
-from lats_sistema.models.llm import llm_text
+from lats_sistema.models.llm import llm_text, invoke_llm
 from lats_sistema.lats.tree_loader import NODE_INDEX
 
 
@@ -173,7 +173,7 @@ def gerar_justificativa_tecnica_llm(
 
     # Gerar justificativa via LLM
     try:
-        response = llm_text.invoke(full_prompt)
+        response = invoke_llm(llm_text, full_prompt, call_site="justificativa")
         justificativa = response.content.strip()
 
         # Garantir que não mencione termos técnicos internos
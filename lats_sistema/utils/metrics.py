@@ -0,0 +1,314 @@
+# lats_sistema/utils/metrics.py
+"""
+Métricas de runtime no formato Prometheus.
+
+- Contadores e histogramas por etapa (HTTP, LLM por call site, embeddings,
+  RAG, memória, tokens do prompt, HITL, colapso, caches, governador,
+  hedging, circuit breaker)
+- Multiprocess-safe: se PROMETHEUS_MULTIPROC_DIR estiver definido (antes do
+  import), cada worker grava seus valores em arquivos mmap e o endpoint
+  /metrics agrega todos os processos
+- prometheus_client é OPCIONAL: sem ele, todas as métricas viram no-op e
+  /metrics responde vazio (não quebra serverless/dev)
+"""
+
+import os
+import time
+import logging
+from contextlib import contextmanager
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import (
+        Counter,
+        Histogram,
+        Gauge,
+        CollectorRegistry,
+        generate_latest,
+        CONTENT_TYPE_LATEST,
+    )
+    from prometheus_client import multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+# ===================================================================
+# STUB (prometheus_client ausente)
+# ===================================================================
+class _NoOp:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, *args, **kwargs):
+        pass
+
+    def dec(self, *args, **kwargs):
+        pass
+
+    def observe(self, *args, **kwargs):
+        pass
+
+    def set(self, *args, **kwargs):
+        pass
+
+
+if not PROMETHEUS_AVAILABLE:
+    Counter = Histogram = _NoOp
+
+    def Gauge(*args, **kwargs):  # noqa: N802 - mesma assinatura do prometheus_client
+        return _NoOp()
+
+
+# Buckets de latência (segundos): de chamadas locais a LLM lento
+_LATENCIA_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+# ===================================================================
+# HTTP (FastAPI)
+# ===================================================================
+HTTP_REQUEST_LATENCY = Histogram(
+    "lats_http_request_duration_seconds",
+    "Latência das requisições HTTP por endpoint",
+    ["endpoint", "method", "status"],
+    buckets=_LATENCIA_BUCKETS,
+)
+
+# ===================================================================
+# LLM
+# ===================================================================
+LLM_CALL_LATENCY = Histogram(
+    "lats_llm_call_duration_seconds",
+    "Latência das chamadas LLM por call site (inclui fila e retries)",
+    ["call_site", "resultado"],
+    buckets=_LATENCIA_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "lats_llm_tokens_total",
+    "Tokens consumidos por call site",
+    ["call_site", "tipo"],
+)
+LLM_RETRIES = Counter(
+    "lats_llm_retries_total",
+    "Retries de chamadas LLM por call site e motivo",
+    ["call_site", "motivo"],
+)
+LLM_QUEUE_WAIT = Histogram(
+    "lats_llm_queue_wait_seconds",
+    "Espera na fila do governador de taxa",
+    ["recurso"],
+    buckets=_LATENCIA_BUCKETS,
+)
+LLM_RATE_LIMITED = Counter(
+    "lats_llm_rate_limited_total",
+    "Respostas 429 recebidas da API",
+    ["recurso"],
+)
+LLM_HEDGES = Counter(
+    "lats_llm_hedges_total",
+    "Chamadas duplicadas (hedge) disparadas",
+    ["call_site"],
+)
+LLM_HEDGE_WINS = Counter(
+    "lats_llm_hedge_wins_total",
+    "Hedges que responderam antes da chamada original",
+    ["call_site"],
+)
+CIRCUIT_OPENED = Counter(
+    "lats_circuit_opened_total",
+    "Aberturas do circuit breaker",
+    ["recurso"],
+)
+CIRCUIT_STATE = Gauge(
+    "lats_circuit_state",
+    "Estado do circuit breaker (0=fechado, 1=semi-aberto, 2=aberto)",
+    ["recurso"],
+    multiprocess_mode="livemax",
+)
+
+# ===================================================================
+# EMBEDDINGS / MEMÓRIA
+# ===================================================================
+EMBEDDING_CALLS = Counter(
+    "lats_embedding_calls_total",
+    "Chamadas à API de embeddings",
+    ["tipo"],
+)
+EMBEDDING_TEXTS = Counter(
+    "lats_embedding_texts_total",
+    "Textos enviados à API de embeddings",
+    ["tipo"],
+)
+EMBEDDING_LATENCY = Histogram(
+    "lats_embedding_duration_seconds",
+    "Latência das chamadas de embeddings",
+    ["tipo"],
+    buckets=_LATENCIA_BUCKETS,
+)
+MEMORY_SEARCH_LATENCY = Histogram(
+    "lats_memory_search_duration_seconds",
+    "Latência da busca de memórias HITL",
+    buckets=_LATENCIA_BUCKETS,
+)
+MEMORY_WRITES = Counter(
+    "lats_memory_writes_total",
+    "Memórias HITL processadas pelo escritor (resultado: salva, duplicada, descartada, erro)",
+    ["resultado"],
+)
+MEMORY_WRITER_QUEUE = Gauge(
+    "lats_memory_writer_queue",
+    "Memórias HITL aguardando gravação em segundo plano",
+    multiprocess_mode="livesum",
+)
+MEMORY_WRITE_LATENCY = Histogram(
+    "lats_memory_write_duration_seconds",
+    "Latência da gravação de um lote de memórias HITL (SQLite + FAISS)",
+    buckets=_LATENCIA_BUCKETS,
+)
+MEMORY_COMPACTION = Counter(
+    "lats_memory_compaction_removed_total",
+    "Memórias HITL removidas pela compactação (motivo: duplicada, idade, limite)",
+    ["motivo"],
+)
+
+# ===================================================================
+# RAG
+# ===================================================================
+RAG_STAGE_LATENCY = Histogram(
+    "lats_rag_stage_duration_seconds",
+    "Latência das etapas do RAG (resultado: ok, timeout, erro)",
+    ["etapa", "resultado"],
+    buckets=_LATENCIA_BUCKETS,
+)
+RAG_SOB_DEMANDA = Counter(
+    "lats_rag_sob_demanda_total",
+    "RAG direcionado a nós incertos (resultado: resolvido, incerto, vazio, erro)",
+    ["resultado"],
+)
+
+# ===================================================================
+# PROMPT DO EVALUATOR (ORÇAMENTO DE CONTEXTO)
+# ===================================================================
+_TOKENS_BUCKETS = (50, 100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000)
+
+PROMPT_TOKENS = Histogram(
+    "lats_prompt_tokens",
+    "Tokens por segmento do prompt do evaluator (por chamada)",
+    ["segmento"],
+    buckets=_TOKENS_BUCKETS,
+)
+PROMPT_TOKENS_CORTADOS = Counter(
+    "lats_prompt_tokens_cortados_total",
+    "Tokens removidos pelo orçamento de contexto, por segmento",
+    ["segmento"],
+)
+
+# ===================================================================
+# LATS-P
+# ===================================================================
+CLASSIFICACOES = Counter(
+    "lats_classificacoes_total",
+    "Execuções do grafo por fase",
+    ["fase"],
+)
+NOS_AVALIADOS = Counter(
+    "lats_nos_avaliados_total",
+    "Nós expandidos/avaliados pelo engine",
+    ["modo"],
+)
+HITL_ACIONADO = Counter(
+    "lats_hitl_acionado_total",
+    "Acionamentos de HITL intermediário",
+)
+COLAPSOS = Counter(
+    "lats_colapso_ontologico_total",
+    "Colapsos ontológicos por razão",
+    ["razao"],
+)
+
+# ===================================================================
+# CACHES
+# ===================================================================
+CACHE_REQUESTS = Counter(
+    "lats_cache_requests_total",
+    "Consultas a caches (hit/miss)",
+    ["cache", "resultado"],
+)
+
+# ===================================================================
+# POOL HTTP (gauges)
+# ===================================================================
+HTTP_POOL_CONNECTIONS = Gauge(
+    "lats_http_pool_connections",
+    "Conexões no pool HTTP compartilhado",
+    ["cliente", "estado"],
+    multiprocess_mode="livesum",
+)
+
+_ultimo_pool_update = [0.0]
+
+
+def atualizar_gauges_pool(intervalo: float = 1.0):
+    """Atualiza gauges do pool HTTP (no máximo 1x por `intervalo` segundos)."""
+    agora = time.monotonic()
+    if agora - _ultimo_pool_update[0] < intervalo:
+        return
+    _ultimo_pool_update[0] = agora
+    try:
+        from lats_sistema.config.http_pool import get_http_pool_stats
+        stats = get_http_pool_stats()
+    except Exception:
+        return
+    for cliente in ("sync", "async"):
+        for estado in ("ativas", "ociosas"):
+            HTTP_POOL_CONNECTIONS.labels(cliente=cliente, estado=estado).set(
+                stats[cliente][estado]
+            )
+
+
+# ===================================================================
+# HELPERS
+# ===================================================================
+@contextmanager
+def cronometrar(histograma, **labels):
+    """Observa a duração do bloco no histograma (com labels opcionais)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        alvo = histograma.labels(**labels) if labels else histograma
+        alvo.observe(time.perf_counter() - inicio)
+
+
+def registrar_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache=cache, resultado="hit" if hit else "miss").inc()
+
+
+def gerar_metricas() -> Tuple[bytes, str]:
+    """Serializa as métricas (agregando workers em modo multiprocess)."""
+    if not PROMETHEUS_AVAILABLE:
+        return b"", CONTENT_TYPE_LATEST
+
+    atualizar_gauges_pool(intervalo=0.0)
+
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    from prometheus_client import REGISTRY
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def marcar_processo_morto(pid: int):
+    """Hook para gunicorn (child_exit): limpa gauges 'live*' do worker."""
+    if PROMETHEUS_AVAILABLE and MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,250 @@
+# lats_sistema/vectorstore/ann.py
+"""
+Índices ANN para o vector store de padrões (tipo escolhido no build,
+criar_index_faiss.py --index-type): flat | hnsw | ivf_flat | ivf_pq, métrica
+l2 ou cosine. Com `ids`, embrulhado em IndexIDMap2 (usado pela memória HITL).
+
+Variáveis:
+- FAISS_INDEX_TYPE                         → tipo padrão do build (flat)
+- FAISS_HNSW_M / FAISS_HNSW_EF_CONSTRUCTION → grafo HNSW (32 / 200)
+- FAISS_IVF_NLIST / FAISS_PQ_M / FAISS_PQ_NBITS → IVF / PQ (0 = automático / 16 / 8)
+- FAISS_EF_SEARCH / FAISS_NPROBE           → busca em runtime, sem rebuild (64 / 8)
+
+    python -m lats_sistema.vectorstore.ann --k 10
+"""
+
+import os
+import json
+import math
+import time
+import logging
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+METRICAS = ("l2", "cosine")
+
+# Build
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "200"))
+FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "0"))  # 0 = automático (~4·√N)
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "16"))
+FAISS_PQ_NBITS = int(os.getenv("FAISS_PQ_NBITS", "8"))
+
+# Busca (runtime)
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "8"))
+
+
+def parametros_build() -> Dict[str, Any]:
+    return {
+        "tipo": FAISS_INDEX_TYPE,
+        "hnsw_m": FAISS_HNSW_M,
+        "hnsw_ef_construction": FAISS_HNSW_EF_CONSTRUCTION,
+        "ivf_nlist": FAISS_IVF_NLIST,
+        "pq_m": FAISS_PQ_M,
+        "pq_nbits": FAISS_PQ_NBITS,
+    }
+
+
+def _nlist_auto(n: int, nlist: int) -> int:
+    if nlist > 0:
+        return nlist
+    return max(1, min(int(4 * math.sqrt(n)), n // 39 or 1))
+
+
+# ===================================================================
+# BUILD
+# ===================================================================
+def construir_indice_ann(
+    vetores: np.ndarray,
+    tipo: str = FAISS_INDEX_TYPE,
+    metrica: str = "l2",
+    ids: Optional[np.ndarray] = None,
+    **params,
+):
+    """
+    Cria e popula um índice FAISS do tipo e métrica pedidos.
+
+    IVF com poucos vetores para treinar cai para um tipo mais simples
+    (ivf_pq → ivf_flat → flat), com aviso no log.
+    cosine → normaliza uma cópia dos vetores e usa produto interno.
+    ids → IndexIDMap2 com esses ids (IVF ganha direct map para reconstruct).
+    """
+    import faiss
+
+    if tipo not in INDEX_TYPES:
+        raise ValueError(f"Tipo de índice inválido: {tipo} (use {', '.join(INDEX_TYPES)})")
+    if metrica not in METRICAS:
+        raise ValueError(f"Métrica inválida: {metrica} (use {', '.join(METRICAS)})")
+
+    vetores = np.ascontiguousarray(vetores, dtype="float32")
+    n, dim = vetores.shape
+    p = dict(parametros_build(), **params)
+
+    if metrica == "cosine":
+        vetores = vetores.copy()
+        faiss.normalize_L2(vetores)
+        metric, plano = faiss.METRIC_INNER_PRODUCT, faiss.IndexFlatIP
+    else:
+        metric, plano = faiss.METRIC_L2, faiss.IndexFlatL2
+
+    if tipo == "ivf_pq" and (n < 2 ** p["pq_nbits"] or dim % p["pq_m"] != 0):
+        logger.warning(
+            f"[ANN] ivf_pq inviável (N={n}, dim={dim}, pq_m={p['pq_m']}) — usando ivf_flat"
+        )
+        tipo = "ivf_flat"
+    nlist = _nlist_auto(n, p["ivf_nlist"])
+    if tipo == "ivf_flat" and n < nlist:
+        logger.warning(f"[ANN] N={n} < nlist={nlist} — usando flat")
+        tipo = "flat"
+
+    if tipo == "flat":
+        index = plano(dim)
+    elif tipo == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, p["hnsw_m"], metric)
+        index.hnsw.efConstruction = p["hnsw_ef_construction"]
+    elif tipo == "ivf_flat":
+        index = faiss.IndexIVFFlat(plano(dim), dim, nlist, metric)
+    else:
+        index = faiss.IndexIVFPQ(plano(dim), dim, nlist, p["pq_m"], p["pq_nbits"], metric)
+
+    if not index.is_trained:
+        index.train(vetores)
+    if ids is None:
+        index.add(vetores)
+    else:
+        index = faiss.IndexIDMap2(index)
+        if n:
+            index.add_with_ids(vetores, np.ascontiguousarray(ids, dtype=np.int64))
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.make_direct_map()
+    aplicar_parametros_busca(index)
+    logger.info(f"[ANN] Índice {tipo} ({metrica}) criado: N={n}, dim={dim}")
+    return index
+
+
+def _base(index):
+    """Índice interno (sem o IndexIDMap, se houver)."""
+    import faiss
+
+    base = faiss.downcast_index(index)
+    if hasattr(base, "id_map"):
+        base = faiss.downcast_index(base.index)
+    return base
+
+
+# ===================================================================
+# PARÂMETROS DE BUSCA (RUNTIME)
+# ===================================================================
+def aplicar_parametros_busca(index, ef_search: Optional[int] = None, nprobe: Optional[int] = None):
+    """Ajusta efSearch (HNSW) / nprobe (IVF) num índice já carregado."""
+    import faiss
+
+    ef_search = ef_search or FAISS_EF_SEARCH
+    nprobe = nprobe or FAISS_NPROBE
+
+    base = _base(index)
+    if hasattr(base, "hnsw"):
+        base.hnsw.efSearch = ef_search
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+
+
+def tipo_do_indice(index) -> str:
+    import faiss
+
+    base = _base(index)
+    if hasattr(base, "hnsw"):
+        return "hnsw"
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return "ivf_pq" if isinstance(faiss.downcast_index(ivf), faiss.IndexIVFPQ) else "ivf_flat"
+    return "flat"
+
+
+def tamanho_indice_bytes(index) -> int:
+    import faiss
+    return int(faiss.serialize_index(index).nbytes)
+
+
+# ===================================================================
+# BENCHMARK
+# ===================================================================
+def benchmark(
+    vetores: np.ndarray,
+    k: int = 10,
+    n_queries: int = 200,
+    tipos: Iterable[str] = INDEX_TYPES,
+    seed: int = 0,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Recall@k contra busca exata, latência por consulta (p50/p95) e memória.
+
+    Consultas = amostra dos próprios vetores com leve ruído (evita que o
+    vizinho mais próximo seja trivialmente o próprio ponto).
+    """
+    import faiss
+
+    vetores = np.ascontiguousarray(vetores, dtype="float32")
+    rng = np.random.default_rng(seed)
+    idx = rng.choice(len(vetores), size=min(n_queries, len(vetores)), replace=False)
+    escala = float(np.std(vetores)) * 0.05
+    queries = vetores[idx] + rng.normal(0, escala, size=(len(idx), vetores.shape[1])).astype("float32")
+    k = min(k, len(vetores))
+
+    exato = faiss.IndexFlatL2(vetores.shape[1])
+    exato.add(vetores)
+    _, verdade = exato.search(queries, k)
+
+    resultados = {}
+    for tipo in tipos:
+        inicio = time.perf_counter()
+        index = construir_indice_ann(vetores, tipo)
+        build_s = time.perf_counter() - inicio
+
+        latencias = []
+        achados = np.empty_like(verdade)
+        for i, q in enumerate(queries):
+            t0 = time.perf_counter()
+            _, I = index.search(q[None, :], k)
+            latencias.append(time.perf_counter() - t0)
+            achados[i] = I[0]
+
+        recall = np.mean([
+            len(set(achados[i]) & set(verdade[i])) / k for i in range(len(queries))
+        ])
+        latencias.sort()
+        resultados[tipo] = {
+            "tipo_efetivo": tipo_do_indice(index),
+            f"recall@{k}": round(float(recall), 4),
+            "latencia_p50_ms": round(latencias[len(latencias) // 2] * 1000, 3),
+            "latencia_p95_ms": round(latencias[int(0.95 * (len(latencias) - 1))] * 1000, 3),
+            "memoria_mb": round(tamanho_indice_bytes(index) / 2 ** 20, 2),
+            "build_s": round(build_s, 3),
+        }
+    return resultados
+
+
+if __name__ == "__main__":
+    from lats_sistema.vectorstore.faiss_loader import INDEX_PATH
+
+    parser = argparse.ArgumentParser(description="Benchmark de índices ANN para o corpus normativo")
+    parser.add_argument("--vetores", type=Path, default=Path(INDEX_PATH) / "vetores.npy",
+                        help="Matriz de embeddings gravada por criar_index_faiss.py")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--tipos", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    args = parser.parse_args()
+
+    vetores = np.load(args.vetores, mmap_mode="r")
+    print(f"Vetores: {vetores.shape[0]} × {vetores.shape[1]}")
+    print(json.dumps(benchmark(vetores, args.k, args.queries, args.tipos), indent=2))
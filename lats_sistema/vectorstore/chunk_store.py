@@ -0,0 +1,310 @@
+# lats_sistema/vectorstore/chunk_store.py
+"""
+Chunk store unificado e endereçado por conteúdo (FAISS + BM25).
+
+Um único chunking (tokens tiktoken, 500/100) com chunk_id estável =
+sha256(texto)[:16] e offsets no arquivo de origem. Persistido em
+data/chunks/:
+    textos.bin   → textos UTF-8 concatenados (lido via mmap)
+    meta.npy     → array estruturado (id, fonte, offsets, posição no .bin)
+    sources.json → nomes dos arquivos de origem
+    manifest.json→ hash e chunks (id, offsets) de cada arquivo (rebuild
+                   incremental)
+Conteúdo repetido entre arquivos é guardado uma vez; o manifest mantém a
+lista de cada arquivo, então um build incremental = um build limpo.
+
+    python -m lats_sistema.vectorstore.chunk_store
+"""
+
+import os
+import re
+import json
+import mmap
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+CORPUS_DIR = BASE_DIR / "padroes_petrobras"
+STORE_DIR = BASE_DIR / "data" / "chunks"
+
+CHUNK_MAX_TOKENS = 500
+CHUNK_OVERLAP = 100
+STORE_VERSION = 2
+
+META_DTYPE = np.dtype([
+    ("id", "S16"),
+    ("fonte", np.int32),
+    ("inicio", np.int64),     # offset (caracteres) no arquivo sanitizado
+    ("fim", np.int64),
+    ("byte_ini", np.int64),   # posição do texto em textos.bin
+    ("byte_len", np.int64),
+])
+
+
+# ===================================================================
+# PIPELINE DE CHUNKING (único)
+# ===================================================================
+def sanitizar(texto: str) -> str:
+    texto = texto.replace("```", "")
+    texto = re.sub(r"<[^>]+>", "", texto)
+    return texto.strip()
+
+
+def chunk_id(texto: str) -> str:
+    return hashlib.sha256(texto.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def chunkar(texto: str, max_tokens: int = CHUNK_MAX_TOKENS, overlap: int = CHUNK_OVERLAP) -> List[Dict]:
+    """
+    Divide o texto em janelas de tokens com sobreposição.
+
+    Retorna [{"texto", "inicio", "fim"}] onde texto == texto_original[inicio:fim].
+    """
+    from lats_sistema.vectorstore.corpus_loader import encoding
+
+    tokens = encoding.encode(texto)
+    if not tokens:
+        return []
+    _, offsets = encoding.decode_with_offsets(tokens)
+
+    chunks = []
+    passo = max(max_tokens - overlap, 1)
+    for start in range(0, len(tokens), passo):
+        end = min(start + max_tokens, len(tokens))
+        ini = offsets[start]
+        fim = offsets[end] if end < len(tokens) else len(texto)
+        trecho = texto[ini:fim]
+        if trecho.strip():
+            chunks.append({"texto": trecho, "inicio": ini, "fim": fim})
+        if end >= len(tokens):
+            break
+    return chunks
+
+
+def _listar_md(dir_path: Path) -> List[Path]:
+    return sorted(
+        p for p in dir_path.iterdir()
+        if p.suffix.lower() == ".md" and not p.name.startswith(".") and "-checkpoint" not in p.name
+    )
+
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+# ===================================================================
+# STORE
+# ===================================================================
+class ChunkStore:
+    """Acesso aos chunks persistidos (textos via mmap, metadados via numpy)."""
+
+    def __init__(self, meta: np.ndarray, fontes: List[str], textos: bytes):
+        self.meta = meta
+        self.fontes = fontes
+        self._textos = textos
+        self._pos = {bytes(cid).decode("ascii"): i for i, cid in enumerate(meta["id"])}
+
+    def __len__(self) -> int:
+        return len(self.meta)
+
+    def __contains__(self, cid: str) -> bool:
+        return cid in self._pos
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._pos)
+
+    def posicao(self, cid: str) -> int:
+        return self._pos[cid]
+
+    def texto(self, cid: str) -> str:
+        row = self.meta[self._pos[cid]]
+        ini = int(row["byte_ini"])
+        return bytes(self._textos[ini:ini + int(row["byte_len"])]).decode("utf-8")
+
+    def textos(self, ids: List[str]) -> List[str]:
+        return [self.texto(cid) for cid in ids]
+
+    def metadados(self, cid: str) -> Dict:
+        row = self.meta[self._pos[cid]]
+        return {
+            "chunk_id": cid,
+            "source": self.fontes[int(row["fonte"])],
+            "inicio": int(row["inicio"]),
+            "fim": int(row["fim"])
+        }
+
+    def fonte(self, cid: str) -> str:
+        return self.fontes[int(self.meta[self._pos[cid]]["fonte"])]
+
+    # -------------------------------------------------------------
+    # Persistência
+    # -------------------------------------------------------------
+    @classmethod
+    def carregar(cls, store_dir: Path = STORE_DIR) -> "ChunkStore":
+        meta = np.load(store_dir / "meta.npy", mmap_mode="r")
+        fontes = json.loads((store_dir / "sources.json").read_text(encoding="utf-8"))
+        path_bin = store_dir / "textos.bin"
+        if path_bin.stat().st_size == 0:
+            textos = b""
+        else:
+            with open(path_bin, "rb") as f:
+                textos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(meta, fontes, textos)
+
+
+def _ler_manifest(store_dir: Path) -> Optional[Dict]:
+    path = store_dir / "manifest.json"
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def store_desatualizado(corpus_dir: Path = CORPUS_DIR, store_dir: Path = STORE_DIR) -> bool:
+    """True se algum .md foi adicionado, removido ou alterado desde o build."""
+    manifest = _ler_manifest(store_dir)
+    if not manifest or manifest.get("versao") != STORE_VERSION:
+        return True
+    if manifest.get("max_tokens") != CHUNK_MAX_TOKENS or manifest.get("overlap") != CHUNK_OVERLAP:
+        return True
+    atuais = {p.name: _sha256(p) for p in _listar_md(corpus_dir)}
+    return atuais != manifest.get("arquivos", {})
+
+
+def construir_chunk_store(
+    corpus_dir: Path = CORPUS_DIR,
+    store_dir: Path = STORE_DIR,
+    anterior_dir: Optional[Path] = None,
+) -> ChunkStore:
+    """
+    (Re)constrói o store. Arquivos com hash inalterado reaproveitam os chunks
+    do store anterior; só os novos/alterados são rechunkados.
+
+    anterior_dir: store de onde reaproveitar (padrão: o próprio store_dir).
+    Com store_dir temporário, o store em uso não é tocado (dry-run).
+    """
+    store_dir.mkdir(parents=True, exist_ok=True)
+    anterior_dir = anterior_dir or store_dir
+
+    anterior = None
+    manifest_ant = _ler_manifest(anterior_dir) or {}
+    if manifest_ant.get("versao") == STORE_VERSION and (anterior_dir / "meta.npy").exists():
+        try:
+            anterior = ChunkStore.carregar(anterior_dir)
+        except Exception:
+            anterior = None
+
+    arquivos, fontes, por_arquivo = {}, [], {}
+    linhas, blob = [], bytearray()
+    vistos = set()
+    reprocessados = 0
+
+    for path in _listar_md(corpus_dir):
+        sha = _sha256(path)
+        arquivos[path.name] = sha
+        fonte_idx = len(fontes)
+        fontes.append(path.name)
+
+        reaproveitar = (
+            anterior is not None
+            and manifest_ant.get("arquivos", {}).get(path.name) == sha
+            and manifest_ant.get("max_tokens") == CHUNK_MAX_TOKENS
+            and manifest_ant.get("overlap") == CHUNK_OVERLAP
+            and path.name in manifest_ant.get("chunks", {})
+        )
+        if reaproveitar:
+            # Lista do próprio arquivo (inclui chunks guardados sob outra fonte)
+            chunks = [
+                {"texto": anterior.texto(cid), "inicio": ini, "fim": fim}
+                for cid, ini, fim in manifest_ant["chunks"][path.name]
+            ]
+        else:
+            chunks = chunkar(sanitizar(path.read_text(encoding="utf-8")))
+            reprocessados += 1
+
+        por_arquivo[path.name] = []
+        for c in chunks:
+            cid = chunk_id(c["texto"])
+            por_arquivo[path.name].append([cid, c["inicio"], c["fim"]])
+            if cid in vistos:
+                continue  # conteúdo idêntico já armazenado (endereçado por conteúdo)
+            vistos.add(cid)
+            dados = c["texto"].encode("utf-8")
+            linhas.append((cid.encode("ascii"), fonte_idx, c["inicio"], c["fim"], len(blob), len(dados)))
+            blob.extend(dados)
+
+    meta = np.array(linhas, dtype=META_DTYPE)
+
+    if anterior is not None and isinstance(anterior._textos, mmap.mmap):
+        anterior._textos.close()
+
+    def _gravar(nome, escrever):
+        tmp = store_dir / f".{nome}.tmp"
+        escrever(tmp)
+        os.replace(tmp, store_dir / nome)
+
+    def _npy(tmp):
+        with open(tmp, "wb") as f:
+            np.save(f, meta)
+
+    _gravar("textos.bin", lambda tmp: tmp.write_bytes(bytes(blob)))
+    _gravar("meta.npy", _npy)
+    _gravar("sources.json", lambda tmp: tmp.write_text(json.dumps(fontes, ensure_ascii=False), encoding="utf-8"))
+    _gravar("manifest.json", lambda tmp: tmp.write_text(json.dumps({
+        "versao": STORE_VERSION,
+        "max_tokens": CHUNK_MAX_TOKENS,
+        "overlap": CHUNK_OVERLAP,
+        "arquivos": arquivos,
+        "chunks": por_arquivo,
+        "n_chunks": len(meta),
+    }, ensure_ascii=False), encoding="utf-8"))
+
+    logger.info(
+        f"[CHUNKS] Store salvo em {store_dir} | chunks={len(meta)} | "
+        f"arquivos reprocessados={reprocessados}/{len(arquivos)}"
+    )
+    return ChunkStore.carregar(store_dir)
+
+
+# ===================================================================
+# SINGLETON DO PROCESSO
+# ===================================================================
+_store: Optional[ChunkStore] = None
+_lock = threading.Lock()
+
+
+def get_chunk_store() -> ChunkStore:
+    """Store do processo (reconstruído se o corpus mudou desde o build)."""
+    global _store
+    if _store is not None:
+        return _store
+    with _lock:
+        if _store is None:
+            if store_desatualizado():
+                logger.info("[CHUNKS] Store ausente/desatualizado — construindo...")
+                _store = construir_chunk_store()
+            else:
+                _store = ChunkStore.carregar()
+                logger.info(f"[CHUNKS] Store carregado de {STORE_DIR} ({len(_store)} chunks)")
+    return _store
+
+
+def recarregar_chunk_store():
+    global _store
+    with _lock:
+        _store = None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    construir_chunk_store()
@@ -1,6 +1,7 @@
 from pathlib import Path
 from langchain_community.vectorstores import FAISS
 from lats_sistema.models.llm_factory import get_embedding_model
+from lats_sistema.vectorstore.ann import aplicar_parametros_busca, tipo_do_indice
 
 # Ajuste aqui se quiser outro path
 INDEX_PATH = Path("data/faiss/index_anp")
@@ -25,5 +26,8 @@ def load_faiss_store():
         allow_dangerous_deserialization=True
     )
 
-    print(f"[FAISS] Índice carregado com sucesso: {INDEX_PATH}")
+    # Índices ANN (hnsw / ivf): efSearch / nprobe vêm do ambiente, sem rebuild
+    aplicar_parametros_busca(faiss_store.index)
+
+    print(f"[FAISS] Índice carregado com sucesso: {INDEX_PATH} ({tipo_do_indice(faiss_store.index)})")
     return faiss_store
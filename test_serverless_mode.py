@@ -42,26 +42,22 @@ try:
     from lats_sistema.graph import nodes
 
     placeholders_ok = (
-        nodes.hyde_generate is None and
-        nodes.buscar_bm25 is None and
-        nodes.buscar_semantico is None and
-        nodes.rerank is None and
-        nodes.sintetizar is None and
-        nodes.carregar_corpus_normativo is None
+        nodes.executar_retrieval is None and
+        nodes.buscar_rag_cache is None and
+        nodes.rerank_fusao is None and
+        nodes.sintetizar is None
     )
 
     if placeholders_ok:
         print("✅ Todas as funções RAG são placeholders (None)")
-        print("   → hyde_generate = None")
-        print("   → buscar_bm25 = None")
-        print("   → buscar_semantico = None")
-        print("   → rerank = None")
+        print("   → executar_retrieval = None")
+        print("   → buscar_rag_cache = None")
+        print("   → rerank_fusao = None")
         print("   → sintetizar = None")
-        print("   → carregar_corpus_normativo = None")
     else:
         print("❌ ERRO: Algumas funções RAG não são None")
-        print(f"   hyde_generate = {nodes.hyde_generate}")
-        print(f"   buscar_bm25 = {nodes.buscar_bm25}")
+        print(f"   executar_retrieval = {nodes.executar_retrieval}")
+        print(f"   rerank_fusao = {nodes.rerank_fusao}")
         sys.exit(1)
 
     print("\n✅ TESTE 1 PASSOU: Imports condicionais funcionam corretamente")